@@ -0,0 +1,81 @@
+"""Bulk bullet benchmark.
+
+Keeps a target number of generic bullets in flight among a fixed number
+of ships, then times the bullet phase (main.update_bullets(): motion,
+hits, culling) plus applying the kills it queued, and the batched draw
+per tick.
+
+    python -m benchmarks.bullets
+"""
+
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import bullet  # noqa: E402
+import main  # noqa: E402
+import particles  # noqa: E402
+import state  # noqa: E402
+from ship import Ship, spawn  # noqa: E402
+
+TARGETS = [1000, 10000, 100000]
+SHIPS = 100
+TICKS = 50
+
+
+def refill(target):
+    # Top up with bullets fired from random ships in random directions
+    ships = state.ships.to_list()
+    for _ in range(target - len(state.bullets)):
+        parent = random.choice(ships)
+        state.bullets.append(
+            bullet.Bullet.pool.acquire(
+                parent,
+                parent.color,
+                parent.x,
+                parent.y,
+                random.uniform(-3, 3),
+                random.uniform(-3, 3),
+            )
+        )
+
+
+def run():
+    pygame.init()
+    state.screen = pygame.Surface((3440, 1440))
+    print(f"{SHIPS} ships, median ms per tick")
+    print(f"{'bullets':>8} {'update':>8} {'draw':>8} {'hits':>6}")
+    for target in TARGETS:
+        main.reset_world()
+        random.seed(1)
+        particles.seed(1)
+        for _ in range(SHIPS):
+            spawn(Ship())
+        updates = []
+        draws = []
+        hits = 0
+        for _ in range(TICKS):
+            refill(target)
+            ships = set(state.ships)
+            start = time.perf_counter()
+            main.update_bullets()
+            state.commands.apply()
+            mid = time.perf_counter()
+            bullet.render_all(state.draw_list, state.camera)
+            state.draw_list.flush(state.screen, state.renderer)
+            end = time.perf_counter()
+            hits += len(ships - set(state.ships))
+            updates.append((mid - start) * 1000)
+            draws.append((end - mid) * 1000)
+        update = statistics.median(updates)
+        draw = statistics.median(draws)
+        print(f"{target:>8} {update:>8.2f} {draw:>8.2f} {hits:>6}")
+
+
+if __name__ == "__main__":
+    run()
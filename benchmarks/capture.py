@@ -0,0 +1,107 @@
+"""Frame capture overhead benchmark.
+
+Runs one seeded scenario (simulation plus rendering to an offscreen
+surface at the window size) paced to a frame rate, once without capture
+and once per capture target, and reports what grab() adds to a frame,
+how long the worker threads take per frame, and how many frames were
+dropped because they fell behind. Saving the surface from the loop with
+pygame.image.save is timed for comparison.
+
+    python -m benchmarks.capture
+    python -m benchmarks.capture --frames 100 --fps 30 --workers 4
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import camera  # noqa: E402
+import capture  # noqa: E402
+import main  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+from benchmarks.suite import build_scenario  # noqa: E402
+
+
+def measure(args, recorder=None):
+    # Median ms per frame of step and render, and of grab()
+    build_scenario(args.ships, args.seed)
+    frame_times = []
+    grab_times = []
+    next_frame = time.perf_counter()
+    for _ in range(args.frames):
+        start = time.perf_counter()
+        main.step()
+        state.renderer.begin_frame(state.screen)
+        main.render_frame()
+        middle = time.perf_counter()
+        if recorder is not None:
+            recorder.grab(state.screen)
+        end = time.perf_counter()
+        frame_times.append(middle - start)
+        grab_times.append(end - middle)
+        next_frame = max(next_frame + 1 / args.fps, end)
+        time.sleep(next_frame - end)
+    return statistics.median(frame_times), statistics.median(grab_times)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ships", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--fps", type=int, default=60, help="frame pacing")
+    parser.add_argument(
+        "--workers", type=int, help=f"PNG threads (default {settings.CAPTURE_WORKERS})"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+    state.camera = camera.Camera(settings.WINDOW_SIZE, state.world.size)
+
+    frame, _ = measure(args)
+    width, height = settings.WINDOW_SIZE
+    print(
+        f"{width}x{height}, {args.ships} ships, {args.frames} frames at "
+        f"{args.fps} fps, ring of {settings.CAPTURE_RING}"
+    )
+    print(f"frame            {frame * 1000:>9.2f} ms (median)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        samples = []
+        for i in range(5):
+            start = time.perf_counter()
+            pygame.image.save(state.screen, os.path.join(tmp, f"save{i}.png"))
+            samples.append(time.perf_counter() - start)
+        print(
+            f"image.save       {statistics.median(samples) * 1000:>9.2f} ms "
+            "in the loop, for comparison"
+        )
+
+        targets = [
+            ("png sequence", capture.PngSequence(tmp, workers=args.workers)),
+            ("raw pipe", capture.RawPipe("sh -c 'cat > /dev/null'", args.fps)),
+        ]
+        for name, recorder in targets:
+            _, grab = measure(args, recorder)
+            recorder.close()
+            _, dropped, _, _, encode = recorder.stats()
+            print(
+                f"{name:<17}{grab * 1000:>9.2f} ms grab ({grab / frame:.1%} of a "
+                f"frame), {encode:.1f} ms encode on {recorder.workers} "
+                f"thread(s), {dropped} dropped"
+            )
+
+
+if __name__ == "__main__":
+    run()
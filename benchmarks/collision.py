@@ -0,0 +1,83 @@
+"""Collision broadphase benchmark.
+
+Fires a fixed number of bullet probes per tick against a growing fleet and
+reports the cost of utils.find_collision with the spatial grid against the
+old linear scan over state.ships.
+
+    python -m benchmarks.collision
+"""
+
+import random
+import time
+
+import pygame
+
+import state
+import utils
+from ship import Ship, spawn
+
+COUNTS = [10, 50, 100, 250, 500, 1000, 2000]
+PROBES = 8 * 50  # fifty machinegun volleys per tick
+TICKS = 50
+
+
+def linear_find_collision(x, y, parent):
+    # The pre-grid implementation, kept here as the reference point
+    for ship in state.ships:
+        if (
+            ship is not parent
+            and utils.distance_squared(x, y, ship.x, ship.y)
+            < ship.radius * ship.radius
+        ):
+            return ship
+    return None
+
+
+def populate(count):
+    state.ships.clear()
+    state.ship_grid.clear()
+    for _ in range(count):
+        spawn(Ship())
+
+
+def time_tick(find, probes):
+    start = time.perf_counter()
+    for x, y, parent in probes:
+        find(x, y, parent)
+    return time.perf_counter() - start
+
+
+def main():
+    random.seed(1)
+    state.screen = pygame.Surface((3440, 1440))
+    width, height = state.screen.get_size()
+
+    print(f"{'ships':>6} {'grid us/tick':>14} {'linear us/tick':>16}")
+    for count in COUNTS:
+        populate(count)
+        grid_total = 0.0
+        linear_total = 0.0
+        for _ in range(TICKS):
+            # Ships move every tick, so the grid is refreshed incrementally
+            for ship in state.ships:
+                ship.x = min(max(ship.x + random.randint(-5, 5), 0), width - 1)
+                ship.y = min(max(ship.y + random.randint(-5, 5), 0), height - 1)
+                state.ship_grid.update(ship)
+            probes = [
+                (
+                    random.uniform(0, width),
+                    random.uniform(0, height),
+                    random.choice(state.ships),
+                )
+                for _ in range(PROBES)
+            ]
+            grid_total += time_tick(utils.find_collision, probes)
+            linear_total += time_tick(linear_find_collision, probes)
+        print(
+            f"{count:>6} {grid_total / TICKS * 1e6:>14.1f}"
+            f" {linear_total / TICKS * 1e6:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Fill-rate reference numbers for the render.py docs.
+
+Measures full-screen clears and copies against tile-sized fills and
+display updates at the configured window size.
+
+    python -m benchmarks.fillrate
+"""
+
+import time
+
+import pygame
+
+import settings
+
+REPEAT = 50
+
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def run():
+    pygame.init()
+    screen = pygame.display.set_mode(settings.WINDOW_SIZE)
+    width, height = screen.get_size()
+    offscreen = pygame.Surface((width, height))
+    tiles = [pygame.Rect((i % 100) * 32, (i // 100) * 32, 32, 32) for i in range(100)]
+
+    def fill_tiles():
+        for rect in tiles:
+            screen.fill((0, 0, 0), rect)
+
+    print(
+        f"{width}x{height} ({width * height / 1e6:.2f} Mpx, "
+        f"{screen.get_bitsize()} bpp, driver {pygame.display.get_driver()})"
+    )
+    rows = [
+        ("screen.fill('black')", lambda: screen.fill("black")),
+        ("full-screen blit", lambda: screen.blit(offscreen, (0, 0))),
+        ("display.flip()", pygame.display.flip),
+        ("fill 100 32x32 tiles", fill_tiles),
+        ("display.update(100 tiles)", lambda: pygame.display.update(tiles)),
+    ]
+    for label, fn in rows:
+        print(f"  {label:<26} {timed(fn):7.3f} ms")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    run()
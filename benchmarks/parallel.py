@@ -0,0 +1,96 @@
+"""Parallel simulation speedup curve.
+
+Times the ships and bullets phases of main.step() on one large seeded
+scenario, serially and with parallel.ParallelSim at increasing worker
+counts, and reports ms per tick and the speedup over the serial loop.
+
+    python -m benchmarks.parallel
+    python -m benchmarks.parallel --ships 4000 --workers 1 2 4 8 16
+
+Every run starts from the same seeded world, but the parallel mode
+consumes the RNG in a different order, so worlds drift apart after the
+first few ticks; compare the curve, not individual ticks.
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import parallel  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+from benchmarks.suite import build_scenario  # noqa: E402
+
+
+def measure(workers, args):
+    build_scenario(args.ships, args.seed, args.bullets_per_ship)
+    state.parallel = parallel.create(workers)
+    samples = []
+    try:
+        for tick in range(args.warmup + args.ticks):
+            start = time.perf_counter()
+            main.update_ships()
+            state.commands.apply()
+            main.update_bullets()
+            state.commands.apply()
+            if tick >= args.warmup:
+                samples.append(time.perf_counter() - start)
+            # Keep the rest of the world going so effects don't pile up
+            main.update_deaths()
+            main.update_effects()
+            state.commands.apply()
+    finally:
+        if state.parallel is not None:
+            state.parallel.close()
+            state.parallel = None
+    return statistics.median(samples) * 1000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ships", type=int, default=2000)
+    parser.add_argument("--bullets-per-ship", type=int, default=10)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        help="worker counts to try (default: powers of two up to the core count)",
+    )
+    parser.add_argument("--ticks", type=int, default=30, help="measured ticks")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured ticks")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    workers = args.workers
+    if not workers:
+        cores = os.cpu_count() or 1
+        workers = [1]
+        while workers[-1] * 2 <= cores:
+            workers.append(workers[-1] * 2)
+
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+
+    print(
+        f"{args.ships} ships, {args.ships * args.bullets_per_ship} bullets, "
+        f"{os.cpu_count()} cores; ships + bullets phases, median ms per tick"
+    )
+    print(f"{'workers':>8} {'ms/tick':>9} {'speedup':>8}")
+    serial = measure(0, args)
+    print(f"{'serial':>8} {serial:>9.2f} {1:>8.2f}")
+    for count in workers:
+        ms = measure(count, args)
+        print(f"{count:>8} {ms:>9.2f} {serial / ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,74 @@
+"""Particle engine benchmark.
+
+Keeps a target number of particles alive by spawning death explosions,
+exhaust bursts and trail puffs, then times the vectorized update and the
+batched draw of state.particles per frame. 20000 is the game's own cap
+(settings.MAX_PARTICLES); 50000 is past it.
+
+    python -m benchmarks.particles
+"""
+
+import random
+import statistics
+import time
+
+import pygame
+
+import state
+from effects import DeathFX, ExhaustFX, TrailSmokeFX
+from particles import ParticleSystem
+
+TARGETS = [1000, 10000, 20000, 50000]
+FRAMES = 100
+
+
+def spawn_until(target, width, height):
+    while len(state.particles) < target:
+        before = len(state.particles)
+        x = random.uniform(0, width)
+        y = random.uniform(0, height)
+        roll = random.random()
+        if roll < 0.5:
+            state.deaths.append(DeathFX(x, y))
+        elif roll < 0.75:
+            state.effects.append(ExhaustFX(x, y, 1.0, 0.0))
+        else:
+            state.effects.append(TrailSmokeFX(x, y, 0.0, 1.0, strength=0.6))
+        if len(state.particles) == before:
+            # Nothing emitted (a cap or a quality level); don't spin forever
+            break
+
+
+def main():
+    random.seed(1)
+    state.screen = pygame.Surface((3440, 1440))
+    width, height = state.screen.get_size()
+    # Uncapped, unlike the game's settings.MAX_PARTICLES, so every target
+    # is reachable
+    capped = state.particles
+    state.particles = ParticleSystem()
+
+    print(f"{'particles':>9} {'update ms':>10} {'draw ms':>9} {'total ms':>9}")
+    for target in TARGETS:
+        state.particles.clear()
+        updates = []
+        draws = []
+        for _ in range(FRAMES):
+            spawn_until(target, width, height)
+            start = time.perf_counter()
+            state.particles.update()
+            mid = time.perf_counter()
+            state.particles.draw(state.screen)
+            end = time.perf_counter()
+            updates.append((mid - start) * 1000)
+            draws.append((end - mid) * 1000)
+        update = statistics.median(updates)
+        draw = statistics.median(draws)
+        print(f"{target:>9} {update:>10.2f} {draw:>9.2f} {update + draw:>9.2f}")
+        state.deaths.clear()
+        state.effects.clear()
+    state.particles = capped
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Object pooling benchmark.
+
+Runs the same seeded heavy-fire headless scenario with the Bullet and
+effect pools enabled and disabled, and reports pooled-class allocations
+per second, garbage collector activity and the frame-time tail.
+
+    python -m benchmarks.pooling
+"""
+
+import gc
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import particles  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+from bullet import Bullet  # noqa: E402
+from effects import DeathFX, ExhaustFX, TrailSmokeFX  # noqa: E402
+from ship import Ship, spawn  # noqa: E402
+
+POOLED = [Bullet, DeathFX, ExhaustFX, TrailSmokeFX]
+SHIPS = 100
+FIRE_RATE = 5
+WARMUP = 100
+TICKS = 400
+SEED = 1
+
+
+class GCMonitor:
+    # Collects collection counts and pause time through gc.callbacks
+    def __init__(self):
+        self.collections = 0
+        self.pause = 0.0
+        self._start = 0.0
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self._start = time.perf_counter()
+        else:
+            self.collections += 1
+            self.pause += time.perf_counter() - self._start
+
+
+def measure(pooling):
+    main.reset_world()
+    random.seed(SEED)
+    particles.seed(SEED)
+    settings.SHIP_FIRE_RATE = FIRE_RATE
+    for cls in POOLED:
+        cls.pool.enabled = pooling
+        cls.pool.clear()
+        cls.pool.reset_stats()
+
+    for _ in range(SHIPS):
+        spawn(Ship())
+    for _ in range(WARMUP):
+        main.step()
+    for cls in POOLED:
+        cls.pool.reset_stats()
+
+    monitor = GCMonitor()
+    gc.callbacks.append(monitor)
+    frames = []
+    start = time.perf_counter()
+    try:
+        for _ in range(TICKS):
+            t = time.perf_counter()
+            main.step()
+            frames.append((time.perf_counter() - t) * 1000)
+    finally:
+        gc.callbacks.remove(monitor)
+    elapsed = time.perf_counter() - start
+
+    frames.sort()
+    return {
+        "allocs": sum(cls.pool.created for cls in POOLED) / elapsed,
+        "reused": sum(cls.pool.reused for cls in POOLED) / elapsed,
+        "gc": monitor.collections / elapsed,
+        "gc_ms": monitor.pause * 1000 / elapsed,
+        "p50": statistics.median(frames),
+        "p99": frames[int(len(frames) * 0.99) - 1],
+        "max": frames[-1],
+    }
+
+
+def run():
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+
+    print(
+        f"{SHIPS} ships, firing {FIRE_RATE}/s, {TICKS} ticks\n"
+        f"{'pooling':>8} {'allocs/s':>9} {'reused/s':>9} {'gc/s':>6}"
+        f" {'gc ms/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}"
+    )
+    for pooling in (False, True):
+        r = measure(pooling)
+        print(
+            f"{'on' if pooling else 'off':>8} {r['allocs']:>9.0f} {r['reused']:>9.0f}"
+            f" {r['gc']:>6.1f} {r['gc_ms']:>8.2f} {r['p50']:>7.2f}"
+            f" {r['p99']:>7.2f} {r['max']:>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,122 @@
+"""Render thread benchmark: frame time against the slower of the stages.
+
+Runs one seeded scenario a frame per tick with the dummy video driver,
+first single-threaded, timing each stage (simulation, queueing draw
+commands, rasterizing them, flip), then with a RenderThread drawing each
+frame while the next is simulated. The threaded frame time is compared
+with the larger of the two sides plus the flip, which is what it comes
+down to when rasterizing runs fully without the GIL. With one CPU there
+is nothing to overlap, and the difference is the cost of the handover.
+
+    python -m benchmarks.renderthread
+    python -m benchmarks.renderthread --ships 300 --frames 300
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import camera  # noqa: E402
+import main  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+from benchmarks.suite import build_scenario  # noqa: E402
+from renderthread import RenderThread  # noqa: E402
+
+clock = time.perf_counter
+
+QUEUE_PHASES = main.RENDER_PHASES[:-1]
+
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+
+def serial(args):
+    # Per stage: simulation, queueing, raster, flip, and the whole frame
+    build_scenario(args.ships, args.seed)
+    stages = {"sim": [], "queue": [], "raster": [], "flip": [], "frame": []}
+    for _ in range(args.frames):
+        start = clock()
+        main.step()
+        simulated = clock()
+        main.render_frame(QUEUE_PHASES)
+        queued = clock()
+        state.renderer.begin_frame(state.screen)
+        main.flush_draw_list()
+        drawn = clock()
+        state.renderer.end_frame()
+        end = clock()
+        stages["sim"].append(simulated - start)
+        stages["queue"].append(queued - simulated)
+        stages["raster"].append(drawn - queued)
+        stages["flip"].append(end - drawn)
+        stages["frame"].append(end - start)
+    return {name: median_ms(samples) for name, samples in stages.items()}
+
+
+def threaded(args):
+    # Whole frames, and the raster time as measured on the render thread
+    build_scenario(args.ships, args.seed)
+    thread = RenderThread()
+    frames = []
+    raster = []
+    try:
+        for _ in range(args.frames):
+            start = clock()
+            main.step()
+            main.render_frame(QUEUE_PHASES)
+            drawn = thread.pending
+            thread.wait()
+            if drawn:
+                state.renderer.end_frame()
+                raster.append(thread.raster_ms / 1000)
+            thread.submit()
+            frames.append(clock() - start)
+    finally:
+        thread.close()
+    return median_ms(frames), median_ms(raster)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ships", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    state.screen = pygame.display.set_mode(settings.WINDOW_SIZE)
+    state.camera = camera.Camera(settings.WINDOW_SIZE, state.world.size)
+    state.profiler.enabled = False
+
+    stages = serial(args)
+    frame, raster = threaded(args)
+    bound = max(stages["sim"] + stages["queue"], stages["raster"]) + stages["flip"]
+    width, height = settings.WINDOW_SIZE
+    print(
+        f"{width}x{height}, {args.ships} ships, {args.frames} frames, "
+        f"{os.cpu_count()} CPUs (medians)"
+    )
+    for name in ("sim", "queue", "raster", "flip"):
+        print(f"{name:<18}{stages[name]:>9.2f} ms")
+    print(f"single-threaded   {stages['frame']:>9.2f} ms/frame")
+    print(
+        f"render thread     {frame:>9.2f} ms/frame "
+        f"(raster {raster:.2f} ms on the thread)"
+    )
+    print(f"larger side+flip  {bound:>9.2f} ms/frame")
+    if os.cpu_count() == 1:
+        print(f"handover          {frame - stages['frame']:>+9.2f} ms/frame (one CPU)")
+
+
+if __name__ == "__main__":
+    run()
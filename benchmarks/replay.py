@@ -0,0 +1,111 @@
+"""Replay recording benchmark.
+
+Runs one large seeded scenario (simulation plus rendering to an
+offscreen surface) with and without a Recorder capturing every tick and
+reports the recording overhead against the frame time, bytes per
+keyframe and per delta frame, and how long the player takes to seek.
+
+    python -m benchmarks.replay
+    python -m benchmarks.replay --ships 2000 --ticks 300
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+from benchmarks.suite import BULLETS_PER_SHIP, build_scenario  # noqa: E402
+from replay import Recorder, Replay  # noqa: E402
+
+
+def measure(args, recorder=None):
+    # Median seconds per tick of the whole tick (step, render and
+    # capture()) and of capture() alone
+    build_scenario(args.ships, args.seed, args.bullets_per_ship)
+    tick_times = []
+    capture_times = []
+    for tick in range(args.ticks):
+        start = time.perf_counter()
+        main.step()
+        state.renderer.begin_frame(state.screen)
+        main.render_frame()
+        middle = time.perf_counter()
+        if recorder is not None:
+            recorder.capture(tick)
+        end = time.perf_counter()
+        tick_times.append(end - start)
+        capture_times.append(end - middle)
+    return statistics.median(tick_times), statistics.median(capture_times)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ships", type=int, default=1000)
+    parser.add_argument("--bullets-per-ship", type=int, default=BULLETS_PER_SHIP)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--seeks", type=int, default=20, help="random seeks timed")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+
+    # A first run warms up caches and pools, so neither timed run gets
+    # the cold start
+    measure(args)
+    frame, _ = measure(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.rpl")
+        recorder = Recorder(path, args.seed, state.world.size)
+        recorded_frame, capture = measure(args, recorder)
+        recorder.close()
+
+        keyframes = -(-args.ticks // recorder.keyframe_interval)
+        deltas = args.ticks - keyframes
+        print(
+            f"{args.ships} ships, {args.ships * args.bullets_per_ship} bullets, "
+            f"{args.ticks} ticks, keyframe every {recorder.keyframe_interval}"
+        )
+        print(f"frame           {frame * 1000:>9.2f} ms/tick (median)")
+        print(
+            f"frame, recording{recorded_frame * 1000:>9.2f} ms/tick "
+            f"({recorded_frame / frame - 1:+.1%})"
+        )
+        print(
+            f"capture         {capture * 1000:>9.2f} ms/tick "
+            f"({capture / frame:.1%} of a frame)"
+        )
+        print(f"keyframe        {recorder.keyframe_bytes / keyframes:>9.0f} bytes")
+        if deltas:
+            print(f"delta frame     {recorder.delta_bytes / deltas:>9.0f} bytes")
+        print(f"file            {os.path.getsize(path) / 1024:>9.0f} KiB")
+
+        player = Replay(path)
+        rng = random.Random(args.seed)
+        samples = []
+        for _ in range(args.seeks):
+            tick = rng.randrange(len(player))
+            start = time.perf_counter()
+            player.state(tick)
+            samples.append(time.perf_counter() - start)
+        player.close()
+        print(
+            f"seek            {statistics.median(samples) * 1000:>9.2f} ms median, "
+            f"{max(samples) * 1000:.2f} ms worst"
+        )
+
+
+if __name__ == "__main__":
+    run()
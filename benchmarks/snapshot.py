@@ -0,0 +1,88 @@
+"""World snapshot benchmark.
+
+Builds a large seeded world (about 100k ships, bullets and effects plus
+their particles), then times saving it to bytes, loading it back and the
+file round trip, and checks that the loaded world has the same entities.
+
+    python -m benchmarks.snapshot
+    python -m benchmarks.snapshot --ships 10000 --bullets-per-ship 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import settings  # noqa: E402
+import snapshot  # noqa: E402
+import state  # noqa: E402
+from benchmarks.suite import build_scenario  # noqa: E402
+
+STORES = ["ships", "bullets", "deaths", "effects"]
+
+
+def counts():
+    return {name: len(getattr(state, name)) for name in STORES + ["particles"]}
+
+
+def timed(function, *args, repeat=3):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples) * 1000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ships", type=int, default=5000)
+    parser.add_argument("--bullets-per-ship", type=int, default=18)
+    parser.add_argument(
+        "--ticks", type=int, default=3, help="ticks simulated before saving"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+
+    build_scenario(args.ships, args.seed, args.bullets_per_ship)
+    for _ in range(args.ticks):
+        main.step()
+    before = counts()
+    entities = sum(before[name] for name in STORES)
+
+    data, dump_ms = timed(snapshot.dumps)
+    _, load_ms = timed(snapshot.loads, data)
+    after = counts()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "world.snap")
+        _, save_file_ms = timed(snapshot.save, path)
+        _, load_file_ms = timed(snapshot.load, path)
+
+    print(", ".join(f"{n} {name}" for name, n in before.items()))
+    print(f"snapshot        {len(data) / 2**20:>9.1f} MiB")
+    print(f"dumps           {dump_ms:>9.1f} ms")
+    print(f"loads           {load_ms:>9.1f} ms ({entities / load_ms:.0f}k entities/s)")
+    print(f"save to file    {save_file_ms:>9.1f} ms")
+    print(f"load from file  {load_file_ms:>9.1f} ms")
+    if after != before:
+        print(f"loaded world differs: {after}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
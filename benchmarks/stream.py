@@ -0,0 +1,160 @@
+"""Spectator streaming throughput benchmark over loopback.
+
+Runs one large seeded scenario (simulation only) publishing every tick
+to reference clients in processes of their own on the same machine, one
+reading as fast as it can and one that stalls for a while every second.
+Reports the publish overhead against the tick time, bytes per keyframe
+and per delta, the throughput each client decoded, and how many frames
+the slow client had dropped to keyframes instead. (Clients in threads
+would measure their decoding too: they hold the GIL while publish()
+waits for it.)
+
+    python -m benchmarks.stream
+    python -m benchmarks.stream --ships 2000 --address /tmp/bench.sock
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+from benchmarks.suite import BULLETS_PER_SHIP, build_scenario  # noqa: E402
+from stream import StreamClient, StreamServer  # noqa: E402
+
+
+def spectate(address, results, stall=0.0, receive_buffer=None):
+    # Reference client decoding everything, in a process of its own; a
+    # stall (s) every second of reading makes it a slow one. Puts
+    # (messages, keyframes, bytes, seconds) on results once disconnected
+    client = StreamClient(address, receive_buffer=receive_buffer)
+    start = time.perf_counter()
+    last_stall = 0.0
+    messages = 0
+    elapsed = 0.0
+    try:
+        while True:
+            client.receive()
+            messages += 1
+            elapsed = time.perf_counter() - start
+            if stall and elapsed - last_stall >= 1:
+                time.sleep(stall)
+                last_stall = elapsed
+    except (EOFError, OSError):
+        pass
+    results.put((messages, client.keyframe_count, client.bytes, elapsed))
+
+
+def start_spectator(address, *args):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=spectate, args=(address, results, *args), daemon=True
+    )
+    process.start()
+    return process, results
+
+
+def measure(args, server=None):
+    # Median s per tick of step() and of publish(), and publish()'s CPU
+    # time in this process: on few cores its wall time includes the
+    # clients decoding what it sent
+    build_scenario(args.ships, args.seed, args.bullets_per_ship)
+    step_times = []
+    publish_times = []
+    publish_cpu = []
+    for tick in range(args.ticks):
+        start = time.perf_counter()
+        main.step()
+        middle = time.perf_counter()
+        cpu = time.process_time()
+        if server is not None:
+            server.publish(tick)
+        publish_cpu.append(time.process_time() - cpu)
+        step_times.append(middle - start)
+        publish_times.append(time.perf_counter() - middle)
+    return (
+        statistics.median(step_times),
+        statistics.median(publish_times),
+        statistics.mean(publish_cpu),
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ships", type=int, default=1000)
+    parser.add_argument("--bullets-per-ship", type=int, default=BULLETS_PER_SHIP)
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--keyframe-interval",
+        type=int,
+        help=f"ticks between keyframes (default {settings.STREAM_KEYFRAME_INTERVAL})",
+    )
+    parser.add_argument(
+        "--address", default="127.0.0.1:7787", help="host:port or Unix socket path"
+    )
+    parser.add_argument(
+        "--stall", type=float, default=1.0, help="slow client's stall per second"
+    )
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+
+    tick, _, _ = measure(args)
+    server = StreamServer(args.address, args.keyframe_interval)
+    fast = start_spectator(args.address)
+    while len(server.clients) < 1:
+        server.pump()
+    slow = start_spectator(args.address, args.stall, 1 << 16)
+    while len(server.clients) < 2:
+        server.pump()
+    streamed_tick, publish, publish_cpu = measure(args, server)
+    # Let the clients drain what is still queued
+    deadline = time.perf_counter() + 5
+    while any(c.out for c in server.clients) and time.perf_counter() < deadline:
+        server.pump()
+        time.sleep(0.001)
+    slow_dropped = server.clients[1].dropped if len(server.clients) > 1 else 0
+    server.close()
+    decoded = []
+    for process, results in (fast, slow):
+        decoded.append(results.get(timeout=10))
+        process.join(1)
+
+    print(
+        f"{args.ships} ships, {args.ships * args.bullets_per_ship} bullets, "
+        f"{args.ticks} ticks, keyframe every {server.keyframe_interval}, "
+        f"to {args.address}"
+    )
+    print(f"tick            {tick * 1000:>9.2f} ms (median)")
+    print(f"tick, streaming {streamed_tick * 1000:>9.2f} ms")
+    print(f"publish         {publish * 1000:>9.2f} ms ({publish / tick:.1%} of a tick)")
+    print(f"publish, CPU    {publish_cpu * 1000:>9.2f} ms (mean, this process)")
+    if server.keyframes:
+        print(f"keyframe        {server.keyframe_bytes / server.keyframes:>9.0f} bytes")
+    if server.deltas:
+        print(f"delta           {server.delta_bytes / server.deltas:>9.0f} bytes")
+    for name, (messages, keyframes, size, elapsed) in zip(
+        ("fast client", "slow client"), decoded
+    ):
+        rate = size / elapsed / 2**20 if elapsed else 0
+        print(
+            f"{name:<16}{messages:>9} messages ({keyframes} keyframes), "
+            f"{rate:.1f} MiB/s"
+        )
+    print(f"slow dropped    {slow_dropped:>9} frames")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,241 @@
+"""Scaling benchmark suite with per-phase timings and a regression gate.
+
+Builds seeded headless scenarios over a sweep of ship counts, prefills a
+fixed mix of bullets and explosions, then times every phase of
+main.step() (stars, ships, bullets, deaths, effects) per tick and reports
+p50/p95/p99 in milliseconds.
+
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --baseline bench.json --threshold 0.15
+
+With --baseline the run exits with status 1 when any phase's p50 or p95
+got slower than the baseline by more than the threshold. With --world
+the sweep is replaced by one scenario loaded from a world snapshot (see
+snapshot.py), e.g. a saturated world saved with main.py --save-world.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import particles  # noqa: E402
+import settings  # noqa: E402
+import snapshot  # noqa: E402
+import state  # noqa: E402
+from bullet import Bullet  # noqa: E402
+from effects import DeathFX  # noqa: E402
+from ship import Ship, spawn  # noqa: E402
+
+SHIP_COUNTS = [10, 100, 500, 1000, 2000]
+BULLET_MIX = [("generic", 0.6), ("glide_bomb", 0.25), ("torpedo", 0.15)]
+BULLETS_PER_SHIP = 2
+DEATHS_PER_SHIP = 0.05
+FIRE_RATE = 2
+PERCENTILES = (50, 95, 99)
+
+# Phases cheaper than this are too noisy to gate on
+MIN_GATED_MS = 0.05
+
+
+def build_scenario(ships, seed, bullets_per_ship=BULLETS_PER_SHIP):
+    main.reset_world()
+    random.seed(seed)
+    particles.seed(seed)
+    settings.SHIP_FIRE_RATE = FIRE_RATE
+    main.create_starfield()
+
+    for _ in range(ships):
+        spawn(Ship())
+
+    kinds = [kind for kind, _ in BULLET_MIX]
+    weights = [weight for _, weight in BULLET_MIX]
+    for _ in range(ships * bullets_per_ship):
+        parent = random.choice(state.ships)
+        kind = random.choices(kinds, weights)[0]
+        bullet = Bullet(
+            parent,
+            parent.color,
+            parent.x,
+            parent.y,
+            random.uniform(-3, 3),
+            random.uniform(-3, 3),
+            kind=kind,
+        )
+        if kind == "glide_bomb":
+            bullet.accel_y = 0.1
+            bullet.radius = 5
+        elif kind == "torpedo":
+            bullet.radius = 4
+        state.bullets.append(bullet)
+
+    for _ in range(int(ships * DEATHS_PER_SHIP)):
+        ship = random.choice(state.ships)
+        state.deaths.append(DeathFX(ship.x, ship.y, ship.color))
+
+
+def load_scenario(path):
+    main.reset_world()
+    settings.SHIP_FIRE_RATE = FIRE_RATE
+    main.create_starfield()
+    snapshot.load(path)
+    return len(state.ships)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    last = len(sorted_values) - 1
+    return sorted_values[min(last, int(round(pct / 100 * last)))]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    return {f"p{pct}": percentile(values, pct) * 1000 for pct in PERCENTILES}
+
+
+def run_scenario(ships, ticks, warmup, seed, world=None):
+    if world is None:
+        build_scenario(ships, seed)
+    else:
+        ships = load_scenario(world)
+    for _ in range(warmup):
+        main.step()
+
+    timings = {name: [] for name, _ in main.PHASES}
+    timings["total"] = []
+    clock = time.perf_counter
+    for _ in range(ticks):
+        tick_start = clock()
+        for name, phase in main.PHASES:
+            start = clock()
+            phase()
+            state.commands.apply()
+            timings[name].append(clock() - start)
+        state.commands.end_tick()
+        timings["total"].append(clock() - tick_start)
+
+    return {
+        "ships": ships,
+        "phases": {name: summarize(samples) for name, samples in timings.items()},
+        "entities": {
+            "ships": len(state.ships),
+            "bullets": len(state.bullets),
+            "deaths": len(state.deaths),
+            "effects": len(state.effects),
+            "particles": len(state.particles),
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    # Returns a list of human readable regressions
+    regressions = []
+    old_by_ships = {s["ships"]: s for s in baseline["scenarios"]}
+    for scenario in results["scenarios"]:
+        old = old_by_ships.get(scenario["ships"])
+        if old is None:
+            continue
+        for phase, stats in scenario["phases"].items():
+            old_stats = old["phases"].get(phase)
+            if old_stats is None:
+                continue
+            for key in ("p50", "p95"):
+                before = old_stats[key]
+                after = stats[key]
+                if max(before, after) < MIN_GATED_MS:
+                    continue
+                if after > before * (1 + threshold):
+                    regressions.append(
+                        f"{scenario['ships']} ships {phase} {key}: "
+                        f"{before:.3f} ms -> {after:.3f} ms "
+                        f"(+{(after / before - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def print_table(results):
+    phases = [name for name, _ in main.PHASES] + ["total"]
+    header = f"{'ships':>6} " + " ".join(f"{name:>20}" for name in phases)
+    print("per-tick ms as p50/p95/p99")
+    print(header)
+    for scenario in results["scenarios"]:
+        cells = []
+        for name in phases:
+            s = scenario["phases"][name]
+            cells.append(f"{s['p50']:.2f}/{s['p95']:.2f}/{s['p99']:.2f}".rjust(20))
+        print(f"{scenario['ships']:>6} " + " ".join(cells))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--ships",
+        type=int,
+        nargs="+",
+        default=SHIP_COUNTS,
+        help="ship counts to sweep",
+    )
+    parser.add_argument("--ticks", type=int, default=200, help="measured ticks")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured ticks")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--world", help="run one scenario from this world snapshot instead"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="allowed slowdown vs baseline as a fraction (default 0.15)",
+    )
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "ticks": args.ticks,
+        "seed": args.seed,
+        "scenarios": [],
+    }
+    for ships in [None] if args.world else args.ships:
+        results["scenarios"].append(
+            run_scenario(ships, args.ticks, args.warmup, args.seed, args.world)
+        )
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("no regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
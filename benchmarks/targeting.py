@@ -0,0 +1,95 @@
+"""Targeting query benchmark.
+
+Every ship retargets once per tick, the worst case for targeting.py, and
+the cost per tick is reported for each query against a linear scan over
+state.ships as the reference point.
+
+    python -m benchmarks.targeting
+"""
+
+import math
+import random
+import time
+
+import pygame
+
+import state
+import targeting
+import utils
+from ship import Ship, spawn
+
+COUNTS = [100, 500, 1000, 2000, 4000]
+TICKS = 5
+
+
+def linear_nearest(ship):
+    best = None
+    best_d2 = math.inf
+    for other in state.ships:
+        if other is ship:
+            continue
+        d2 = utils.distance_squared(ship.x, ship.y, other.x, other.y)
+        if d2 < best_d2:
+            best, best_d2 = other, d2
+    return best
+
+
+def sqrt_weapon(ship):
+    # The pre-targeting weapon choice: a sqrt per shot
+    target = targeting.random_enemy(ship)
+    distance = utils.distance(ship.x, ship.y, target.x, target.y)
+    for limit, weapon in targeting.WEAPON_BANDS:
+        if distance < math.sqrt(limit):
+            return weapon
+    return targeting.FALLBACK_WEAPON
+
+
+def squared_weapon(ship):
+    target = targeting.random_enemy(ship)
+    d2 = utils.distance_squared(ship.x, ship.y, target.x, target.y)
+    return targeting.weapon_for(d2)
+
+
+QUERIES = [
+    ("nearest", targeting.nearest_enemy),
+    ("4-nearest", lambda ship: targeting.nearest_enemies(ship, 4)),
+    ("laser range", lambda ship: targeting.random_enemy_within(ship, 500)),
+    ("in_range", targeting.in_range_enemy),
+    ("weapon sqrt", sqrt_weapon),
+    ("weapon d2", squared_weapon),
+    ("linear nearest", linear_nearest),
+]
+
+
+def populate(count):
+    state.ships.clear()
+    state.ship_grid.clear()
+    for _ in range(count):
+        spawn(Ship())
+
+
+def main():
+    random.seed(1)
+    state.screen = pygame.Surface((3440, 1440))
+
+    print("ms per tick with every ship retargeting")
+    print(f"{'ships':>6} " + " ".join(f"{name:>14}" for name, _ in QUERIES))
+    for count in COUNTS:
+        populate(count)
+        ships = list(state.ships)
+        cells = []
+        for name, query in QUERIES:
+            if name == "linear nearest" and count > 1000:
+                cells.append(f"{'-':>14}")  # quadratic, too slow to bother
+                continue
+            start = time.perf_counter()
+            for _ in range(TICKS):
+                for ship in ships:
+                    query(ship)
+            ms = (time.perf_counter() - start) / TICKS * 1000
+            cells.append(f"{ms:>14.2f}")
+        print(f"{count:>6} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,184 +1,344 @@
+"""Bullets, torpedoes and glide bombs.
+
+state.bullets is a ColumnStore: every bullet's motion, kind, owner and
+timers live in NumPy columns, and update_all() advances all of them at
+once each tick: integration, hits against every ship, glide bomb trails
+and culling of bullets that left the world. Only bullets that hit
+something or leave, and the few drawn as sprites, are touched one by one;
+their kills go through state.commands like every other (see commands.py).
+Bullet objects read and write their row through Column attributes, and
+can still move and collide on their own before they are added (a fresh
+volley's first step).
+
+Hits are found against the ships as they were when bullets started
+moving. A ship hit by several bullets in one tick dies once and the
+other bullets fly on.
+"""
+
 import math
 import random
-import pygame
 
+import numpy as np
+
+import drawlist
+import particles
+import settings
 import state
+import timestep
 from effects import TrailSmokeFX
-from utils import find_collision, is_outside_screen_area
+from entities import Column, next_uid
+from grid import first_overlaps
+from pool import Pool
+from utils import find_collision, interpolated
+
+
+# Cosmetic randomness stays off the simulation RNG (see ship.flicker)
+flicker = random.Random()
+
+# Values of the kind_id column
+KIND_IDS = {"generic": 0, "torpedo": 1, "glide_bomb": 2}
+GENERIC = KIND_IDS["generic"]
+GLIDE_BOMB = KIND_IDS["glide_bomb"]
+
+
+def torpedo_model(radius, colors):
+    color, flame_color = colors
+
+    # Oriented small rocket sprite
+    size = max(4, int(radius * 3))
+    length = size * 3
+    width = max(3, int(size * 0.7))
+    nose_len = max(3, int(size * 0.8))
+    fin_len = max(3, int(size * 0.6))
+
+    # Model-space points (pointing +X)
+    nose = (length / 2, 0)
+    back = (-length / 2, 0)
+    body = [
+        (back[0], -width / 2),
+        (length / 2 - nose_len, -width / 2),
+        (nose[0], 0),
+        (length / 2 - nose_len, width / 2),
+        (back[0], width / 2),
+    ]
+    fin_top = [
+        (back[0], -width / 2),
+        (back[0] - fin_len, 0),
+        (back[0], -width / 3),
+    ]
+    fin_bot = [
+        (back[0], width / 2),
+        (back[0] - fin_len, 0),
+        (back[0], width / 3),
+    ]
+
+    polygons = [
+        (body, color, 0),
+        (body, "white", 1),
+        (fin_top, color, 0),
+        (fin_bot, color, 0),
+    ]
+    circles = [((back[0] - 2, 0), flame_color, max(2, int(size * 0.4)))]
+    return polygons, circles
+
+
+def glide_bomb_model(radius, color):
+    # Short, chunky bomb with fins and a colored stripe
+    size = max(5, int(radius * 3))
+    length = int(size * 2.2)
+    width = max(4, int(size * 0.9))
+    nose_len = max(3, int(size * 0.7))
+    tail_len = max(3, int(size * 0.6))
+
+    # Model-space (pointing +X)
+    nose = (length / 2, 0)
+    back = (-length / 2, 0)
+    body = [
+        (back[0] + tail_len, -width / 2),
+        (length / 2 - nose_len, -width / 2),
+        (nose[0], 0),
+        (length / 2 - nose_len, width / 2),
+        (back[0] + tail_len, width / 2),
+    ]
+    # Tail fins (cross style)
+    fin_top = [
+        (back[0] + tail_len, -width / 2),
+        (back[0] - tail_len, 0),
+        (back[0] + tail_len, -width / 3),
+    ]
+    fin_bot = [
+        (back[0] + tail_len, width / 2),
+        (back[0] - tail_len, 0),
+        (back[0] + tail_len, width / 3),
+    ]
+    # Stripe along the side
+    stripe = [
+        (back[0] + tail_len * 0.2, -width * 0.18),
+        (length / 2 - nose_len - 1, -width * 0.18),
+        (length / 2 - nose_len - 1, width * 0.18),
+        (back[0] + tail_len * 0.2, width * 0.18),
+    ]
+
+    # Colors
+    body_color = (80, 80, 80)
+    outline_color = (230, 230, 230)
+
+    polygons = [
+        (body, body_color, 0),
+        (body, outline_color, 1),
+        (fin_top, body_color, 0),
+        (fin_bot, body_color, 0),
+        (stripe, color, 0),
+    ]
+    return polygons, []
 
 
 class Bullet:
+    # Kept in state.bullets' columns while the bullet is live
+    x = Column(np.float64)
+    y = Column(np.float64)
+    prev_x = Column(np.float64)
+    prev_y = Column(np.float64)
+    vx = Column(np.float64)
+    vy = Column(np.float64)
+    accel_x = Column(np.float64)
+    accel_y = Column(np.float64)
+    _angle = Column(np.float64)
+    _ticks = Column(np.int32)
+    radius = Column(np.int32)
+    color_id = Column(np.int16)
+    kind_id = Column(np.int8)
+    owner = Column(np.int64)  # uid of the parent ship, 0 for none
+    uid = Column(np.int64)
+    _store = None
+
     def __init__(self, parent, color, x, y, vx, vy, ax=0, ay=0, kind="generic"):
+        self.reset(parent, color, x, y, vx, vy, ax, ay, kind)
+
+    def reset(self, parent, color, x, y, vx, vy, ax=0, ay=0, kind="generic"):
+        # Shared by __init__ and Bullet.pool.acquire()
+        self.uid = next_uid()
         self.parent = parent
+        self.owner = parent.uid if parent is not None else 0
         self.radius = 1
         self.color = color
+        self.color_id = particles.color_id(color)
         self.x = x
         self.y = y
+        self.prev_x = x
+        self.prev_y = y
         self.vx = vx
         self.vy = vy
         self.accel_x = ax
         self.accel_y = ay
         self.kind = kind
+        self.kind_id = KIND_IDS[kind]
         self._angle = 0.0
         self._ticks = 0
 
-    def draw(self):
-        if self.kind == "torpedo":
-            # Oriented small rocket sprite
-            if self.vx != 0 or self.vy != 0:
-                self._angle = math.atan2(self.vy, self.vx)
-
-            size = max(4, int(self.radius * 3))
-            length = size * 3
-            width = max(3, int(size * 0.7))
-            nose_len = max(3, int(size * 0.8))
-            fin_len = max(3, int(size * 0.6))
-
-            # Model-space points (pointing +X)
-            nose = (length / 2, 0)
-            back = (-length / 2, 0)
-            body = [
-                (back[0], -width / 2),
-                (length / 2 - nose_len, -width / 2),
-                (nose[0], 0),
-                (length / 2 - nose_len, width / 2),
-                (back[0], width / 2),
-            ]
-            fin_top = [
-                (back[0], -width / 2),
-                (back[0] - fin_len, 0),
-                (back[0], -width / 3),
-            ]
-            fin_bot = [
-                (back[0], width / 2),
-                (back[0] - fin_len, 0),
-                (back[0], width / 3),
-            ]
-
-            c = math.cos(self._angle)
-            s = math.sin(self._angle)
-
-            def xf(pt):
-                px, py = pt
-                rx = px * c - py * s
-                ry = px * s + py * c
-                return (int(self.x + rx), int(self.y + ry))
-
-            body_pts = list(map(xf, body))
-            fin_top_pts = list(map(xf, fin_top))
-            fin_bot_pts = list(map(xf, fin_bot))
-            tail_pos = xf((back[0] - 2, 0))
-
-            # Draw body
-            pygame.draw.polygon(state.screen, self.color, body_pts)
-            pygame.draw.polygon(state.screen, "white", body_pts, 1)
-            pygame.draw.polygon(state.screen, self.color, fin_top_pts)
-            pygame.draw.polygon(state.screen, self.color, fin_bot_pts)
-
-            # Exhaust flame flicker
-            flame_color = random.choice(["orange", "yellow", "red"]) if (self.vx or self.vy) else "gray"
-            pygame.draw.circle(state.screen, flame_color, tail_pos, max(2, int(size * 0.4)))
-        elif self.kind == "glide_bomb":
-            # Short, chunky bomb with fins and a colored stripe; oriented to velocity
-            if self.vx != 0 or self.vy != 0:
-                self._angle = math.atan2(self.vy, self.vx)
-
-            size = max(5, int(self.radius * 3))
-            length = int(size * 2.2)
-            width = max(4, int(size * 0.9))
-            nose_len = max(3, int(size * 0.7))
-            tail_len = max(3, int(size * 0.6))
-
-            # Model-space (pointing +X)
-            nose = (length / 2, 0)
-            back = (-length / 2, 0)
-            body = [
-                (back[0] + tail_len, -width / 2),
-                (length / 2 - nose_len, -width / 2),
-                (nose[0], 0),
-                (length / 2 - nose_len, width / 2),
-                (back[0] + tail_len, width / 2),
-            ]
-            # Tail fins (cross style)
-            fin_top = [
-                (back[0] + tail_len, -width / 2),
-                (back[0] - tail_len, 0),
-                (back[0] + tail_len, -width / 3),
-            ]
-            fin_bot = [
-                (back[0] + tail_len, width / 2),
-                (back[0] - tail_len, 0),
-                (back[0] + tail_len, width / 3),
-            ]
-            # Stripe along the side
-            stripe = [
-                (back[0] + tail_len * 0.2, -width * 0.18),
-                (length / 2 - nose_len - 1, -width * 0.18),
-                (length / 2 - nose_len - 1, width * 0.18),
-                (back[0] + tail_len * 0.2, width * 0.18),
-            ]
-
-            c = math.cos(self._angle)
-            s = math.sin(self._angle)
-
-            def xf(pt):
-                px, py = pt
-                rx = px * c - py * s
-                ry = px * s + py * c
-                return (int(self.x + rx), int(self.y + ry))
-
-            body_pts = list(map(xf, body))
-            fin_top_pts = list(map(xf, fin_top))
-            fin_bot_pts = list(map(xf, fin_bot))
-            stripe_pts = list(map(xf, stripe))
-
-            # Colors
-            body_color = (80, 80, 80)
-            outline_color = (230, 230, 230)
-
-            # Draw
-            pygame.draw.polygon(state.screen, body_color, body_pts)
-            pygame.draw.polygon(state.screen, outline_color, body_pts, 1)
-            pygame.draw.polygon(state.screen, body_color, fin_top_pts)
-            pygame.draw.polygon(state.screen, body_color, fin_bot_pts)
-            pygame.draw.polygon(state.screen, self.color, stripe_pts)
+    def render(self):
+        camera = state.camera
+        x, y = camera.to_screen(*interpolated(self))
+        if self.kind == "torpedo" or self.kind == "glide_bomb":
+            # Oriented to velocity, drawn from the rotated sprite cache
+            if self.kind == "torpedo":
+                # Exhaust flame flicker
+                flame_color = (
+                    flicker.choice(["orange", "yellow", "red"])
+                    if (self.vx or self.vy)
+                    else "gray"
+                )
+                color, model = (self.color, flame_color), torpedo_model
+            else:
+                color, model = self.color, glide_bomb_model
+
+            state.sprites.push(
+                state.draw_list,
+                drawlist.BULLETS,
+                self.kind,
+                color,
+                camera.scale(self.radius),
+                self._angle,
+                x,
+                y,
+                model,
+            )
         else:
-            pygame.draw.circle(state.screen, self.color, (self.x, self.y), self.radius)
+            radius = camera.scale(self.radius)
+            state.draw_list.circle(drawlist.BULLETS, self.color_id, x, y, radius)
 
-    def move(self):
+    def integrate(self):
         self.vx += self.accel_x
         self.vy += self.accel_y
         self.x += self.vx
         self.y += self.vy
-        self.draw()
+        if self.vx != 0 or self.vy != 0:
+            self._angle = math.atan2(self.vy, self.vx)
 
+    def collide(self):
         ship = find_collision(self.x, self.y, self.parent)
-        if ship:
-            ship.destroy()
+        if ship and ship.destroy():
             self.destroy()
 
+    def move(self):
+        self.integrate()
+        self.collide()
+
     def destroy(self):
-        if self in state.bullets:
-            state.bullets.remove(self)
-
-    def tick(self):
-        self.move()
-
-        # Emit subtle smoke puffs for gliding bombs
-        if self.kind == "glide_bomb":
-            self._ticks += 1
-            if self._ticks % 3 == 0:  # every few frames
-                dir_x, dir_y = -self.vx, -self.vy
-                mag = math.hypot(dir_x, dir_y)
-                if mag != 0:
-                    ux, uy = dir_x / mag, dir_y / mag
-                else:
-                    ux, uy = -1.0, 0.0
-                # Offset a bit behind the bomb
-                back_offset = self.radius * 1.5
-                sx = self.x + ux * back_offset
-                sy = self.y + uy * back_offset
-                state.effects.append(TrailSmokeFX(sx, sy, ux, uy, strength=0.6))
-
-        if is_outside_screen_area(self.x, self.y):
-            self.destroy()
+        state.commands.kill(self)
+
+    def despawn(self):
+        # Called by state.commands at the next sync point
+        if state.bullets.discard(self):
+            self.parent = None  # don't keep dead ships alive from the pool
+            Bullet.pool.release(self)
+
+
+Bullet.pool = Pool(Bullet, settings.BULLET_POOL_CAP, settings.POOLING)
+
+
+def integrate_all():
+    """Move every bullet one tick, as Bullet.integrate does."""
+    store = state.bullets
+    x, y = store.view("x"), store.view("y")
+    vx, vy = store.view("vx"), store.view("vy")
+    store.view("prev_x")[:] = x
+    store.view("prev_y")[:] = y
+    vx += store.view("accel_x")
+    vy += store.view("accel_y")
+    x += vx
+    y += vy
+    moving = np.flatnonzero((vx != 0) | (vy != 0))
+    store.view("_angle")[moving] = np.arctan2(vy[moving], vx[moving])
+
+
+def collide_all():
+    """Return (bullet, ship) pairs for every bullet inside a ship."""
+    store = state.bullets
+    # Ships as gathered for this tick, in fleet order
+    table = state.ship_table
+    ships = table.ships
+    sx, sy, sr = table.column("x"), table.column("y"), table.column("radius")
+    hits = first_overlaps(
+        store.view("x"), store.view("y"), store.view("owner"), sx, sy, sr, table.uids
+    )
+    rows = np.flatnonzero(hits >= 0)
+    return list(zip(store.at(rows), [ships[i] for i in hits[rows].tolist()]))
+
+
+def apply_hits(hits):
+    # A ship hit twice in one tick dies once; the second bullet flies on
+    for bullet, ship in hits:
+        if ship.destroy():
+            bullet.destroy()
+
+
+def trail_all():
+    """Advance glide bomb trail timers and puff smoke for those due."""
+    store = state.bullets
+    ticks = store.view("_ticks")
+    glide = store.view("kind_id") == GLIDE_BOMB
+    ticks[glide] += 1
+    # A puff every trail interval, less often at lower quality
+    interval = timestep.ticks(state.quality.trail_interval)
+    due = np.flatnonzero(glide & (ticks % interval == 0))
+    if not len(due):
+        return
+    dir_x = -store.view("vx")[due]
+    dir_y = -store.view("vy")[due]
+    mag = np.sqrt(dir_x * dir_x + dir_y * dir_y)
+    still = mag == 0
+    mag[still] = 1.0
+    ux = np.where(still, -1.0, dir_x / mag)
+    uy = np.where(still, 0.0, dir_y / mag)
+    # Offset a bit behind the bomb
+    back = store.view("radius")[due] * 1.5
+    sx = store.view("x")[due] + ux * back
+    sy = store.view("y")[due] + uy * back
+    TrailSmokeFX.emit_many(sx, sy, ux, uy, strength=0.6)
+
+
+def outside_all():
+    """Bullets that left the world."""
+    store = state.bullets
+    out = state.world.outside(store.view("x"), store.view("y"))
+    return store.at(np.flatnonzero(out))
+
+
+def update_all():
+    """Advance every bullet one tick; see the module docstring."""
+    if not state.bullets:
+        return
+    integrate_all()
+    hits = collide_all()
+    trail_all()
+    gone = outside_all()
+    apply_hits(hits)
+    for bullet in gone:
+        bullet.destroy()
+
+
+def render_all(draw_list, camera, alpha=1.0):
+    # Plain bullets in view go to the draw list as one bulk circle batch,
+    # alpha of the way from their previous positions; sprites in view draw
+    # one by one
+    store = state.bullets
+    if not store:
+        return
+    generic = store.view("kind_id") == GENERIC
+    px = store.view("prev_x")[generic]
+    py = store.view("prev_y")[generic]
+    keep, sx, sy, sr = camera.project(
+        px + (store.view("x")[generic] - px) * alpha,
+        py + (store.view("y")[generic] - py) * alpha,
+        store.view("radius")[generic],
+    )
+    draw_list.circles(
+        drawlist.BULLETS, sx, sy, sr, store.view("color_id")[generic][keep]
+    )
+    # Sprites reach about three radii from their center
+    sprites = ~generic & camera.visible_mask(
+        store.view("x"), store.view("y"), store.view("radius") * 3
+    )
+    for bullet in store.at(np.flatnonzero(sprites)):
+        bullet.render()
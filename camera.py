@@ -0,0 +1,140 @@
+"""Viewport onto the world: pan, zoom, culling and world-to-screen mapping.
+
+Render code works in world coordinates and asks the camera where (and
+whether) things land on screen: visible() or visible_mask() first, so
+entities out of view cost no sprite lookups or draw commands, then
+to_screen() or project() for the screen position. The simulation never
+looks at the camera; entities out of view keep moving and fighting.
+
+Zoom moves in settings.CAMERA_ZOOM_STEP steps, so sprites baked per size
+(see sprites.py) stay few. While the zoomed view is smaller than the
+world it is kept inside it; otherwise the world is centered.
+"""
+
+import numpy as np
+import pygame
+
+import settings
+
+PAN_KEYS = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1),
+}
+ZOOM_KEYS = {
+    pygame.K_PLUS: 1,
+    pygame.K_EQUALS: 1,
+    pygame.K_KP_PLUS: 1,
+    pygame.K_MINUS: -1,
+    pygame.K_KP_MINUS: -1,
+}
+# Keys that only move the view; main.handle_events ignores them
+KEYS = frozenset(PAN_KEYS) | frozenset(ZOOM_KEYS) | {pygame.K_HOME}
+
+
+class Camera:
+    def __init__(self, view_size, world_size):
+        self.view_width, self.view_height = view_size
+        self.world_width, self.world_height = world_size
+        self.reset()
+
+    def reset(self):
+        # 1:1 zoom, centered on the world
+        self.level = 0
+        self.zoom = 1.0
+        self.x = self.world_width / 2
+        self.y = self.world_height / 2
+        self._update()
+
+    def _update(self):
+        # Keep the view inside the world on each axis where it fits, then
+        # cache the visible world rectangle
+        half_w = self.view_width / (2 * self.zoom)
+        half_h = self.view_height / (2 * self.zoom)
+        self.x = self._clamp(self.x, half_w, self.world_width)
+        self.y = self._clamp(self.y, half_h, self.world_height)
+        self.left = self.x - half_w
+        self.top = self.y - half_h
+        self.right = self.x + half_w
+        self.bottom = self.y + half_h
+
+    @staticmethod
+    def _clamp(center, half, extent):
+        if 2 * half >= extent:
+            return extent / 2
+        return min(max(center, half), extent - half)
+
+    def pan(self, dx, dy):
+        # Move by screen pixels
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self._update()
+
+    def center_on(self, x, y):
+        self.x = x
+        self.y = y
+        self._update()
+
+    def zoom_by(self, steps):
+        lo, hi = settings.CAMERA_ZOOM_RANGE
+        self.level = min(max(self.level + steps, lo), hi)
+        self.zoom = settings.CAMERA_ZOOM_STEP**self.level
+        self._update()
+
+    def control(self, events, seconds):
+        """Apply view keys and the mouse wheel from events, plus held
+        arrow keys over the last frame's duration."""
+        for event in events:
+            if event.type == pygame.MOUSEWHEEL:
+                self.zoom_by(event.y)
+            elif event.type == pygame.KEYDOWN:
+                if event.key in ZOOM_KEYS:
+                    self.zoom_by(ZOOM_KEYS[event.key])
+                elif event.key == pygame.K_HOME:
+                    self.reset()
+        pressed = pygame.key.get_pressed()
+        dx = dy = 0
+        for key, (x, y) in PAN_KEYS.items():
+            if pressed[key]:
+                dx += x
+                dy += y
+        if dx or dy:
+            step = settings.CAMERA_PAN_SPEED * seconds
+            self.pan(dx * step, dy * step)
+
+    def visible(self, x, y, margin=0):
+        """Whether anything within margin world pixels of (x, y) is in view."""
+        return (
+            self.left - margin <= x < self.right + margin
+            and self.top - margin <= y < self.bottom + margin
+        )
+
+    def visible_mask(self, x, y, margin=0):
+        # Vectorized visible() over arrays; margin may be an array too
+        return (
+            (x >= self.left - margin)
+            & (x < self.right + margin)
+            & (y >= self.top - margin)
+            & (y < self.bottom + margin)
+        )
+
+    def to_screen(self, x, y):
+        return (x - self.left) * self.zoom, (y - self.top) * self.zoom
+
+    def scale(self, length):
+        # World length in screen pixels, at least one
+        return max(1, int(length * self.zoom))
+
+    def project(self, x, y, radius):
+        """Bulk culling for circles given as arrays.
+
+        Returns the mask of circles in view and their screen x, y and
+        radius as int32 arrays, for draw_list.circles().
+        """
+        keep = self.visible_mask(x, y, radius)
+        zoom = self.zoom
+        sx = ((x[keep] - self.left) * zoom).astype(np.int32)
+        sy = ((y[keep] - self.top) * zoom).astype(np.int32)
+        sr = np.maximum(1, (radius[keep] * zoom).astype(np.int32))
+        return keep, sx, sy, sr
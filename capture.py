@@ -0,0 +1,274 @@
+"""Frame capture to a PNG sequence or a raw video pipe, off the main loop.
+
+main.py --capture TARGET records every drawn frame: a directory gets a
+PNG sequence (frame_000000.png, ...), and "|command" pipes raw frames to
+a subprocess, e.g. an encoder:
+
+    --capture "|ffmpeg -f rawvideo -pixel_format {pixel_format}
+               -video_size {width}x{height} -framerate {fps} -i - run.mp4"
+
+All the frame loop does is grab(): one copy of the finished frame out of
+the surface's pixel buffer into a slot of a ring of preallocated buffers
+(settings.CAPTURE_RING). Worker threads turn slots into PNG files
+(settings.CAPTURE_WORKERS of them, compressing with zlib, which runs
+without the GIL) or write them to the pipe in order, then hand the slot
+back. At 3440x1440 the copy is a few milliseconds; saving the surface
+from the loop would be a hundred or more.
+
+When the encoder falls behind the ring runs out of free slots, and:
+
+- a real-time loop (the window) drops the frame rather than wait. A PNG
+  sequence keeps frame numbers, so drops show as gaps; a pipe writes the
+  next captured frame once more for every frame dropped before it, so
+  the video keeps the session's real length.
+- the headless loop waits for a slot instead, since nothing there runs
+  against the clock, so it never drops.
+"""
+
+import os
+import queue
+import shlex
+import struct
+import subprocess
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import settings
+
+clock = time.perf_counter
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(kind, data):
+    return b"".join(
+        (
+            struct.pack(">I", len(data)),
+            kind,
+            data,
+            struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))),
+        )
+    )
+
+
+class FrameCapture:
+    """Ring of frame buffers drained by worker threads; see the module
+    docstring. Subclasses implement _encode(index, repeats, slot)."""
+
+    workers = 1
+
+    def __init__(self, ring=None, block=False):
+        self.ring = ring or settings.CAPTURE_RING
+        self.block = block
+        self.free = queue.Queue()
+        self.filled = queue.Queue()
+        self.threads = []
+        self.size = None
+        self.pitch = 0
+        self.channels = None  # byte offsets of red, green and blue
+        self.alpha = False
+        self.error = None
+        self.index = 0  # frame number of the next grab
+        self.skipped = 0  # dropped since the last captured frame
+        # Stats
+        self.captured = 0
+        self.dropped = 0
+        self.copy_ms = 0.0
+        self.last_copy_ms = 0.0
+        self.max_copy_ms = 0.0
+        self.wait_ms = 0.0  # blocked on a free slot, headless only
+        self.encode_ms = 0.0
+        self.encoded = 0
+
+    def _start(self, surface):
+        # Sized from the first frame: the ring and the pixel layout
+        if surface.get_bytesize() != 4:
+            raise ValueError("frame capture needs a 32-bit surface")
+        self.size = surface.get_size()
+        self.pitch = surface.get_pitch()
+        shifts = surface.get_shifts()
+        self.channels = [shift // 8 for shift in shifts[:3]]
+        self.alpha = bool(surface.get_masks()[3])
+        for _ in range(self.ring):
+            self.free.put(np.empty(self.pitch * self.size[1], np.uint8))
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"capture-{i}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def grab(self, surface):
+        """Copy the finished frame on surface into the ring."""
+        start = clock()
+        if self.size is None:
+            self._start(surface)
+        elif surface.get_size() != self.size:
+            raise ValueError("frame size changed during capture")
+        index = self.index
+        self.index += 1
+        try:
+            slot = self.free.get(block=self.block)
+        except queue.Empty:
+            self.skipped += 1
+            self.dropped += 1
+            return
+        copied = clock()
+        self.wait_ms += (copied - start) * 1000
+        buffer = surface.get_buffer()
+        np.copyto(slot, np.frombuffer(buffer, np.uint8))
+        del buffer  # unlocks the surface
+        self.filled.put((index, 1 + self.skipped, slot))
+        self.skipped = 0
+        self.captured += 1
+        ms = (clock() - copied) * 1000
+        self.last_copy_ms = ms
+        self.copy_ms += ms
+        self.max_copy_ms = max(self.max_copy_ms, ms)
+
+    def queued(self):
+        return self.filled.qsize()
+
+    def pixels(self, slot):
+        # The slot as a (height, width, 4) view, without any row padding
+        width, height = self.size
+        return slot.reshape(height, self.pitch)[:, : width * 4].reshape(
+            height, width, 4
+        )
+
+    def _work(self):
+        while True:
+            item = self.filled.get()
+            if item is None:
+                return
+            index, repeats, slot = item
+            start = clock()
+            try:
+                if self.error is None:
+                    self._encode(index, repeats, slot)
+            except OSError as error:
+                # Keep draining so the frame loop never waits on a dead sink
+                self.error = error
+            finally:
+                self.free.put(slot)
+            self.encode_ms += (clock() - start) * 1000
+            self.encoded += 1
+
+    def _encode(self, index, repeats, slot):
+        raise NotImplementedError
+
+    def close(self):
+        # Finish every queued frame, then stop the workers
+        for _ in self.threads:
+            self.filled.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def stats(self):
+        # (captured, dropped, queued, copy ms last frame, encode ms average)
+        encode = self.encode_ms / self.encoded if self.encoded else 0.0
+        return self.captured, self.dropped, self.queued(), self.last_copy_ms, encode
+
+    def summary(self):
+        copy = self.copy_ms / self.captured if self.captured else 0.0
+        encode = self.encode_ms / self.encoded if self.encoded else 0.0
+        text = (
+            f"captured {self.captured} frames, dropped {self.dropped}; copy "
+            f"{copy:.2f} ms/frame (worst {self.max_copy_ms:.2f}), encode "
+            f"{encode:.1f} ms/frame on {self.workers} thread(s)"
+        )
+        if self.block:
+            text += f"; waited {self.wait_ms / 1000:.1f} s for encoders"
+        if self.error is not None:
+            text += f"; failed: {self.error}"
+        return text
+
+
+class PngSequence(FrameCapture):
+    """Numbered PNG files in a directory, encoded by several threads."""
+
+    def __init__(self, directory, ring=None, workers=None, level=None, block=False):
+        super().__init__(ring, block)
+        self.directory = directory
+        self.workers = workers or settings.CAPTURE_WORKERS
+        self.level = settings.CAPTURE_PNG_LEVEL if level is None else level
+        os.makedirs(directory, exist_ok=True)
+
+    def _encode(self, index, repeats, slot):
+        width, height = self.size
+        # 8-bit RGB rows, each behind a filter type byte of 0; a strided
+        # copy per channel is several times faster than fancy indexing
+        rows = np.zeros((height, 1 + width * 3), np.uint8)
+        rgb = rows[:, 1:].reshape(height, width, 3)
+        pixels = self.pixels(slot)
+        for i, offset in enumerate(self.channels):
+            rgb[:, :, i] = pixels[:, :, offset]
+        header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+        data = b"".join(
+            (
+                PNG_SIGNATURE,
+                _png_chunk(b"IHDR", header),
+                _png_chunk(b"IDAT", zlib.compress(rows, self.level)),
+                _png_chunk(b"IEND", b""),
+            )
+        )
+        path = os.path.join(self.directory, f"frame_{index:06d}.png")
+        with open(path, "wb") as file:
+            file.write(data)
+
+
+class RawPipe(FrameCapture):
+    """Raw frames, in order, to the standard input of a subprocess.
+
+    The command is formatted with {width}, {height}, {fps} and
+    {pixel_format} (ffmpeg's name for the surface's byte order, e.g.
+    bgr0) before it runs.
+    """
+
+    def __init__(self, command, fps, ring=None, block=False):
+        super().__init__(ring, block)
+        self.command = command
+        self.fps = fps
+        self.process = None
+
+    def _start(self, surface):
+        super()._start(surface)
+        names = ["0"] * 4
+        for name, offset in zip("rgb", self.channels):
+            names[offset] = name
+        if self.alpha:
+            names[names.index("0")] = "a"
+        width, height = self.size
+        command = self.command.format(
+            width=width, height=height, fps=self.fps, pixel_format="".join(names)
+        )
+        self.process = subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+
+    def _encode(self, index, repeats, slot):
+        pixels = self.pixels(slot)
+        if self.pitch != self.size[0] * 4:
+            pixels = np.ascontiguousarray(pixels)
+        data = memoryview(pixels).cast("B")
+        for _ in range(repeats):
+            self.process.stdin.write(data)
+
+    def close(self):
+        super().close()
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            self.process.wait()
+            self.process = None
+
+
+def create(target, fps, block=False):
+    # "|command" pipes raw frames, anything else is a PNG directory
+    if target.startswith("|"):
+        return RawPipe(target[1:].strip(), fps, block=block)
+    return PngSequence(target, block=block)
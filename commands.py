@@ -0,0 +1,87 @@
+"""Deferred spawns and kills, applied at sync points between phases.
+
+Entities created or destroyed during a tick don't touch the world right
+away: spawn() and kill() queue them, and main.step() calls apply() before
+the first phase and after every phase. Until then every store holds
+exactly what it held when the phase started, so phases can loop over
+them (and over arrays built from them) without copying, and collision
+results stay valid while hits are being applied.
+
+kill() drops repeats, so a ship hit by two bullets in one phase dies
+once: one explosion, one replacement. Its return value tells the caller
+whether the kill was new, e.g. to let the second bullet fly on.
+
+Effects go through the queue too: explosions and emitters are spawned
+with their store's append and expire with a kill, and queued(), counting
+spawns not applied yet, keeps settings.MAX_EFFECTS exact in between.
+"""
+
+
+class CommandQueue:
+    """Spawns and kills queued this tick, in the order they were asked for.
+
+    apply() adds every queued spawn, then despawns every queued kill by
+    calling its despawn() method, and repeats until nothing is left, so
+    replacements queued by a despawn come in at the same sync point. A
+    spawn that is also killed (a bullet that hits on its first step) is
+    added and despawned in the same apply.
+
+    counts holds the operations queued since the last end_tick(), and
+    last_tick the counts of the tick before.
+    """
+
+    def __init__(self):
+        self._spawns = []  # (entity, add)
+        self._queued = {}  # add -> spawns queued for it
+        self._kills = {}  # entity -> None; a dict keeps order and dedupes
+        self.counts = self._zero()
+        self.last_tick = self._zero()
+
+    @staticmethod
+    def _zero():
+        return {"spawns": 0, "kills": 0, "repeats": 0}
+
+    def __len__(self):
+        return len(self._spawns) + len(self._kills)
+
+    def spawn(self, entity, add):
+        """Queue `add(entity)`, e.g. state.bullets.append or ship.spawn."""
+        self._spawns.append((entity, add))
+        self._queued[add] = self._queued.get(add, 0) + 1
+        self.counts["spawns"] += 1
+        return entity
+
+    def queued(self, add):
+        """How many spawns for `add` are waiting, e.g. to respect a cap."""
+        return self._queued.get(add, 0)
+
+    def kill(self, entity):
+        """Queue entity.despawn(); returns False if it was already queued."""
+        if entity in self._kills:
+            self.counts["repeats"] += 1
+            return False
+        self._kills[entity] = None
+        self.counts["kills"] += 1
+        return True
+
+    def apply(self):
+        while self._spawns or self._kills:
+            spawns, self._spawns = self._spawns, []
+            self._queued = {}
+            for entity, add in spawns:
+                add(entity)
+            kills, self._kills = self._kills, {}
+            for entity in kills:
+                entity.despawn()
+
+    def end_tick(self):
+        self.last_tick = self.counts
+        self.counts = self._zero()
+
+    def clear(self):
+        # Drop everything queued, e.g. between benchmark scenarios
+        self._spawns.clear()
+        self._queued.clear()
+        self._kills.clear()
+        self.counts = self._zero()
+        self.last_tick = self._zero()
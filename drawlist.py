@@ -0,0 +1,147 @@
+"""Deferred drawing through a per-frame command buffer.
+
+Entities don't draw while rendering; they push compact commands (blit,
+polygon, line, circle) with colors already resolved to palette indices
+(particles.color_id) into an int32 array. Particles and stars hand over
+whole coordinate arrays instead. At the end of the frame flush() sorts
+everything by layer and primitive, executes each run as one batch
+(Surface.blits for sprites, a vectorized splat for filled circles) and
+reports what it drew to the renderer for dirty-rect tracking.
+
+Within a layer the primitive order is fixed, so only the layer decides
+what ends up on top; push to a higher layer to draw over something.
+"""
+
+from array import array
+
+import numpy as np
+import pygame
+
+import particles
+
+# Layers, back to front
+STARS, SHIPS, BEAMS, BULLETS, EXPLOSIONS, PARTICLES = range(6)
+
+# Primitives, in the order they run within a layer; DISCS are bulk arrays
+BLIT, POLYGON, LINE, CIRCLE, DISCS = range(5)
+PRIMITIVES = ("blit", "polygon", "line", "circle", "disc")
+
+# Command columns; for circles X1 is the radius, for blits and polygons
+# it indexes the surface or point list in DrawList.objects
+LAYER, PRIM, COLOR, WIDTH, X0, Y0, X1, Y1 = range(8)
+COLUMNS = 8
+
+# Filled circles up to this radius are splatted in one vectorized pass;
+# pygame's own rasterizer is faster for the few big ones (flashes)
+SPLAT_MAX_RADIUS = 4
+
+
+class DrawList:
+    """Command buffer for one frame; see the module docstring."""
+
+    def __init__(self):
+        self.data = array("i")
+        self.objects = []  # blit surfaces and polygon point lists
+        self.bulk = []  # (layer, cx, cy, radius, colors) int arrays
+        # Counts of the last flush, for the overlay
+        self.counts = dict.fromkeys(PRIMITIVES + ("batches",), 0)
+
+    def __len__(self):
+        return len(self.data) // COLUMNS + sum(len(b[1]) for b in self.bulk)
+
+    def clear(self):
+        self.data = array("i")
+        self.objects.clear()
+        self.bulk.clear()
+
+    def blit(self, layer, surface, x, y):
+        self.data.extend((layer, BLIT, 0, 0, int(x), int(y), len(self.objects), 0))
+        self.objects.append(surface)
+
+    def polygon(self, layer, color, points, width=0):
+        self.data.extend((layer, POLYGON, color, width, 0, 0, len(self.objects), 0))
+        self.objects.append(points)
+
+    def line(self, layer, color, start, end, width=1):
+        self.data.extend(
+            (
+                layer,
+                LINE,
+                color,
+                width,
+                int(start[0]),
+                int(start[1]),
+                int(end[0]),
+                int(end[1]),
+            )
+        )
+
+    def circle(self, layer, color, x, y, radius, width=0):
+        self.data.extend((layer, CIRCLE, color, width, int(x), int(y), int(radius), 0))
+
+    def circles(self, layer, cx, cy, radius, colors):
+        """Queue many filled circles at once from int arrays."""
+        if len(cx):
+            self.bulk.append((layer, cx, cy, radius, colors))
+
+    def _runs(self):
+        # (layer, primitive, payload) batches in drawing order
+        runs = [(layer, DISCS, arrays) for layer, *arrays in self.bulk]
+        if self.data:
+            rows = np.frombuffer(self.data, dtype=np.int32).reshape(-1, COLUMNS)
+            rows = rows[np.lexsort((rows[:, PRIM], rows[:, LAYER]))]
+            key = rows[:, LAYER] * COLUMNS + rows[:, PRIM]
+            edges = np.flatnonzero(np.diff(key)) + 1
+            for run in np.split(rows, edges):
+                runs.append((int(run[0, LAYER]), int(run[0, PRIM]), run))
+        runs.sort(key=lambda run: run[:2])
+        return runs
+
+    def flush(self, surface, renderer):
+        """Draw every queued command onto surface and clear the buffer."""
+        counts = dict.fromkeys(self.counts, 0)
+        palette = particles.palette
+        objects = self.objects
+        mark = renderer.mark
+        for _, prim, payload in self._runs():
+            counts["batches"] += 1
+            if prim == DISCS:
+                cx, cy, radius, colors = payload
+                particles.draw_circles(surface, cx, cy, radius, colors)
+                renderer.mark_boxes(cx - radius, cy - radius, cx + radius, cy + radius)
+                counts["disc"] += len(cx)
+                continue
+
+            counts[PRIMITIVES[prim]] += len(payload)
+            if prim == BLIT:
+                rects = surface.blits(
+                    [(objects[i], (x, y)) for x, y, i in payload[:, X0:Y1].tolist()]
+                )
+                for rect in rects:
+                    mark(rect)
+            elif prim == CIRCLE:
+                radius = payload[:, X1]
+                small = (payload[:, WIDTH] == 0) & (radius > 0)
+                small &= radius <= SPLAT_MAX_RADIUS
+                if small.any():
+                    cx = payload[small, X0]
+                    cy = payload[small, Y0]
+                    r = radius[small]
+                    particles.draw_circles(surface, cx, cy, r, payload[small, COLOR])
+                    renderer.mark_boxes(cx - r, cy - r, cx + r, cy + r)
+                for color, width, x, y, r in payload[~small, COLOR:Y1].tolist():
+                    mark(pygame.draw.circle(surface, palette[color], (x, y), r, width))
+            elif prim == LINE:
+                for color, width, x0, y0, x1, y1 in payload[:, COLOR:].tolist():
+                    mark(
+                        pygame.draw.line(
+                            surface, palette[color], (x0, y0), (x1, y1), width
+                        )
+                    )
+            else:
+                for color, width, i in payload[:, [COLOR, WIDTH, X1]].tolist():
+                    mark(
+                        pygame.draw.polygon(surface, palette[color], objects[i], width)
+                    )
+        self.counts = counts
+        self.clear()
@@ -1,8 +1,70 @@
-import random
 import math
-import pygame
+import numpy as np
 
+import drawlist
+import particles
+import settings
 import state
+import timestep
+from entities import Column, next_uid
+from pool import Pool
+
+WHITE = particles.color_id((255, 255, 255))
+
+# Explosion animation, per second (see timestep.py)
+FLASH_TIME = 0.06  # seconds the white flash lasts
+FLASH_GROWTH = 3.0  # flash radius multiplier over FLASH_TIME
+RING_SPEED = 600  # shockwave growth, px/s
+RING_THINNING = 5  # shockwave width lost per second, px
+
+
+def flash_growth():
+    # Flash radius multiplier per tick
+    return FLASH_GROWTH ** (1 / timestep.ticks(FLASH_TIME))
+
+
+def _spread(count, base_angle, jitter, speed_lo, speed_hi, scale=1.0):
+    # Per-tick velocities for a fan of particles around base_angle, from
+    # speeds in px/s
+    ang = base_angle + particles.rng.uniform(-jitter, jitter, count)
+    speed = timestep.per_tick(particles.rng.uniform(speed_lo, speed_hi, count))
+    speed *= scale
+    return np.cos(ang) * speed, np.sin(ang) * speed
+
+
+def _lifetimes(lo, hi, count):
+    # Particle lifetimes in ticks, from seconds (hi exclusive)
+    return particles.rng.integers(timestep.ticks(lo), timestep.ticks(hi), count)
+
+
+def _randint(lo, hi):
+    # Like random.randint, but from the emitter RNG: effects never touch
+    # the simulation RNG, so how much of them there is can't change play
+    return int(particles.rng.integers(lo, hi + 1))
+
+
+def _effect_count():
+    # Live explosions and emitters, and those queued to spawn
+    queued = state.commands.queued
+    return (
+        len(state.deaths)
+        + len(state.effects)
+        + queued(state.deaths.append)
+        + queued(state.effects.append)
+    )
+
+
+def room_for_effect():
+    """Whether another explosion or emitter fits under settings.MAX_EFFECTS."""
+    cap = settings.MAX_EFFECTS
+    return cap is None or _effect_count() < cap
+
+
+def _direction(dir_x, dir_y):
+    mag = math.hypot(dir_x, dir_y)
+    if mag == 0:
+        return -1.0, 0.0
+    return dir_x / mag, dir_y / mag
 
 
 class DeathFX:
@@ -13,49 +75,71 @@ class DeathFX:
     - Shockwave ring
     - Sparks (colored hot debris)
     - Smoke puffs
+
+    Sparks and smoke are emitted into the shared particle system; the
+    effect itself only animates the flash and the ring.
     """
 
+    uid = Column(np.int64)  # in the store's uid column while stored
+    _store = None
+
     def __init__(self, x, y, base_color=None):
+        self.reset(x, y, base_color)
+
+    def reset(self, x, y, base_color=None):
+        self.uid = next_uid()
         self.x = float(x)
         self.y = float(y)
         # color palette derived from an optional ship color
-        base = base_color or random.choice(["yellow", "orange", "red"])
+        base = base_color or ("yellow", "orange", "red")[_randint(0, 2)]
         self.palette = self._palette_for(base)
 
         # Flash
-        self.flash_time = 6
+        self.flash_time = timestep.ticks(FLASH_TIME)
         self.flash_radius = 10
 
         # Shockwave
         self.ring_r = 6
-        self.ring_dr = 6
+        self.ring_dr = timestep.per_tick(RING_SPEED)
         self.ring_w = 2
-        self.ring_r_max = random.randint(120, 200)
-
-        # Sparks (hot bits)
-        self.sparks = []  # [x, y, vx, vy, life, r, color]
-        count = random.randint(28, 42)
-        for _ in range(count):
-            ang = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(2.5, 6.0)
-            vx = math.cos(ang) * speed
-            vy = math.sin(ang) * speed
-            life = random.randint(18, 34)
-            r = random.uniform(1.0, 2.5)
-            color = random.choice(self.palette)
-            self.sparks.append([self.x, self.y, vx, vy, life, r, color])
+        self.ring_r_max = _randint(120, 200)
+
+        # Sparks (hot bits); fewer and shorter-lived at lower quality
+        quality = state.quality
+        count = quality.spawn_count(_randint(28, 42))
+        vx, vy = _spread(count, 0.0, math.pi, 250, 600)
+        spark_life = np.maximum(
+            1, _lifetimes(0.18, 0.35, count) * quality.life_scale
+        ).astype(np.int64)
+        colors = [particles.color_id(c) for c in self.palette]
+        state.particles.emit(
+            particles.SPARK,
+            self.x,
+            self.y,
+            vx,
+            vy,
+            spark_life,
+            particles.rng.uniform(1.0, 2.5, count),
+            particles.rng.choice(colors, count),
+        )
 
         # Smoke (cooling debris)
-        self.smoke = []  # [x, y, vx, vy, life, r]
-        smoke_count = random.randint(8, 14)
-        for _ in range(smoke_count):
-            ang = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(0.4, 1.4)
-            vx = math.cos(ang) * speed
-            vy = math.sin(ang) * speed
-            life = random.randint(28, 48)
-            r = random.uniform(2.0, 4.0)
-            self.smoke.append([self.x, self.y, vx, vy, life, r])
+        smoke_count = quality.spawn_count(_randint(8, 14))
+        vx, vy = _spread(smoke_count, 0.0, math.pi, 40, 140)
+        smoke_life = _lifetimes(0.28, 0.49, smoke_count)
+        state.particles.emit(
+            particles.SMOKE,
+            self.x,
+            self.y,
+            vx,
+            vy,
+            smoke_life,
+            particles.rng.uniform(2.0, 4.0, smoke_count),
+            particles.color_id((150, 150, 150)),
+        )
+
+        # Stay alive as long as the longest-lived particle might
+        self.ttl = int(max(spark_life.max(), smoke_life.max()))
 
     def _palette_for(self, base):
         by_name = {
@@ -68,214 +152,207 @@ class DeathFX:
         }
         return by_name.get(base, by_name["orange"])
 
-    def _draw_flash(self):
+    def render(self):
+        camera = state.camera
+        if not camera.visible(self.x, self.y, max(self.ring_r, self.flash_radius)):
+            return
+        draw_list = state.draw_list
+        x, y = camera.to_screen(self.x, self.y)
         if self.flash_time > 0:
-            try:
-                pygame.draw.circle(
-                    state.screen,
-                    (255, 255, 255),
-                    (int(self.x), int(self.y)),
-                    max(2, int(self.flash_radius)),
-                )
-            except Exception:
-                pass
-
-    def _draw_ring(self):
+            draw_list.circle(
+                drawlist.EXPLOSIONS,
+                WHITE,
+                x,
+                y,
+                max(2, camera.scale(self.flash_radius)),
+            )
         if self.ring_r < self.ring_r_max:
-            try:
-                pygame.draw.circle(
-                    state.screen,
-                    (255, 255, 255),
-                    (int(self.x), int(self.y)),
-                    int(self.ring_r),
-                    max(1, int(self.ring_w)),
-                )
-            except Exception:
-                pass
-
-    def _draw_sparks(self):
-        for px, py, _, __, ___, r, color in self.sparks:
-            try:
-                pygame.draw.circle(
-                    state.screen, color, (int(px), int(py)), max(1, int(r))
-                )
-            except Exception:
-                pass
-
-    def _draw_smoke(self):
-        for px, py, _, __, ___, r in self.smoke:
-            try:
-                pygame.draw.circle(
-                    state.screen, (150, 150, 150), (int(px), int(py)), max(1, int(r))
-                )
-            except Exception:
-                pass
-
-    def draw(self):
-        self._draw_flash()
-        self._draw_ring()
-        self._draw_sparks()
-        self._draw_smoke()
-
-    def tick(self):
+            draw_list.circle(
+                drawlist.EXPLOSIONS,
+                WHITE,
+                x,
+                y,
+                camera.scale(self.ring_r),
+                camera.scale(self.ring_w),
+            )
+
+    def update(self):
         # Update shockwave
         if self.ring_r < self.ring_r_max:
             self.ring_r += self.ring_dr
-            self.ring_w = max(1, self.ring_w - 0.05)
+            self.ring_w = max(1, self.ring_w - timestep.per_tick(RING_THINNING))
 
         # Update flash
         if self.flash_time > 0:
             self.flash_time -= 1
-            self.flash_radius *= 1.2
-
-        # Update sparks
-        next_sparks = []
-        for p in self.sparks:
-            p[0] += p[2]
-            p[1] += p[3]
-            # slight drag
-            p[2] *= 0.98
-            p[3] *= 0.98
-            # subtle outward push to maintain burst feel
-            dx = p[0] - self.x
-            dy = p[1] - self.y
-            dist = math.hypot(dx, dy) + 1e-5
-            p[2] += (dx / dist) * 0.02
-            p[3] += (dy / dist) * 0.02
-            p[4] -= 1
-            p[5] = max(0.5, p[5] - 0.04)
-            if p[4] > 0 and p[5] > 0.5:
-                next_sparks.append(p)
-        self.sparks = next_sparks
-
-        # Update smoke
-        next_smoke = []
-        for p in self.smoke:
-            p[0] += p[2]
-            p[1] += p[3]
-            # gentle drift outward and slight upward float
-            p[3] -= 0.01
-            p[2] *= 0.99
-            p[3] *= 0.99
-            p[4] -= 1
-            p[5] = min(12.0, p[5] + 0.08)
-            if p[4] > 0:
-                next_smoke.append(p)
-        self.smoke = next_smoke
-
-        # Render
-        self.draw()
+            self.flash_radius *= flash_growth()
+
+        self.ttl -= 1
 
         # End condition
-        if (
-            self.flash_time <= 0
-            and self.ring_r >= self.ring_r_max
-            and not self.sparks
-            and not self.smoke
-        ):
+        if self.flash_time <= 0 and self.ring_r >= self.ring_r_max and self.ttl <= 0:
             self.destroy()
 
     def destroy(self):
-        if self in state.deaths:
-            state.deaths.remove(self)
+        state.commands.kill(self)
+
+    def despawn(self):
+        # Called by state.commands at the next sync point
+        if state.deaths.discard(self):
+            DeathFX.pool.release(self)
 
 
 class ExhaustFX:
+    """Engine exhaust burst, e.g. behind a launched torpedo.
+
+    Like TrailSmokeFX this has nothing to render of its own: its particles
+    are drawn in bulk by the particle system.
+    """
+
+    uid = Column(np.int64)
+    _store = None
+
     def __init__(self, x, y, dir_x=0.0, dir_y=0.0, strength=1.0):
+        self.reset(x, y, dir_x, dir_y, strength)
+
+    def reset(self, x, y, dir_x=0.0, dir_y=0.0, strength=1.0):
+        self.uid = next_uid()
+        self.x = x
+        self.y = y
         # Particles travel opposite to shot direction with slight spread
-        self.particles = []
-        mag = math.hypot(dir_x, dir_y)
-        if mag == 0:
-            dir_x, dir_y = -1.0, 0.0
-        else:
-            dir_x, dir_y = dir_x / mag, dir_y / mag
-
-        count = random.randint(8, 12)
-        base_angle = math.atan2(dir_y, dir_x)
-        for _ in range(count):
-            jitter = random.uniform(-0.6, 0.6)
-            ang = base_angle + jitter
-            speed = random.uniform(1.5, 4.0) * (1.0 + 0.5 * strength)
-            vx = math.cos(ang) * speed
-            vy = math.sin(ang) * speed
-            life = random.randint(12, 24)
-            radius = random.randint(2, 3)
-            color = random.choice(["orange", "yellow", "red"])
-            self.particles.append([x, y, vx, vy, life, radius, color])
-
-    def draw(self):
-        for px, py, _, __, ___, r, color in self.particles:
-            pygame.draw.circle(state.screen, color, (int(px), int(py)), max(1, int(r)))
-
-    def tick(self):
-        next_particles = []
-        for p in self.particles:
-            p[0] += p[2]
-            p[1] += p[3]
-            p[4] -= 1
-            # shrink slightly
-            p[5] = max(1, p[5] - 0.1)
-            if p[4] > 0:
-                next_particles.append(p)
-        self.particles = next_particles
-        self.draw()
-        if not self.particles:
+        dir_x, dir_y = _direction(dir_x, dir_y)
+        count = state.quality.spawn_count(_randint(8, 12))
+        vx, vy = _spread(
+            count, math.atan2(dir_y, dir_x), 0.6, 150, 400, 1.0 + 0.5 * strength
+        )
+        life = _lifetimes(0.12, 0.25, count)
+        colors = [particles.color_id(c) for c in ("orange", "yellow", "red")]
+        state.particles.emit(
+            particles.EXHAUST,
+            x,
+            y,
+            vx,
+            vy,
+            life,
+            particles.rng.integers(2, 4, count),
+            particles.rng.choice(colors, count),
+        )
+        self.ttl = int(life.max())
+
+    def update(self):
+        # Particles animate and render themselves; just wait for the last
+        # one to expire
+        self.ttl -= 1
+        if self.ttl <= 0:
             self.destroy()
 
     def destroy(self):
-        if self in state.effects:
-            state.effects.remove(self)
+        state.commands.kill(self)
+
+    def despawn(self):
+        # Called by state.commands at the next sync point
+        if state.effects.discard(self):
+            ExhaustFX.pool.release(self)
 
 
 class TrailSmokeFX:
     """Short-lived gray smoke puffs for trails.
 
     Particles drift opposite to the provided direction with slight spread.
-    Keep it tiny and cheap since it emits frequently.
+    Keep it tiny and cheap since it emits frequently; emit_many() puffs
+    at many points with a single particle emission.
     """
 
-    def __init__(self, x, y, dir_x=0.0, dir_y=0.0, strength=1.0):
-        self.particles = []
-        mag = math.hypot(dir_x, dir_y)
-        if mag == 0:
-            dir_x, dir_y = -1.0, 0.0
-        else:
-            dir_x, dir_y = dir_x / mag, dir_y / mag
-
-        count = random.randint(2, 4)
-        base_angle = math.atan2(dir_y, dir_x)
-        for _ in range(count):
-            jitter = random.uniform(-0.4, 0.4)
-            ang = base_angle + jitter
-            speed = random.uniform(0.6, 1.4) * (0.8 + 0.6 * strength)
-            vx = math.cos(ang) * speed
-            vy = math.sin(ang) * speed
-            life = random.randint(10, 18)
-            radius = random.uniform(1.0, 2.4)
-            self.particles.append([x, y, vx, vy, life, radius])
-
-    def draw(self):
-        for px, py, _, __, ___, r in self.particles:
-            pygame.draw.circle(
-                state.screen, (170, 170, 170), (int(px), int(py)), max(1, int(r))
-            )
-
-    def tick(self):
-        next_particles = []
-        for p in self.particles:
-            p[0] += p[2]
-            p[1] += p[3]
-            p[2] *= 0.98
-            p[3] *= 0.98
-            p[4] -= 1
-            p[5] = min(4.0, p[5] + 0.05)
-            if p[4] > 0:
-                next_particles.append(p)
-        self.particles = next_particles
-        self.draw()
-        if not self.particles:
+    uid = Column(np.int64)
+    _store = None
+
+    def __init__(self, x, y, dir_x=0.0, dir_y=0.0, strength=1.0, ttl=None):
+        self.reset(x, y, dir_x, dir_y, strength, ttl)
+
+    def reset(self, x, y, dir_x=0.0, dir_y=0.0, strength=1.0, ttl=None):
+        self.uid = next_uid()
+        self.x = x
+        self.y = y
+        if ttl is not None:
+            # Particles already emitted by emit_many(); just wait them out
+            self.ttl = ttl
+            return
+        dir_x, dir_y = _direction(dir_x, dir_y)
+        count = state.quality.spawn_count(_randint(2, 4))
+        vx, vy = _spread(
+            count, math.atan2(dir_y, dir_x), 0.4, 60, 140, 0.8 + 0.6 * strength
+        )
+        life = _lifetimes(0.10, 0.19, count)
+        state.particles.emit(
+            particles.TRAIL,
+            x,
+            y,
+            vx,
+            vy,
+            life,
+            particles.rng.uniform(1.0, 2.4, count),
+            particles.color_id((170, 170, 170)),
+        )
+        self.ttl = int(life.max())
+
+    @classmethod
+    def emit_many(cls, xs, ys, dir_xs, dir_ys, strength=1.0):
+        """Puff at every (xs[i], ys[i]) along unit vectors (dir_xs, dir_ys).
+
+        Queues as many puffs for state.effects as settings.MAX_EFFECTS
+        leaves room for.
+        """
+        cap = settings.MAX_EFFECTS
+        if cap is not None:
+            room = max(0, cap - _effect_count())
+            xs, ys, dir_xs, dir_ys = xs[:room], ys[:room], dir_xs[:room], dir_ys[:room]
+        puffs = len(xs)
+        if not puffs:
+            return
+        counts = particles.rng.integers(2, 5, puffs)
+        counts = np.maximum(1, (counts * state.quality.spawn_scale).astype(np.int64))
+        total = int(counts.sum())
+        owner = np.repeat(np.arange(puffs), counts)
+        vx, vy = _spread(
+            total,
+            np.arctan2(dir_ys, dir_xs)[owner],
+            0.4,
+            60,
+            140,
+            0.8 + 0.6 * strength,
+        )
+        life = _lifetimes(0.10, 0.19, total)
+        state.particles.emit(
+            particles.TRAIL,
+            xs[owner],
+            ys[owner],
+            vx,
+            vy,
+            life,
+            particles.rng.uniform(1.0, 2.4, total),
+            particles.color_id((170, 170, 170)),
+        )
+        ttl = np.zeros(puffs, dtype=np.int64)
+        np.maximum.at(ttl, owner, life)
+        spawn = state.commands.spawn
+        add = state.effects.append
+        for x, y, t in zip(xs.tolist(), ys.tolist(), ttl.tolist()):
+            spawn(cls.pool.acquire(x, y, ttl=t), add)
+
+    def update(self):
+        self.ttl -= 1
+        if self.ttl <= 0:
             self.destroy()
 
     def destroy(self):
-        if self in state.effects:
-            state.effects.remove(self)
+        state.commands.kill(self)
+
+    def despawn(self):
+        # Called by state.commands at the next sync point
+        if state.effects.discard(self):
+            TrailSmokeFX.pool.release(self)
+
+
+DeathFX.pool = Pool(DeathFX, settings.EFFECT_POOL_CAP, settings.POOLING)
+ExhaustFX.pool = Pool(ExhaustFX, settings.EFFECT_POOL_CAP, settings.POOLING)
+TrailSmokeFX.pool = Pool(TrailSmokeFX, settings.EFFECT_POOL_CAP, settings.POOLING)
@@ -0,0 +1,299 @@
+import itertools
+
+import numpy as np
+
+_uids = itertools.count(1)
+
+
+def next_uid():
+    """Return a fresh entity id; ids only grow, pooled objects get new ones."""
+    return next(_uids)
+
+
+def reset_uids(start=1):
+    # Restart numbering, so seeded runs hand out the same ids
+    global _uids
+    _uids = itertools.count(start)
+
+
+class EntityStore:
+    """Unordered entity collection with O(1) insert and removal.
+
+    Entities live in a dense slot list with a reverse index, so remove() is
+    a swap with the last slot instead of a list scan. Iterating is safe
+    while entities are added or removed: removals during iteration leave a
+    hole that is compacted once the outermost loop finishes, and entities
+    added during iteration are not visited until the next loop.
+
+    Enough of the list API is provided (append, remove, in, len, indexing,
+    clear) for code written against the old plain lists. Order is not
+    preserved across removals.
+    """
+
+    def __init__(self, entities=()):
+        self._slots = []
+        self._index = {}  # entity -> slot
+        self._holes = []  # slots vacated while iterating
+        self._iterating = 0
+        for entity in entities:
+            self.append(entity)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __bool__(self):
+        return bool(self._index)
+
+    def __contains__(self, entity):
+        return entity in self._index
+
+    def __iter__(self):
+        slots = self._slots
+        end = len(slots)
+        self._iterating += 1
+        try:
+            for i in range(end):
+                entity = slots[i]
+                if entity is not None:
+                    yield entity
+        finally:
+            self._iterating -= 1
+            if not self._iterating and self._holes:
+                self._compact()
+
+    def __getitem__(self, i):
+        if self._holes:
+            # Only while a loop is running; fall back to a live view
+            return list(self)[i]
+        return self._slots[i]
+
+    def __repr__(self):
+        return f"EntityStore({list(self)!r})"
+
+    def to_list(self):
+        # Same as list(store), in the same order, without going through
+        # the iterator; for bulk snapshots of big stores
+        if self._holes:
+            return [entity for entity in self._slots if entity is not None]
+        return self._slots[:]
+
+    def position(self, entity):
+        """Slot of a stored entity; lower slots come first in iteration."""
+        return self._index[entity]
+
+    def append(self, entity):
+        if entity in self._index:
+            return
+        self._index[entity] = len(self._slots)
+        self._slots.append(entity)
+
+    def extend(self, entities):
+        for entity in entities:
+            self.append(entity)
+
+    def remove(self, entity):
+        if not self.discard(entity):
+            raise ValueError(f"{entity!r} not in store")
+
+    def discard(self, entity):
+        """Remove entity if present; returns whether it was."""
+        slot = self._index.pop(entity, None)
+        if slot is None:
+            return False
+        if self._iterating:
+            self._slots[slot] = None
+            self._holes.append(slot)
+            return True
+        last = self._slots.pop()
+        if slot < len(self._slots):
+            self._slots[slot] = last
+            self._index[last] = slot
+            self._moved(len(self._slots), slot)
+        return True
+
+    def clear(self):
+        self._index.clear()
+        if self._iterating:
+            self._holes = list(range(len(self._slots)))
+            self._slots[:] = [None] * len(self._slots)
+        else:
+            self._slots.clear()
+            self._holes.clear()
+
+    def _compact(self):
+        # Fill holes from the back, highest first, so every hole is either
+        # the tail slot or gets a live entity moved into it
+        slots = self._slots
+        for slot in sorted(self._holes, reverse=True):
+            last = slots.pop()
+            if slot < len(slots):
+                slots[slot] = last
+                self._index[last] = slot
+                self._moved(len(slots), slot)
+        self._holes.clear()
+
+    def _moved(self, old, new):
+        # Hook: the entity in slot `old` now lives in slot `new`
+        pass
+
+
+class Column:
+    """Entity attribute kept in a ColumnStore column while stored.
+
+    Declare on the entity class with the column's dtype (`x =
+    Column(np.float64)`) and give the class `_store = None`. Outside a
+    store the value lives in the entity's __dict__ as usual.
+    """
+
+    def __init__(self, dtype):
+        self.dtype = np.dtype(dtype)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        store = entity._store
+        if store is None:
+            return entity.__dict__[self.name]
+        return store.columns[self.name].item(store._index[entity])
+
+    def __set__(self, entity, value):
+        store = entity._store
+        if store is None:
+            entity.__dict__[self.name] = value
+        else:
+            store.columns[self.name][store._index[entity]] = value
+
+
+def column_types(cls):
+    """{name: dtype} of the Column attributes declared on cls."""
+    types = {}
+    for name in dir(cls):
+        attribute = getattr(cls, name)
+        if isinstance(attribute, Column):
+            types[name] = attribute.dtype
+    return types
+
+
+class ColumnStore(EntityStore):
+    """EntityStore that keeps its entities' Column attributes in arrays.
+
+    Row i of every column belongs to the entity in slot i, so bulk code
+    can update all of them at once through columns (see view()). The
+    columns are taken from the Column descriptors of the first entity
+    class appended. append() moves an entity's values into its row and
+    discard() copies them back out, so entities can be set up before they
+    are added and keep their last state after they leave.
+
+    Bulk code must not run inside a loop over the store: rows of entities
+    removed mid-loop stay in place until the loop ends.
+
+    Columns are made by allocate(capacity, dtype), which returns zeroed
+    arrays (np.zeros by default; see reallocate()).
+    """
+
+    def __init__(self, capacity=1024, allocate=np.zeros):
+        super().__init__()
+        self.capacity = capacity
+        self.allocate = allocate
+        self.columns = {}
+
+    def _bind(self, cls):
+        for name, dtype in column_types(cls).items():
+            self.columns[name] = self.allocate(self.capacity, dtype)
+
+    def _grow(self):
+        self.capacity *= 2
+        for name, column in self.columns.items():
+            grown = self.allocate(self.capacity, column.dtype)
+            grown[: len(column)] = column
+            self.columns[name] = grown
+
+    def reallocate(self, allocate, capacity=None):
+        """Move the columns into new arrays from allocate, e.g. into
+        shared memory, optionally with room for at least capacity rows.
+        Columns made later (on growth) come from allocate too."""
+        self.allocate = allocate
+        if capacity is not None:
+            self.capacity = max(self.capacity, capacity)
+        for name, column in self.columns.items():
+            moved = allocate(self.capacity, column.dtype)
+            moved[: len(column)] = column
+            self.columns[name] = moved
+
+    def view(self, name):
+        """The rows of a column that are in use, as a writable view."""
+        return self.columns[name][: len(self._slots)]
+
+    def at(self, rows):
+        """Entities in the given rows."""
+        slots = self._slots
+        return [slots[row] for row in rows]
+
+    def append(self, entity):
+        if entity in self._index:
+            return
+        if not self.columns:
+            self._bind(type(entity))
+        row = len(self._slots)
+        if row == self.capacity:
+            self._grow()
+        values = entity.__dict__
+        for name, column in self.columns.items():
+            column[row] = values.pop(name)
+        super().append(entity)
+        entity._store = self
+
+    def extend(self, entities, columns=None):
+        """Append entities in bulk, one slice assignment per column.
+
+        columns optionally maps column names to arrays holding the new
+        entities' values in order (e.g. read straight from a snapshot);
+        those entities need not have the attributes set, and must all be
+        new to the store. Other columns are taken from the entities as
+        append() does.
+        """
+        entities = list(entities)
+        new = [e for e in dict.fromkeys(entities) if e not in self._index]
+        if columns and len(new) != len(entities):
+            raise ValueError("extend() with columns takes only new entities")
+        if not new:
+            return
+        if not self.columns:
+            self._bind(type(new[0]))
+        start = len(self._slots)
+        end = start + len(new)
+        while end > self.capacity:
+            self._grow()
+        columns = columns or {}
+        for name, column in self.columns.items():
+            values = columns.get(name)
+            if values is None:
+                values = [entity.__dict__.pop(name) for entity in new]
+            column[start:end] = values
+        self._index.update(zip(new, range(start, end)))
+        self._slots.extend(new)
+        for entity in new:
+            entity._store = self
+
+    def discard(self, entity):
+        row = self._index.get(entity)
+        if row is None:
+            return False
+        values = entity.__dict__
+        for name, column in self.columns.items():
+            values[name] = column.item(row)
+        entity._store = None
+        return super().discard(entity)
+
+    def clear(self):
+        # Cleared entities are dropped without their column values
+        for entity in self._index:
+            entity._store = None
+        super().clear()
+
+    def _moved(self, old, new):
+        for column in self.columns.values():
+            column[new] = column[old]
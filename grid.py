@@ -0,0 +1,240 @@
+import heapq
+
+import numpy as np
+
+# Below this many ships a plain scan beats walking empty cell rings
+LINEAR_SCAN = 32
+
+
+class SpatialGrid:
+    """Uniform spatial hash over ships.
+
+    Ships are bucketed by the cell that contains their center. The grid is
+    kept up to date incrementally: call update() whenever a ship moves and
+    remove() when it leaves the world. Queries only look at the cells that
+    can possibly overlap the search area.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> list of ships
+        self.where = {}  # ship -> (cx, cy)
+        # Largest radius ever inserted; used to widen collision queries
+        self.max_radius = 0
+        # Occupied cell range ever seen (x0, y0, x1, y1); bounds ring searches
+        self.bounds = None
+
+    def _key(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, ship):
+        return ship in self.where
+
+    def clear(self):
+        self.cells.clear()
+        self.where.clear()
+        self.max_radius = 0
+        self.bounds = None
+
+    def rebuild(self, ships):
+        self.clear()
+        for ship in ships:
+            self.insert(ship)
+
+    def insert(self, ship):
+        key = self._key(ship.x, ship.y)
+        self.where[ship] = key
+        self.cells.setdefault(key, []).append(ship)
+        if ship.radius > self.max_radius:
+            self.max_radius = ship.radius
+        bounds = self.bounds
+        if bounds is None:
+            self.bounds = [key[0], key[1], key[0], key[1]]
+        else:
+            cx, cy = key
+            if cx < bounds[0]:
+                bounds[0] = cx
+            elif cx > bounds[2]:
+                bounds[2] = cx
+            if cy < bounds[1]:
+                bounds[1] = cy
+            elif cy > bounds[3]:
+                bounds[3] = cy
+
+    def remove(self, ship):
+        key = self.where.pop(ship, None)
+        if key is None:
+            return
+        bucket = self.cells[key]
+        bucket.remove(ship)
+        if not bucket:
+            del self.cells[key]
+
+    def update(self, ship):
+        # Cheap when the ship stays inside its cell, which is the common case
+        key = self._key(ship.x, ship.y)
+        old = self.where.get(ship)
+        if old == key:
+            return
+        if old is not None:
+            self.remove(ship)
+        self.insert(ship)
+
+    def nearby(self, x, y, radius):
+        """Yield ships whose cell overlaps the square around (x, y)."""
+        size = self.cell_size
+        x0 = int((x - radius) // size)
+        x1 = int((x + radius) // size)
+        y0 = int((y - radius) // size)
+        y1 = int((y + radius) // size)
+        cells = self.cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def query_radius(self, x, y, radius, exclude=None):
+        """Return ships whose centers lie within radius of (x, y)."""
+        r2 = radius * radius
+        found = []
+        for ship in self.nearby(x, y, radius):
+            if ship is exclude:
+                continue
+            dx = ship.x - x
+            dy = ship.y - y
+            if dx * dx + dy * dy <= r2:
+                found.append(ship)
+        return found
+
+    def _ring(self, cx, cy, k):
+        # Buckets of the cells exactly k cells away (Chebyshev) from (cx, cy)
+        cells = self.cells
+        if k == 0:
+            keys = [(cx, cy)]
+        else:
+            keys = [(cx + dx, cy - k) for dx in range(-k, k + 1)]
+            keys += [(cx + dx, cy + k) for dx in range(-k, k + 1)]
+            keys += [(cx - k, cy + dy) for dy in range(1 - k, k)]
+            keys += [(cx + k, cy + dy) for dy in range(1 - k, k)]
+        for key in keys:
+            bucket = cells.get(key)
+            if bucket:
+                yield bucket
+
+    def k_nearest(self, x, y, k, exclude=None, radius=None):
+        """Return up to k ships nearest to (x, y), closest first.
+
+        Searches rings of cells outward and stops once no unvisited cell
+        can hold anything closer than the k-th best so far. With radius,
+        only ships whose centers lie within it are considered.
+        """
+        if k <= 0 or not self.where:
+            return []
+        limit = radius * radius if radius is not None else float("inf")
+        best = []  # max-heap of (-d2, tiebreak, ship)
+
+        def offer(ship):
+            if ship is exclude:
+                return
+            dx = ship.x - x
+            dy = ship.y - y
+            d2 = dx * dx + dy * dy
+            if d2 > limit:
+                return
+            if len(best) < k:
+                heapq.heappush(best, (-d2, id(ship), ship))
+            elif d2 < -best[0][0]:
+                heapq.heapreplace(best, (-d2, id(ship), ship))
+
+        if len(self.where) <= LINEAR_SCAN:
+            for ship in self.where:
+                offer(ship)
+        else:
+            size = self.cell_size
+            cx, cy = self._key(x, y)
+            x0, y0, x1, y1 = self.bounds
+            rings = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+            if radius is not None:
+                rings = min(rings, int(radius // size) + 1)
+            for ring in range(rings + 1):
+                # Cells in this ring are at least (ring - 1) cells away
+                reach = (ring - 1) * size
+                if len(best) == k and ring > 0 and -best[0][0] <= reach * reach:
+                    break
+                for bucket in self._ring(cx, cy, ring):
+                    for ship in bucket:
+                        offer(ship)
+
+        best.sort(reverse=True)
+        return [ship for _, _, ship in best]
+
+    def nearest(self, x, y, exclude=None, radius=None):
+        """Return the ship nearest to (x, y), or None."""
+        found = self.k_nearest(x, y, 1, exclude, radius)
+        return found[0] if found else None
+
+    def find_overlap(self, x, y, exclude=None, order=None):
+        """Return the first ship whose body contains (x, y), if any.
+
+        Without order, first in cell order; with it, the overlapping ship
+        with the lowest order(ship), e.g. state.ships.position for the
+        first in fleet order like a scan of the whole list.
+        """
+        found = None
+        for ship in self.nearby(x, y, self.max_radius):
+            if ship is exclude:
+                continue
+            dx = ship.x - x
+            dy = ship.y - y
+            if dx * dx + dy * dy < ship.radius * ship.radius:
+                if order is None:
+                    return ship
+                if found is None or order(ship) < order(found):
+                    found = ship
+        return found
+
+
+def first_overlaps(px, py, exclude, sx, sy, sr, ids):
+    """Vectorized find_overlap for many points against many circles.
+
+    Returns, per point, the index of the first circle (x, y, radius in
+    sx, sy, sr) that contains it, or -1; pass the circles in fleet order
+    (state.ships.to_list()) to get the first ship a scan would find. A
+    point never hits a circle whose id in `ids` equals its own `exclude`
+    value. Circles are swept along x, so only those within reach of a
+    point's x are tested exactly.
+    """
+    hits = np.full(len(px), -1, dtype=np.int64)
+    count = len(sx)
+    if not count or not len(px):
+        return hits
+    reach = sr.max()
+    order = np.argsort(sx, kind="stable")
+    xs = sx[order]
+    lo = np.searchsorted(xs, px - reach, "left")
+    hi = np.searchsorted(xs, px + reach, "right")
+    counts = hi - lo
+    total = int(counts.sum())
+    if not total:
+        return hits
+    point = np.repeat(np.arange(len(px)), counts)
+    offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    circle = order[np.repeat(lo, counts) + offset]
+
+    dx = sx[circle] - px[point]
+    dy = sy[circle] - py[point]
+    overlap = dx * dx + dy * dy < sr[circle] ** 2
+    overlap &= ids[circle] != exclude[point]
+    if not overlap.any():
+        return hits
+
+    # Lowest circle index wins when a point is inside several
+    first = np.full(len(px), count, dtype=np.int64)
+    np.minimum.at(first, point[overlap], circle[overlap])
+    inside = first < count
+    hits[inside] = first[inside]
+    return hits
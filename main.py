@@ -1,82 +1,649 @@
 #!/usr/bin/python3
 
+import argparse
+import asyncio
 import os
-import sys
 import random
+import time
 import pygame
 
 import state
-from star import Star
-from ship import Ship
+import bullet
+import camera
+import capture
+import drawlist
+import parallel
+import particles
+import quality
+import render
+import renderthread
+import settings
+import snapshot
+import stream
+import tasks
+import timestep
+from entities import reset_uids
+from overlay import PerfOverlay
+from replay import Recorder, Replay
+from starfield import Starfield
+from ship import Ship, gather_table, spawn
 
 
 def add_player():
     state.player = Ship()
     state.player.color = "blue"
     state.player.radius = 5
-    state.player.x = state.screen.get_width() / 2
-    state.player.y = state.screen.get_height() / 2
-    state.ships.append(state.player)
+    state.player.x = state.player.prev_x = state.world.width / 2
+    state.player.y = state.player.prev_y = state.world.height / 2
+    spawn(state.player)
 
 
-def run():
-    # handle command line for embedding
-    if len(sys.argv) > 1:
-        os.environ["SDL_WINDOWID"] = sys.argv[1]
+def create_starfield(mode=None):
+    mode = mode or settings.STARFIELD_MODE
+    if state.renderer.name == "dirty":
+        mode = "points"  # a scrolling layer would dirty every tile
+    state.starfield = Starfield(
+        state.screen.get_size(), mode, settings.STARFIELD_DEPTHS
+    )
+    # An opaque starfield layer repaints every pixel, so skip the clear
+    state.renderer.clear = not state.starfield.opaque
 
-    # Init pygame and screen
-    pygame.init()
-    state.screen = pygame.display.set_mode((3440, 1440))
-    clock = pygame.time.Clock()
-    running = True
 
-    # Create the universe
-    for _ in range(0, 1):
-        state.stars.append(Star())
+def create_universe(world=None):
+    create_starfield()
 
+    if world is not None:
+        snapshot.load(world)
+        return
     for _ in range(0, 3):
-        state.ships.append(Ship())
+        spawn(Ship())
 
-    # Main loop
-    while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
-                    running = False
-                else:
-                    # destroy a random ship to give visual feedback
-                    if state.ships:
-                        state.ships[random.randrange(-1, len(state.ships))].destroy()
 
-        # Clear
-        state.screen.fill("black")
+def input_events(tick, live):
+    # Live input, or the recorded input (plus window close) when replaying
+    if state.replay is None:
+        return live
+    closed = [event for event in live if event.type == pygame.QUIT]
+    return state.replay.events(tick) + closed
 
-        # Ticks
-        for star in list(state.stars):
-            star.tick()
 
-        for ship in list(state.ships):
-            ship.tick()
+def handle_events(events):
+    # Returns False once the user asked to quit
+    for event in events:
+        if event.type == pygame.QUIT:
+            return False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE or event.key == pygame.K_q:
+                return False
+            elif event.key == pygame.K_F3:
+                state.profiler.toggle()
+            elif event.key in camera.KEYS:
+                pass  # view only, see run_window
+            else:
+                # destroy a random ship to give visual feedback
+                if state.ships:
+                    state.ships[random.randrange(-1, len(state.ships))].destroy()
+        elif event.type == quality.LEVEL_CHANGED:
+            print(f"{state.quality.describe()} -> {quality.LEVELS[event.level][0]}")
+            state.quality.set_level(event.level)
+    return True
 
-        for bullet in list(state.bullets):
-            bullet.tick()
 
-        for death in list(state.deaths):
-            death.tick()
+def govern(frame_start):
+    # Report this frame's busy time to the quality governor. A level change
+    # is posted as input, so it applies (and is recorded) on the next tick;
+    # replays apply the recorded changes instead
+    if state.replay is not None:
+        return
+    level = state.quality.observe((time.perf_counter() - frame_start) * 1000)
+    if level is not None:
+        pygame.event.post(pygame.event.Event(quality.LEVEL_CHANGED, level=level))
 
-        for fx in list(state.effects):
-            fx.tick()
 
-        # Add new stars
-        if random.randint(0, 100) > 70:
-            state.stars.append(Star())
+def reset_world():
+    # Drop every entity, e.g. between benchmark scenarios
+    state.commands.clear()
+    state.ships.clear()
+    state.bullets.clear()
+    state.deaths.clear()
+    state.effects.clear()
+    state.ship_grid.clear()
+    state.ship_table = None
+    state.particles.clear()
+    state.player = None
+    state.quality.set_level(0)
+    reset_uids()
 
-        # Display
-        pygame.display.flip()
 
-        # Cap FPS
-        clock.tick(100)
+def update_stars():
+    if state.starfield is not None:
+        state.starfield.update()
 
-    pygame.quit()
+
+def update_ships():
+    if state.parallel is not None:
+        return state.parallel.update_ships()
+    for ship in state.ships:
+        ship.update()
+
+
+def update_bullets():
+    if state.parallel is not None:
+        return state.parallel.update_bullets()
+    gather_table()
+    bullet.update_all()
+
+
+def update_deaths():
+    for death in state.deaths:
+        death.update()
+
+
+def update_effects():
+    for fx in state.effects:
+        fx.update()
+    state.particles.update()
+
+
+def render_stars():
+    if state.starfield is not None:
+        state.starfield.render(
+            state.draw_list, drawlist.STARS, state.camera, state.alpha
+        )
+
+
+def render_ships():
+    for ship in state.ships:
+        ship.render()
+    view = state.camera
+    for color, (x0, y0), (x1, y1), width in state.beams:
+        # Beams are short-lived and few; cull by their bounding box
+        if (
+            max(x0, x1) < view.left
+            or min(x0, x1) >= view.right
+            or max(y0, y1) < view.top
+            or min(y0, y1) >= view.bottom
+        ):
+            continue
+        state.draw_list.line(
+            drawlist.BEAMS,
+            color,
+            view.to_screen(x0, y0),
+            view.to_screen(x1, y1),
+            view.scale(width),
+        )
+
+
+def render_bullets():
+    bullet.render_all(state.draw_list, state.camera, state.alpha)
+
+
+def render_deaths():
+    for death in state.deaths:
+        death.render()
+
+
+def render_effects():
+    # Exhaust and smoke effects are pure particle emitters
+    state.particles.render(
+        state.draw_list, drawlist.PARTICLES, state.camera, state.alpha
+    )
+
+
+def flush_draw_list():
+    state.draw_list.flush(state.screen, state.renderer)
+
+
+# Simulation phases in the order they run each tick
+PHASES = [
+    ("stars", update_stars),
+    ("ships", update_ships),
+    ("bullets", update_bullets),
+    ("deaths", update_deaths),
+    ("effects", update_effects),
+]
+
+# Drawing phases; they only read simulation state and queue commands
+# into state.draw_list, which the last phase sorts and draws
+RENDER_PHASES = [
+    ("draw stars", render_stars),
+    ("draw ships", render_ships),
+    ("draw bullets", render_bullets),
+    ("draw deaths", render_deaths),
+    ("draw effects", render_effects),
+    ("draw flush", flush_draw_list),
+]
+
+
+def after_step(tick, events):
+    if state.recorder is not None:
+        state.recorder.capture(tick, events)
+    if state.stream is not None:
+        state.stream.publish(tick)
+    if state.replay is not None and state.replay_error is None:
+        if state.replay.is_keyframe(tick):
+            error = state.replay.verify(tick)
+            if error is not None:
+                state.replay_error = f"tick {tick}: {error}"
+
+
+def step():
+    # Advance the whole universe by one fixed tick, without drawing. Queued
+    # spawns and kills (from input, then from each phase) are applied
+    # before the next phase starts
+    state.beams.clear()
+    commands = state.commands
+    commands.apply()
+    mark = state.profiler.mark
+    for name, phase in PHASES:
+        phase()
+        commands.apply()
+        mark(name)
+    commands.end_tick()
+
+
+def render_frame(phases=None):
+    # Draw the current state of the universe onto state.screen
+    mark = state.profiler.mark
+    for name, phase in phases or RENDER_PHASES:
+        phase()
+        mark(name)
+
+
+def run(
+    headless=False,
+    ticks=None,
+    seed=None,
+    window_id=None,
+    overlay=False,
+    render_mode=None,
+    workers=None,
+    record=None,
+    replay=None,
+    load_world=None,
+    save_world=None,
+    fps=None,
+    async_loop=False,
+    stream_address=None,
+    capture_target=None,
+    render_thread=None,
+):
+    # handle embedding into an existing window
+    if window_id is not None:
+        os.environ["SDL_WINDOWID"] = str(window_id)
+
+    if replay is not None:
+        # Same seed and input as the recording, for as long as it lasts
+        state.replay = Replay(replay)
+        state.replay_error = None
+        if state.replay.tick_rate != settings.TICK_RATE:
+            rate = state.replay.tick_rate
+            state.replay.close()
+            state.replay = None
+            raise ValueError(
+                f"{replay} was recorded at {rate} ticks/s, not {settings.TICK_RATE}"
+            )
+        if state.replay.size != state.world.size:
+            size = state.replay.size
+            state.replay.close()
+            state.replay = None
+            raise ValueError(
+                f"{replay} was recorded in a {size[0]}x{size[1]} world, "
+                f"not {state.world.width}x{state.world.height}"
+            )
+        seed = state.replay.seed
+        recorded = len(state.replay)
+        if ticks is not None and ticks > recorded:
+            print(f"{replay} ends after {recorded} ticks; stopping there")
+        ticks = recorded if ticks is None else min(ticks, recorded)
+    elif record is not None and seed is None:
+        seed = random.randrange(2**31)  # recordings are always reproducible
+
+    if seed is not None:
+        random.seed(seed)
+        particles.seed(seed)
+
+    if record is not None:
+        state.recorder = Recorder(record, seed, state.world.size)
+    if stream_address is not None:
+        state.stream = stream.StreamServer(stream_address)
+    if capture_target is not None:
+        # Only the window loop runs against the clock and may drop frames
+        rate = settings.RENDER_RATE if headless or not fps else fps
+        state.capture = capture.create(capture_target, rate, block=headless)
+    state.parallel = parallel.create(workers)
+    if not headless:
+        state.render_thread = renderthread.create(render_thread)
+    try:
+        if headless:
+            # No window; the screen is an offscreen surface, only drawn on
+            # when capturing frames
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            pygame.init()
+            state.screen = pygame.Surface(settings.WINDOW_SIZE)
+            run_headless(ticks, load_world)
+        elif async_loop:
+            asyncio.run(run_async(ticks, overlay, render_mode, load_world, fps))
+        else:
+            run_window(ticks, overlay, render_mode, load_world, fps)
+        if save_world is not None:
+            snapshot.save(save_world)
+    finally:
+        if state.render_thread is not None:
+            state.render_thread.close()
+            state.render_thread = None
+        if state.parallel is not None:
+            state.parallel.close()
+            state.parallel = None
+        if state.recorder is not None:
+            state.recorder.close()
+            state.recorder = None
+        if state.stream is not None:
+            state.stream.close()
+            state.stream = None
+        if state.capture is not None:
+            state.capture.close()
+            print(state.capture.summary())
+            state.capture = None
+        if state.replay is not None:
+            print(
+                f"replay diverged at {state.replay_error}"
+                if state.replay_error
+                else "replay matched the recording"
+            )
+            state.replay.close()
+            state.replay = None
+        pygame.quit()
+
+
+class WindowLoop:
+    """The windowed main loop, one frame() call per rendered frame.
+
+    Each frame runs however many fixed ticks the real time since the last
+    frame calls for, draws and presents, and returns when the next frame
+    should start; run_window sleeps until then, run_async lets background
+    tasks use the time.
+    """
+
+    def __init__(self, ticks, overlay, render_mode, world=None, fps=None):
+        # Init pygame and screen
+        pygame.init()
+        state.screen = pygame.display.set_mode(settings.WINDOW_SIZE)
+        state.camera = camera.Camera(state.screen.get_size(), state.world.size)
+        state.renderer = render.create(
+            render_mode or settings.RENDER_MODE, settings.WINDOW_SIZE
+        )
+        self.ticks = ticks
+        self.running = True
+        self.profiler = state.profiler
+        self.profiler.enabled = overlay
+        fps = settings.RENDER_RATE if fps is None else fps
+        self.frame_time = 1 / fps if fps else 0.0
+        self.overlay = PerfOverlay(budget_ms=1000 / (fps or settings.TICK_RATE))
+
+        # Create the universe
+        create_universe(world)
+
+        self.clock = timestep.FixedStep()
+        self.tick = 0
+        self.pending = []  # input not yet handed to a tick
+        self.next_frame = self.last_frame = time.perf_counter()
+
+    @property
+    def done(self):
+        return not self.running or self.tick == self.ticks
+
+    def frame(self):
+        """Run one frame; returns the time.perf_counter() time to start
+        the next one at (now when frames are uncapped or running late)."""
+        profiler = self.profiler
+        frame_start = time.perf_counter()
+        profiler.begin_frame()
+        polled = pygame.event.get()
+        # The view follows input every frame, however many ticks run
+        state.camera.control(polled, frame_start - self.last_frame)
+        self.last_frame = frame_start
+        self.pending += polled
+        due = self.clock.advance(frame_start)
+        state.ticks_dropped = self.clock.dropped
+        profiler.mark("events")
+
+        for _ in range(due):
+            # Input polled since the last tick goes to the next one
+            events = input_events(self.tick, self.pending)
+            self.pending = []
+            self.running = handle_events(events)
+            profiler.mark("events")
+            step()
+            after_step(self.tick, events)
+            self.tick += 1
+            if self.done:
+                break
+
+        state.alpha = self.clock.alpha if settings.INTERPOLATE else 1.0
+        if state.render_thread is not None:
+            self.draw_threaded(profiler)
+        else:
+            self.draw(profiler)
+        govern(frame_start)
+
+        # Cap the frame rate; a late frame starts the next one right away
+        # rather than drawing several in a burst to make up for it
+        now = time.perf_counter()
+        if self.frame_time:
+            self.next_frame += self.frame_time
+            if self.next_frame < now:
+                self.next_frame = now
+        else:
+            self.next_frame = now
+        return self.next_frame
+
+    def draw(self, profiler, phases=None):
+        # Clear, draw and show the frame on this thread
+        state.renderer.begin_frame(state.screen)
+        profiler.mark("clear")
+        render_frame(phases)
+        if state.capture is not None:
+            state.capture.grab(state.screen)
+            profiler.mark("capture")
+        self.present(profiler)
+
+    def present(self, profiler):
+        if profiler.enabled:
+            state.renderer.mark(self.overlay.draw(state.screen))
+            profiler.mark("overlay")
+        state.renderer.end_frame()
+        profiler.mark("flip")
+
+    def draw_threaded(self, profiler):
+        # Queue this frame's commands, show the frame the render thread drew
+        # in the meantime and hand this one over (see renderthread.py)
+        thread = state.render_thread
+        render_frame(RENDER_PHASES[:-1])
+        drawn = thread.pending
+        try:
+            thread.wait()
+        except Exception as error:
+            print(f"render thread failed ({error!r}), drawing on the main thread")
+            thread.close()
+            state.render_thread = None
+            self.draw(profiler, RENDER_PHASES[-1:])
+            return
+        profiler.mark("wait render")
+        if drawn:
+            self.present(profiler)
+        thread.submit()
+
+    def end_frame(self):
+        # After the wait for the next frame
+        self.profiler.mark("wait")
+        self.profiler.end_frame()
+
+
+def run_window(ticks, overlay, render_mode, world=None, fps=None):
+    loop = WindowLoop(ticks, overlay, render_mode, world, fps)
+    while not loop.done:
+        delay = loop.frame() - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        loop.end_frame()
+
+
+async def run_async(ticks, overlay, render_mode, world=None, fps=None):
+    # The window loop on asyncio: the wait between frames is the idle
+    # window for background tasks in state.tasks (see tasks.py)
+    loop = WindowLoop(ticks, overlay, render_mode, world, fps)
+    state.tasks = tasks.Scheduler()
+    if state.stream is not None:
+        state.tasks.spawn(state.stream.serve, name="stream")
+    idle = settings.TASK_IDLE_MS / 1000
+    try:
+        while not loop.done:
+            next_frame = loop.frame()
+            if not loop.frame_time:
+                # Uncapped frames have no idle time; make some
+                next_frame += idle
+            await state.tasks.idle(next_frame)
+            loop.end_frame()
+    finally:
+        await state.tasks.close()
+        state.tasks = None
+
+
+def run_headless(ticks, world=None):
+    # Step at the fixed tick rate as fast as the CPU allows
+    if ticks is None:
+        ticks = settings.TICK_RATE * 60
+
+    create_universe(world)
+
+    # Frames are only drawn for capture, at RENDER_RATE of simulated time
+    frame_ticks = max(1, settings.TICK_RATE // (settings.RENDER_RATE or 1))
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        events = input_events(tick, [])
+        handle_events(events)
+        step()
+        after_step(tick, events)
+        if state.capture is not None and tick % frame_ticks == 0:
+            state.renderer.begin_frame(state.screen)
+            render_frame()
+            state.capture.grab(state.screen)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{ticks} ticks in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks/s, "
+        f"{ticks / settings.TICK_RATE / elapsed:.1f}x real time), "
+        f"{len(state.ships)} ships, {len(state.bullets)} bullets"
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Space battle simulation")
+    parser.add_argument(
+        "window_id", nargs="?", help="embed into this window (SDL_WINDOWID)"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="simulate without a window or any drawing, as fast as possible",
+    )
+    parser.add_argument(
+        "--ticks", type=int, help="stop after this many simulation ticks"
+    )
+    parser.add_argument("--seed", type=int, help="seed for reproducible runs")
+    parser.add_argument(
+        "--render",
+        choices=["full", "dirty"],
+        help="full-screen clear and flip, or dirty rectangles only "
+        f"(default {settings.RENDER_MODE})",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="store_true",
+        help="start with the performance overlay shown (toggle with F3)",
+    )
+    parser.add_argument(
+        "--fps",
+        type=int,
+        help="draw at most this many frames per second, 0 for no cap; the "
+        f"simulation runs at {settings.TICK_RATE} ticks/s regardless "
+        f"(default {settings.RENDER_RATE})",
+    )
+    parser.add_argument(
+        "--async",
+        dest="async_loop",
+        action="store_true",
+        help="run the window loop on asyncio, with the time between frames "
+        "free for background tasks (see tasks.py)",
+    )
+    parser.add_argument(
+        "--render-thread",
+        action=argparse.BooleanOptionalAction,
+        help="draw frames on a separate thread while the next one is "
+        f"simulated (default {'on' if settings.RENDER_THREAD else 'off'}, "
+        "see renderthread.py)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="step ships and bullets in this many worker processes "
+        f"(default {settings.SIM_WORKERS}, serial)",
+    )
+    parser.add_argument("--record", metavar="FILE", help="record a replay to FILE")
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="re-simulate a recording with its seed and input, checking that "
+        "the world matches it",
+    )
+    parser.add_argument(
+        "--stream",
+        metavar="ADDRESS",
+        help="publish the world to spectators on host:port or a Unix socket "
+        "path (see stream.py)",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="TARGET",
+        help="record drawn frames as PNG files in directory TARGET, or pipe "
+        'them raw to a command given as "|command" (see capture.py)',
+    )
+    parser.add_argument(
+        "--load-world",
+        metavar="FILE",
+        help="start from a world snapshot instead of a fresh universe",
+    )
+    parser.add_argument(
+        "--save-world", metavar="FILE", help="save a world snapshot when done"
+    )
+    args = parser.parse_args(argv)
+    if args.load_world and (args.record or args.replay):
+        # Recordings start from their seed, not from a saved world
+        parser.error("--load-world can't be combined with --record or --replay")
+    if args.async_loop and args.headless:
+        parser.error("--async paces a window loop; it can't be --headless")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run(
+        headless=args.headless,
+        ticks=args.ticks,
+        seed=args.seed,
+        window_id=args.window_id,
+        overlay=args.overlay,
+        render_mode=args.render,
+        workers=args.workers,
+        record=args.record,
+        replay=args.replay,
+        load_world=args.load_world,
+        save_world=args.save_world,
+        fps=args.fps,
+        async_loop=args.async_loop,
+        stream_address=args.stream,
+        capture_target=args.capture,
+        render_thread=args.render_thread,
+    )
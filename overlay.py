@@ -0,0 +1,96 @@
+import pygame
+
+import state
+
+
+class PerfOverlay:
+    """On-screen frame time, per-phase timings, entity counts and a graph.
+
+    Reads everything from state.profiler; toggled together with it (F3).
+    """
+
+    def __init__(self, budget_ms=10.0, graph_size=(300, 80)):
+        self.budget_ms = budget_ms
+        self.graph_size = graph_size
+        self.font = None
+
+    def _font(self):
+        if self.font is None:
+            pygame.font.init()
+            self.font = pygame.font.Font(None, 20)
+        return self.font
+
+    def lines(self):
+        profiler = state.profiler
+        busy = profiler.busy_times[-1] if profiler.busy_times else 0.0
+        avg = profiler.average_frame_ms()
+        fps = 1000 / avg if avg else 0.0
+        lines = [
+            f"busy {busy:5.1f} ms  frame avg {avg:5.1f} ms  ({fps:.0f} fps)",
+            f"ticks dropped {state.ticks_dropped}  queued "
+            + "  ".join(f"{k} {v}" for k, v in state.commands.last_tick.items()),
+            f"{state.quality.describe()}  particles dropped "
+            f"{state.particles.dropped}",
+            "draw "
+            + "  ".join(f"{k} {v}" for k, v in state.draw_list.counts.items()),
+        ]
+        for name, ms in profiler.phase_ms.items():
+            lines.append(f"  {name:<12} {ms:6.2f} ms")
+        if state.tasks is not None:
+            for name, used, budget, overruns in state.tasks.stats():
+                lines.append(
+                    f"  task {name:<7} {used:6.2f} ms of {budget:.1f}  "
+                    f"overruns {overruns}"
+                )
+        if state.render_thread is not None:
+            thread = state.render_thread
+            lines.append(
+                f"render thread {thread.raster_ms:6.2f} ms drawing  "
+                f"{thread.wait_ms:6.2f} ms waited for"
+            )
+        if state.capture is not None:
+            captured, dropped, queued, copy, encode = state.capture.stats()
+            lines.append(
+                f"capture {captured} frames  dropped {dropped}  queued {queued}  "
+                f"copy {copy:.2f} ms  encode {encode:.1f} ms"
+            )
+        lines.append(
+            f"stars {len(state.starfield or ())}  ships {len(state.ships)}  "
+            f"bullets {len(state.bullets)}  deaths {len(state.deaths)}  "
+            f"effects {len(state.effects)}  particles {len(state.particles)}"
+        )
+        return lines
+
+    def _draw_graph(self, surface, left, top):
+        width, height = self.graph_size
+        pygame.draw.rect(surface, (20, 20, 20), (left, top, width, height))
+        # Scale so the frame budget sits at half height
+        scale = height / (self.budget_ms * 2)
+        budget_y = top + height - int(self.budget_ms * scale)
+        pygame.draw.line(
+            surface, (90, 90, 0), (left, budget_y), (left + width, budget_y)
+        )
+        # Work per frame, excluding the frame cap wait
+        times = list(state.profiler.busy_times)[-width:]
+        x = left + width - len(times)
+        for ms in times:
+            bar = min(height, int(ms * scale))
+            color = (0, 200, 0) if ms <= self.budget_ms else (220, 50, 50)
+            pygame.draw.line(
+                surface, color, (x, top + height), (x, top + height - bar)
+            )
+            x += 1
+
+    def draw(self, surface):
+        # Returns the Rect covered, for dirty-rect rendering
+        font = self._font()
+        left, top = 10, 10
+        y = top
+        covered = pygame.Rect(left, top, *self.graph_size)
+        for line in self.lines():
+            text = font.render(line, True, (230, 230, 230), (0, 0, 0))
+            covered.union_ip(surface.blit(text, (left, y)))
+            y += text.get_height()
+        self._draw_graph(surface, left, y + 6)
+        covered.union_ip((left, y + 6, *self.graph_size))
+        return covered
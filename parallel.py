@@ -0,0 +1,304 @@
+"""Multi-process stepping of ship movement and bullet collisions.
+
+The world is cut into vertical strips (regions), and worker processes
+move the entities of their regions in place in shared memory:
+
+- state.bullets keeps its columns in RawArray buffers while the pool
+  runs (ColumnStore.reallocate()), so the store's own arrays are what
+  the workers integrate and test for hits; nothing is copied in or out.
+- Ships are gathered once per tick, at the start of the ship phase, into
+  a shared ShipTable (gather_table()). The workers move it, the merge
+  writes the positions back to the ships, and after the ships act the
+  table reads again what acting can change (velocity after recoil, the
+  angle, freeze rays). The bullet phase then collides against that same
+  table, and the encoders read it after the tick.
+
+Regions are assigned from positions by the main process before the
+workers start, so entities that crossed a border simply belong to the
+neighbouring strip next tick. Bullet collisions look at every ship
+within reach of the region's bullets, not just the ships inside the
+strip, so hits across a border are found by the bullet's region, and the
+merge applies all hits in store order.
+
+Decisions that use the shared RNG (turning, firing, effects) and
+everything that creates or destroys entities stay in the main process.
+Unlike the serial loop, every ship moves before any of them acts, so the
+parallel mode is not tick-for-tick identical to it.
+"""
+
+import multiprocessing
+import operator
+import signal
+
+import numpy as np
+
+import bullet
+import settings
+import state
+from grid import first_overlaps
+from ship import ShipTable, gather_table
+
+# Rows of the shared ship block: the ShipTable columns, then the region
+SX, SY, SVX, SVY, SFREEZE, SRADIUS = map(
+    ShipTable.COLUMNS.index, ("x", "y", "vx", "vy", "freeze_ticks", "radius")
+)
+SREGION = len(ShipTable.COLUMNS)
+SHIP_ROWS = SREGION + 1
+
+# What acting can change on a ship after it moved
+ACTED = ("vx", "vy", "_angle", "freeze_ticks")
+
+# Worker side views of the shared arrays, set by _attach()
+_ships = None
+_ship_uids = None
+_bullets = None  # column name -> array, as in state.bullets.columns
+_bullet_regions = None
+
+
+def shared_array(shape, dtype):
+    """Zeroed array in a RawArray, for ColumnStore(allocate=...)."""
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    raw = multiprocessing.RawArray("b", max(1, size * dtype.itemsize))
+    return np.frombuffer(raw, dtype, size).reshape(shape)
+
+
+def _handle(array):
+    # What a worker needs to map a shared_array() array: (raw, dtype, shape)
+    raw = array
+    while isinstance(raw, np.ndarray):
+        raw = raw.base
+    return raw, array.dtype.str, array.shape
+
+
+def _view(raw, dtype, shape):
+    return np.frombuffer(raw, dtype, int(np.prod(shape))).reshape(shape)
+
+
+def _attach(ships, ship_uids, bullet_regions, bullets):
+    # Pool initializer: views of the arrays the main process handed over
+    global _ships, _ship_uids, _bullets, _bullet_regions
+    # SDL's SIGTERM handler came along with the fork and would keep
+    # Pool.terminate() from stopping the worker
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _ships = _view(*ships)
+    _ship_uids = _view(*ship_uids)
+    _bullet_regions = _view(*bullet_regions)
+    _bullets = {name: _view(*column) for name, column in bullets.items()}
+
+
+def _move_ships(task):
+    region, count, player, width, height = task
+    a = _ships[:, :count]
+    idx = np.flatnonzero(a[SREGION] == region)
+    idx = idx[idx != player]
+
+    frozen = a[SFREEZE, idx] > 0
+    thawing = idx[frozen]
+    a[SFREEZE, thawing] -= 1
+
+    idx = idx[~frozen]
+    nx = a[SX, idx] + a[SVX, idx]
+    ny = a[SY, idx] + a[SVY, idx]
+    inside = (nx >= 0) & (ny >= 0) & (nx < width) & (ny < height)
+    idx = idx[inside]
+    a[SX, idx] = nx[inside]
+    a[SY, idx] = ny[inside]
+
+
+def _move_bullets(task):
+    # Returns the rows that hit, the ships they hit and the rows that left
+    region, count, ship_count, width, height = task
+    idx = np.flatnonzero(_bullet_regions[:count] == region)
+    if not len(idx):
+        return idx, idx, idx
+
+    # As bullet.integrate_all(), for this region's rows
+    b = _bullets
+    x, y, vx, vy = b["x"], b["y"], b["vx"], b["vy"]
+    b["prev_x"][idx] = x[idx]
+    b["prev_y"][idx] = y[idx]
+    vx[idx] += b["accel_x"][idx]
+    vy[idx] += b["accel_y"][idx]
+    x[idx] += vx[idx]
+    y[idx] += vy[idx]
+    moving = idx[(vx[idx] != 0) | (vy[idx] != 0)]
+    b["_angle"][moving] = np.arctan2(vy[moving], vx[moving])
+
+    px = x[idx]
+    py = y[idx]
+    out = (px < 0) | (py < 0) | (px >= width) | (py >= height)
+
+    # Every ship within reach of a bullet's x is a candidate, including
+    # ships across the strip borders
+    s = _ships[:, :ship_count]
+    hits = first_overlaps(
+        px, py, b["owner"][idx], s[SX], s[SY], s[SRADIUS], _ship_uids[:ship_count]
+    )
+    hit = hits >= 0
+    return idx[hit], hits[hit], idx[out]
+
+
+class ParallelSim:
+    """Steps ships and bullets in a pool of worker processes.
+
+    Plugs into main.update_ships/update_bullets via state.parallel. The
+    ship block is sized for `ships` and bullets get room for `bullets`;
+    when the world outgrows either, the arrays double and the pool
+    restarts with the new ones. close() moves state.bullets back into
+    private memory.
+    """
+
+    def __init__(self, workers, regions_per_worker=2, ships=4096, bullets=65536):
+        self.workers = workers
+        self.regions = max(1, workers * regions_per_worker)
+        self.ship_capacity = ships
+        self.pool = None
+        self.ships = None  # (SHIP_ROWS, capacity) shared ship block
+        self.ship_uids = None
+        self.bullet_regions = None
+        self._attached = []  # the arrays the pool's workers have views of
+        state.bullets.reallocate(shared_array, bullets)
+        # Stats for tuning
+        self.restarts = 0
+        self.hits = 0
+
+    def _shared(self):
+        # Every shared array the workers use, growing them as needed
+        ships = len(state.ships)
+        if self.ships is None or ships > self.ship_capacity:
+            while ships > self.ship_capacity:
+                self.ship_capacity *= 2
+            self.ships = shared_array((SHIP_ROWS, self.ship_capacity), np.float64)
+            self.ship_uids = shared_array(self.ship_capacity, np.int64)
+        store = state.bullets
+        if self.bullet_regions is None or len(self.bullet_regions) < store.capacity:
+            self.bullet_regions = shared_array(store.capacity, np.int16)
+        return [self.ships, self.ship_uids, self.bullet_regions], store.columns
+
+    def _reserve(self):
+        # Start the pool, or restart it once an array has been replaced
+        blocks, columns = self._shared()
+        arrays = blocks + list(columns.values())
+        if self.pool is not None:
+            attached = self._attached
+            same = len(arrays) == len(attached)
+            if same and all(map(operator.is_, arrays, attached)):
+                return
+            self._stop()
+            self.restarts += 1
+        ctx = multiprocessing.get_context()
+        self.pool = ctx.Pool(
+            self.workers,
+            initializer=_attach,
+            initargs=(
+                *map(_handle, blocks),
+                {name: _handle(column) for name, column in columns.items()},
+            ),
+        )
+        self._attached = arrays
+
+    def _stop(self):
+        if self.pool is not None:
+            # No task is ever left running, so the workers can just finish
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def close(self):
+        self._stop()
+        state.bullets.reallocate(np.zeros)
+
+    def _regions(self, x):
+        # Vertical strip index of each x, clamped for entities outside the world
+        strip = state.world.width / self.regions
+        return np.clip(x // strip, 0, self.regions - 1)
+
+    def _gather_ships(self, previous=None):
+        table = gather_table(self.ships, self.ship_uids, previous)
+        n = len(table.ships)
+        self.ships[SREGION, :n] = self._regions(table.column("x"))
+        return table
+
+    def update_ships(self):
+        ships = state.ships.to_list()
+        n = len(ships)
+        if not n:
+            state.ship_table = None  # last tick's, nothing to keep
+            return
+        for ship in ships:
+            if ship is not state.player:
+                ship.steer()
+
+        self._reserve()
+        table = self._gather_ships()
+        a = self.ships
+        frozen = np.flatnonzero(a[SFREEZE, :n] > 0).tolist()
+        player = state.player
+        player = state.ships.position(player) if player in state.ships else -1
+        width, height = state.world.size
+        tasks = [(region, n, player, width, height) for region in range(self.regions)]
+        self.pool.map(_move_ships, tasks)
+
+        # Merge: write positions back and keep the grid in sync
+        grid = state.ship_grid
+        for ship, x, y in zip(ships, a[SX, :n].tolist(), a[SY, :n].tolist()):
+            ship.prev_x = ship.x
+            ship.prev_y = ship.y
+            if x != ship.x or y != ship.y:
+                ship.x = x
+                ship.y = y
+                grid.update(ship)
+        for i in frozen:
+            ships[i].freeze_ticks = int(a[SFREEZE, i])
+
+        for ship in ships:
+            if ship is not state.player:
+                ship.act()
+        table.refresh(ACTED)
+
+    def update_bullets(self):
+        table = state.ship_table
+        if table is None or table.ships != state.ships.to_list():
+            # Ships were spawned or killed since the ship phase; only the
+            # new ones need reading
+            self._reserve()
+            table = self._gather_ships(table)
+        store = state.bullets
+        n = len(store)
+        if not n:
+            return
+        self._reserve()
+
+        self.bullet_regions[:n] = self._regions(store.view("x"))
+        width, height = state.world.size
+        tasks = [
+            (region, n, len(table.ships), width, height)
+            for region in range(self.regions)
+        ]
+        rows, hit_ships, out = map(
+            np.concatenate, zip(*self.pool.map(_move_bullets, tasks))
+        )
+        self.hits += len(rows)
+
+        # Merge: queue hits in store order so that a ship hit by several
+        # bullets dies once and the others fly on
+        order = np.argsort(rows)
+        ships = table.ships
+        hits = list(
+            zip(
+                store.at(rows[order].tolist()),
+                [ships[i] for i in hit_ships[order].tolist()],
+            )
+        )
+        gone = store.at(np.sort(out).tolist())
+        bullet.trail_all()
+        bullet.apply_hits(hits)
+        for b in gone:
+            b.destroy()
+
+
+def create(workers=None):
+    # 0 workers keeps the serial loop
+    workers = settings.SIM_WORKERS if workers is None else workers
+    return ParallelSim(workers) if workers > 0 else None
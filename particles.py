@@ -0,0 +1,288 @@
+import numpy as np
+import pygame
+
+import timestep
+
+# Shared random source for emitters; reseed via seed() for reproducible runs
+rng = np.random.default_rng()
+
+
+def seed(value):
+    global rng
+    rng = np.random.default_rng(value)
+
+
+# Particle kinds. Each kind is one row in the behaviour tables below so the
+# whole population can be updated in a single vectorized pass.
+SPARK = 0  # hot debris: drag, outward push, shrinks and dies when tiny
+SMOKE = 1  # cooling debris: floats upward and grows
+EXHAUST = 2  # engine burst: shrinks down to a minimum size
+TRAIL = 3  # bomb trail puffs: light drag, grows a little
+
+# Behaviour tables, indexed by kind (spark, smoke, exhaust, trail), per
+# second: speed kept after a second of drag, lift and push in px/s², radius
+# growth in px/s
+DRAG = np.array([0.133, 0.366, 1.0, 0.133])
+LIFT = np.array([0.0, -100.0, 0.0, 0.0])
+PUSH = np.array([200.0, 0.0, 0.0, 0.0])
+GROWTH = np.array([-4.0, 8.0, -10.0, 5.0])
+
+# The same per tick, as update() applies them
+_DRAG = timestep.factor_per_tick(DRAG)
+_LIFT = timestep.per_tick_squared(LIFT)
+_PUSH = timestep.per_tick_squared(PUSH)
+_GROWTH = timestep.per_tick(GROWTH)
+
+_MIN_R = np.array([0.5, 0.0, 1.0, 0.0])
+_MAX_R = np.array([np.inf, 12.0, np.inf, 4.0])
+_KILL_R = np.array([0.5, -1.0, -1.0, -1.0])  # dies once radius <= this
+
+# Colors are stored per particle as an index into this palette, one entry
+# per RGB value however the color was given
+palette = []
+_palette_ids = {}  # color as given -> index
+_rgb_ids = {}  # (r, g, b) -> index
+
+
+def color_id(color):
+    """Return the palette index for a color name or RGB tuple."""
+    key = color if isinstance(color, str) else tuple(color)
+    index = _palette_ids.get(key)
+    if index is None:
+        c = pygame.Color(color)
+        rgb = (c.r, c.g, c.b)
+        index = _rgb_ids.get(rgb)
+        if index is None:
+            index = _rgb_ids[rgb] = len(palette)
+            palette.append(rgb)
+        _palette_ids[key] = index
+    return index
+
+
+# Pixel offsets (dx, dy) of filled circles keyed by radius
+_discs = {}
+
+
+def _disc(radius):
+    # Pixels covering a filled circle, like pygame.draw.circle
+    offsets = _discs.get(radius)
+    if offsets is None:
+        d = np.arange(-radius, radius, dtype=np.intp)
+        dx, dy = np.meshgrid(d, d)
+        inside = (dx + 0.5) ** 2 + (dy + 0.5) ** 2 <= radius * radius
+        offsets = _discs[radius] = dx[inside], dy[inside]
+    return offsets
+
+
+# Pixel indices and colors of one radius, reused every frame: allocating
+# megabytes anew each time costs as much as filling them
+_scratch = {np.intp: np.empty(0, np.intp), np.uint32: np.empty(0, np.uint32)}
+
+
+def _scratch_array(shape, dtype):
+    n = shape[0] * shape[1]
+    array = _scratch[dtype]
+    if len(array) < n:
+        array = _scratch[dtype] = np.empty(max(n, 2 * len(array)), dtype)
+    return array[:n].reshape(shape)
+
+
+def draw_circles(surface, cx, cy, radius, colors):
+    """Draw filled circles given as int arrays and palette color indices."""
+    if len(cx) == 0:
+        return
+    if surface.get_bitsize() != 32:
+        # Unusual surfaces go through pygame
+        for x, y, r, color in zip(
+            cx.tolist(), cy.tolist(), radius.tolist(), colors.tolist()
+        ):
+            pygame.draw.circle(surface, palette[color], (x, y), r)
+        return
+
+    # Circles are splatted straight into the pixel buffer, one scatter per
+    # radius with flat indices and values: NumPy broadcasting the colors
+    # over a 2-D index is several times slower. Circles crossing the edge
+    # keep their pixels that are on screen
+    width, height = surface.get_size()
+    mapped = np.array([surface.map_rgb(c) for c in palette], dtype=np.uint32)
+    buffer = surface.get_buffer()
+    flat = np.frombuffer(buffer, dtype=np.uint32)
+    pitch = surface.get_pitch() // 4
+    inner = (cx >= radius) & (cy >= radius) & (cx < width - radius)
+    inner &= cy < height - radius
+    # Interior circles grouped by radius with one stable (radix) sort, so
+    # each group keeps its drawing order; the others are in group 0
+    group = np.where(inner, radius, 0).astype(np.uint16)
+    order = np.argsort(group, kind="stable")
+    ends = np.cumsum(np.bincount(group)).tolist()
+    centers = (cy.astype(np.intp) * pitch + cx)[order]
+    values = mapped[colors[order]]
+    edge = np.flatnonzero(~inner)
+    edge_radius = radius[edge]
+    radii = np.flatnonzero(np.bincount(radius))
+    for r in radii[radii > 0].tolist():
+        dx, dy = _disc(r)
+        if r < len(ends):
+            start, end = ends[r - 1], ends[r]
+            shape = (end - start, len(dx))
+            index = np.add(
+                centers[start:end, None],
+                dy * pitch + dx,
+                out=_scratch_array(shape, np.intp),
+            )
+            color = _scratch_array(shape, np.uint32)
+            color[:] = values[start:end, None]
+            flat[index.ravel()] = color.ravel()
+
+        clipped = edge[edge_radius == r]
+        if len(clipped):
+            x = cx[clipped, None] + dx
+            y = cy[clipped, None] + dy
+            keep = (x >= 0) & (y >= 0) & (x < width) & (y < height)
+            color = np.broadcast_to(mapped[colors[clipped], None], x.shape)
+            flat[y[keep] * pitch + x[keep]] = color[keep]
+    del flat, buffer
+
+
+_FIELDS = ("x", "y", "px", "py", "vx", "vy", "ox", "oy", "life", "r", "kind", "color")
+
+
+class ParticleSystem:
+    """Struct-of-arrays particle store shared by every effect.
+
+    Live particles are packed at the front of preallocated NumPy arrays.
+    Effects only emit into it; update() advances every live particle at
+    once and compacts away the dead ones. Positions at the previous tick
+    (px, py) are kept for drawing in between ticks. With a limit,
+    emissions past it are cut short and counted in dropped.
+    """
+
+    def __init__(self, capacity=4096, limit=None):
+        self.count = 0
+        self.limit = limit
+        self.dropped = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "x", None)
+        self.capacity = capacity
+        fields = {}
+        for name in ("x", "y", "px", "py", "vx", "vy", "ox", "oy", "life", "r"):
+            fields[name] = np.zeros(capacity, dtype=np.float64)
+        fields["kind"] = np.zeros(capacity, dtype=np.int8)
+        fields["color"] = np.zeros(capacity, dtype=np.int16)
+        if old is not None:
+            n = self.count
+            for name, arr in fields.items():
+                arr[:n] = getattr(self, name)[:n]
+        for name, arr in fields.items():
+            setattr(self, name, arr)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, kind, x, y, vx, vy, life, r, color):
+        """Append particles; any argument but kind may be an array.
+
+        A particle starts at its (x, y), which is also the origin used for
+        the outward push of sparks.
+        """
+        n = len(vx)
+        if self.limit is not None and self.count + n > self.limit:
+            room = max(0, self.limit - self.count)
+            self.dropped += n - room
+            if room == 0:
+                return
+            x, y, vx, vy, life, r, color = (
+                a[:room] if np.ndim(a) else a for a in (x, y, vx, vy, life, r, color)
+            )
+            n = room
+        start = self.count
+        end = start + n
+        if end > self.capacity:
+            capacity = self.capacity
+            while capacity < end:
+                capacity *= 2
+            self._allocate(capacity)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.px[start:end] = x
+        self.py[start:end] = y
+        self.ox[start:end] = x
+        self.oy[start:end] = y
+        self.vx[start:end] = vx
+        self.vy[start:end] = vy
+        self.life[start:end] = life
+        self.r[start:end] = r
+        self.kind[start:end] = kind
+        self.color[start:end] = color
+        self.count = end
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        x, y = self.x[:n], self.y[:n]
+        vx, vy = self.vx[:n], self.vy[:n]
+        kind = self.kind[:n]
+
+        self.px[:n] = x
+        self.py[:n] = y
+        x += vx
+        y += vy
+        vy += _LIFT[kind]
+        drag = _DRAG[kind]
+        vx *= drag
+        vy *= drag
+
+        # Outward push away from the emission point keeps bursts round
+        push = _PUSH[kind]
+        dx = x - self.ox[:n]
+        dy = y - self.oy[:n]
+        # sqrt of the sum is several times faster than np.hypot here
+        dist = np.sqrt(dx * dx + dy * dy) + 1e-5
+        vx += dx / dist * push
+        vy += dy / dist * push
+
+        life = self.life[:n]
+        life -= 1
+        r = self.r[:n]
+        r += _GROWTH[kind]
+        np.maximum(r, _MIN_R[kind], out=r)
+        np.minimum(r, _MAX_R[kind], out=r)
+
+        alive = (life > 0) & (r > _KILL_R[kind])
+        live = int(np.count_nonzero(alive))
+        if live != n:
+            for name in _FIELDS:
+                arr = getattr(self, name)
+                arr[:live] = arr[:n][alive]
+            self.count = live
+
+    def render(self, draw_list, layer, camera, alpha=1.0):
+        # Hand the particles in view to the draw list as one bulk circle
+        # command, alpha of the way from the previous tick's positions
+        n = self.count
+        if n:
+            px, py = self.px[:n], self.py[:n]
+            keep, sx, sy, sr = camera.project(
+                px + (self.x[:n] - px) * alpha,
+                py + (self.y[:n] - py) * alpha,
+                self.r[:n],
+            )
+            draw_list.circles(layer, sx, sy, sr, self.color[:n][keep])
+
+    def draw(self, surface):
+        n = self.count
+        if n == 0:
+            return
+        draw_circles(
+            surface,
+            self.x[:n].astype(np.int32),
+            self.y[:n].astype(np.int32),
+            np.maximum(1, self.r[:n].astype(np.int32)),
+            self.color[:n],
+        )
@@ -0,0 +1,56 @@
+class Pool:
+    """Free list of reusable instances of one class.
+
+    acquire(*args) hands out a released instance after calling its
+    reset(*args), or constructs a new one when the free list is empty.
+    release(obj) returns an instance for reuse; anything beyond the cap is
+    left to the garbage collector. Callers must release an object at most
+    once per acquire.
+    """
+
+    def __init__(self, cls, cap=1024, enabled=True):
+        self.cls = cls
+        self.cap = cap
+        self.enabled = enabled
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.dropped = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.reused += 1
+            return obj
+        self.created += 1
+        return self.cls(*args, **kwargs)
+
+    def release(self, obj):
+        if not self.enabled or len(self.free) >= self.cap:
+            self.dropped += 1
+            return
+        self.free.append(obj)
+        self.released += 1
+
+    def clear(self):
+        self.free.clear()
+
+    def stats(self):
+        acquired = self.created + self.reused
+        return {
+            "created": self.created,
+            "reused": self.reused,
+            "released": self.released,
+            "dropped": self.dropped,
+            "free": len(self.free),
+            "in_use": acquired - self.released - self.dropped,
+            "reuse_rate": self.reused / acquired if acquired else 0.0,
+        }
+
+    def reset_stats(self):
+        self.created = 0
+        self.reused = 0
+        self.released = 0
+        self.dropped = 0
@@ -0,0 +1,71 @@
+import time
+from collections import deque
+
+
+class FrameProfiler:
+    """Per-phase frame timings for the main loop.
+
+    The loop calls begin_frame(), then mark(name) after each phase and
+    end_frame() at the end. Every call returns immediately while the
+    profiler is disabled, so the hooks can stay in place permanently.
+    """
+
+    def __init__(self, history=300, smoothing=0.1, idle=("wait",)):
+        self.enabled = False
+        self.smoothing = smoothing
+        # Phases that are spent waiting rather than working
+        self.idle = idle
+        self.frame_times = deque(maxlen=history)  # ms, most recent last
+        self.busy_times = deque(maxlen=history)  # frame_times minus idle
+        self.phase_ms = {}  # name -> smoothed ms
+        self.last_frame = {}  # name -> ms of the last completed frame
+        self._current = {}
+        self._frame_start = 0.0
+        self._last = 0.0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        if not self.enabled:
+            self.reset()
+
+    def reset(self):
+        self.frame_times.clear()
+        self.busy_times.clear()
+        self.phase_ms.clear()
+        self.last_frame = {}
+        self._current = {}
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._last = time.perf_counter()
+        self._current = {}
+
+    def mark(self, name):
+        # Charge the time since the previous mark to this phase
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        ms = (now - self._last) * 1000
+        self._current[name] = self._current.get(name, 0.0) + ms
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled or not self._frame_start:
+            return
+        now = time.perf_counter()
+        total = (now - self._frame_start) * 1000
+        self.frame_times.append(total)
+        self.busy_times.append(
+            total - sum(self._current.get(name, 0.0) for name in self.idle)
+        )
+        a = self.smoothing
+        for name, ms in self._current.items():
+            old = self.phase_ms.get(name)
+            self.phase_ms[name] = ms if old is None else old + (ms - old) * a
+        self.last_frame = self._current
+
+    def average_frame_ms(self):
+        if not self.frame_times:
+            return 0.0
+        return sum(self.frame_times) / len(self.frame_times)
@@ -0,0 +1,141 @@
+"""Adaptive effect quality.
+
+QualityGovernor watches how long recent frames took against a budget.
+Over budget, it steps effect quality down one level: fewer particles per
+explosion and exhaust burst, less frequent bomb trails and shorter spark
+lifetimes. Once frames come in well under budget again it steps back up.
+Separate thresholds for degrading and restoring, and a longer wait before
+restoring, keep it from flapping between two levels.
+
+Quality only changes what effects look like, never what ships and
+bullets do: effects draw from particles.rng, not the simulation RNG.
+Level changes travel as LEVEL_CHANGED input events, so they apply at a
+tick boundary and replays (which record input) reproduce them.
+
+On top of the levels, settings.MAX_PARTICLES and settings.MAX_EFFECTS
+are hard caps that hold at every level.
+"""
+
+from collections import deque
+
+import pygame
+
+import settings
+
+# (name, spawn scale, trail interval in seconds, spark life scale)
+LEVELS = [
+    ("full", 1.0, 0.03, 1.0),
+    ("reduced", 0.6, 0.05, 0.8),
+    ("low", 0.35, 0.08, 0.6),
+    ("minimal", 0.15, 0.12, 0.4),
+]
+
+# Input event carrying the new level in its `level` attribute
+LEVEL_CHANGED = pygame.event.custom_type()
+
+
+class QualityGovernor:
+    """Picks the effect quality level from recent frame times.
+
+    The main loop reports each frame's busy time with observe(), which
+    returns a new level when one is due, and applies level changes with
+    set_level(). spawn_count(), trail_interval and life_scale are what
+    effects read.
+    """
+
+    def __init__(
+        self,
+        budget_ms=None,
+        window=30,
+        degrade_at=1.0,
+        restore_at=0.7,
+        degrade_wait=30,
+        restore_wait=120,
+    ):
+        self.enabled = settings.QUALITY_GOVERNOR
+        # One frame at the render rate unless configured
+        self.budget_ms = (
+            budget_ms
+            or settings.QUALITY_BUDGET_MS
+            or 1000 / (settings.RENDER_RATE or settings.TICK_RATE)
+        )
+        # Average frame time over the window vs budget * these
+        self.degrade_at = degrade_at
+        self.restore_at = restore_at
+        # Frames to wait after a change before degrading or restoring again
+        self.degrade_wait = degrade_wait
+        self.restore_wait = restore_wait
+        self.frame_ms = deque(maxlen=window)
+        self.level = 0
+        self.frames_at_level = 0
+        self.changes = 0
+        self._apply(0)
+
+    def _apply(self, level):
+        self.level = level
+        name, spawn_scale, trail_interval, life_scale = LEVELS[level]
+        self.name = name
+        self.spawn_scale = spawn_scale
+        self.trail_interval = trail_interval
+        self.life_scale = life_scale
+
+    def set_level(self, level):
+        level = max(0, min(len(LEVELS) - 1, int(level)))
+        if level != self.level:
+            self.changes += 1
+        self._apply(level)
+        # Judge the new level on its own frames only
+        self.frame_ms.clear()
+        self.frames_at_level = 0
+
+    def average_ms(self):
+        if not self.frame_ms:
+            return 0.0
+        return sum(self.frame_ms) / len(self.frame_ms)
+
+    def observe(self, busy_ms):
+        """Record one frame's busy time; returns a new level or None."""
+        if not self.enabled:
+            return None
+        self.frame_ms.append(busy_ms)
+        self.frames_at_level += 1
+        if len(self.frame_ms) < self.frame_ms.maxlen:
+            return None
+
+        average = self.average_ms()
+        if (
+            average > self.budget_ms * self.degrade_at
+            and self.level < len(LEVELS) - 1
+            and self.frames_at_level >= self.degrade_wait
+        ):
+            return self.level + 1
+        if (
+            average < self.budget_ms * self.restore_at
+            and self.level > 0
+            and self.frames_at_level >= self.restore_wait
+        ):
+            return self.level - 1
+        return None
+
+    def spawn_count(self, count):
+        # Scaled particle count for one emission, never below one
+        return max(1, int(count * self.spawn_scale))
+
+    def status(self):
+        return {
+            "level": self.level,
+            "name": self.name,
+            "levels": len(LEVELS),
+            "average_ms": self.average_ms(),
+            "budget_ms": self.budget_ms,
+            "changes": self.changes,
+            "spawn_scale": self.spawn_scale,
+            "trail_interval": self.trail_interval,
+            "life_scale": self.life_scale,
+        }
+
+    def describe(self):
+        return (
+            f"quality {self.level}/{len(LEVELS) - 1} {self.name} "
+            f"(avg {self.average_ms():.1f} ms, budget {self.budget_ms:.1f} ms)"
+        )
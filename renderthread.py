@@ -0,0 +1,111 @@
+"""Rasterization on a thread of its own (main.py --render-thread).
+
+The single-threaded loop pays for the ticks, the render() calls that
+queue draw commands and the rasterization of those commands one after
+the other. With a render thread the main thread still steps the world
+and queues the commands (render() reads live entity state, so it has to
+run between ticks), but the filled DrawList is then handed over as the
+frame's snapshot: sprite blits and screen-space arrays of bullets,
+particles and stars that nothing touches after the handover. The render
+thread clears the screen, flushes the list and grabs the frame for
+capture while the main thread goes on to the next frame's ticks, queued
+into the other DrawList.
+
+Presenting stays on the main thread, where SDL wants its window calls:
+the next frame waits for the raster to finish, draws the overlay, flips
+and only then hands over its own list, so the two lists form a double
+buffer and frames are shown one frame later. A frame then takes roughly
+the longer of the two sides plus the flip, as far as the drawing runs
+without the GIL: pygame's SDL blits and fills and NumPy's copies can
+release it, the Python loops around them don't. On a single core there
+is nothing to overlap with and the mode only adds the handover.
+
+That is why it is an option, off by default (settings.RENDER_THREAD):
+it can only win with a second core, on frames where rasterizing is a
+large share. In benchmarks.renderthread at 3440x1440 the sides are about
+9 ms of raster against 14 ms of sim and queueing, so a frame could drop
+from their sum towards the larger one. On one core the same run costs 3%
+more per frame, and either way frames are shown a frame later.
+
+If drawing fails on the thread, the loop reports it and goes back to
+drawing on the main thread.
+"""
+
+import queue
+import threading
+import time
+
+import settings
+import state
+from drawlist import DrawList
+
+clock = time.perf_counter
+
+
+class RenderThread:
+    """Draws submitted DrawLists onto state.screen on a worker thread."""
+
+    def __init__(self):
+        self.spare = DrawList()  # the list not being filled by the loop
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = False  # a frame is being drawn or waits to be shown
+        self.raster_ms = 0.0  # drawing time of the last frame
+        self.wait_ms = 0.0  # how long the main thread waited for it
+        self.thread = threading.Thread(target=self._run, name="render", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            draw_list = self.jobs.get()
+            if draw_list is None:
+                return
+            start = clock()
+            try:
+                screen = state.screen
+                state.renderer.begin_frame(screen)
+                draw_list.flush(screen, state.renderer)
+                if state.capture is not None:
+                    state.capture.grab(screen)
+                error = None
+            except Exception as e:
+                draw_list.clear()
+                error = e
+            self.results.put(((clock() - start) * 1000, error))
+
+    def wait(self):
+        """Block until the submitted frame is drawn; re-raises its error."""
+        if not self.pending:
+            return
+        start = clock()
+        self.raster_ms, error = self.results.get()
+        self.wait_ms = (clock() - start) * 1000
+        self.pending = False
+        if error is not None:
+            raise error
+
+    def submit(self):
+        """Hand state.draw_list over for drawing and swap in the spare.
+
+        Call wait() (and present the previous frame) first: the screen
+        holds one frame at a time.
+        """
+        draw_list = state.draw_list
+        state.draw_list, self.spare = self.spare, draw_list
+        self.pending = True
+        self.jobs.put(draw_list)
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self.jobs.put(None)
+            self.thread.join()
+            # Leave the loop with a list that isn't the drawn one
+            self.spare.clear()
+
+
+def create(enabled=None):
+    # None when drawing stays on the main thread
+    enabled = settings.RENDER_THREAD if enabled is None else enabled
+    return RenderThread() if enabled else None
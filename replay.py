@@ -0,0 +1,626 @@
+"""Binary replay recording and seeking playback.
+
+A replay holds the RNG seed, the input events handled each tick (keys,
+window close and effect quality changes) and the per-tick state of
+ships, bullets, explosions and particle emitters, so an incident can be
+re-simulated (main.py --replay) or inspected at any tick.
+
+File layout, little-endian:
+
+    header   magic, version, seed, tick rate, world size, keyframe interval
+    frames   one per tick: tick, flags, events, then one section per kind
+    index    (tick, offset, flags) int64 rows for every frame
+    footer   index offset, frame count, magic
+
+Every `keyframe_interval` ticks a keyframe stores each kind in full: sorted
+entity uids, int32 static columns (set once, e.g. color) and float32
+dynamic columns. Other frames are deltas against the previous tick:
+removed uids, added entities in full, and only the ships whose dynamic
+state differs by more than TOLERANCE from a dead-reckoning prediction.
+Bullets, explosions and emitters follow their prediction exactly from
+the tick they spawn (constant acceleration, timers counting down), so
+their deltas are just arrivals and departures and recording never walks
+their attributes between keyframes. Playback makes the same predictions
+in the same float64 arithmetic, so reconstructed state stays within
+TOLERANCE (plus float32 storage rounding) of the recorded run.
+
+Replay memory-maps the file and reads the index from the footer; seeking
+decodes the nearest keyframe at or before the tick and the deltas after
+it, never the frames before.
+
+    python -m replay run.rpl --tick 1500
+"""
+
+import argparse
+import mmap
+import operator
+import struct
+
+import numpy as np
+import pygame
+
+import effects
+import particles
+import quality
+import settings
+import state
+import timestep
+from ship import ShipTable
+
+MAGIC = b"SPRP"
+VERSION = 2  # 2: per-tick chances drawn with random.random()
+HEADER = struct.Struct("<4sHHqIIII")  # magic, version, pad, seed, rate, w, h, key
+FRAME = struct.Struct("<IBxxxI")  # tick, flags, event count
+FOOTER = struct.Struct("<QI4s")  # index offset, frame count, magic
+KEYFRAME = 1
+
+# Largest error allowed between recorded and reconstructed dynamic state
+TOLERANCE = 1 / 256
+
+# Recorded input events: (type, value) pairs, where value is the event
+# attribute named here (0 if None)
+EVENT_DTYPE = np.dtype("<i4")
+RECORDED_EVENTS = {
+    pygame.QUIT: None,
+    pygame.KEYDOWN: "key",
+    quality.LEVEL_CHANGED: "level",
+}
+
+EFFECT_KINDS = {"ExhaustFX": 0, "TrailSmokeFX": 1}
+
+_rgb = {}
+_palette_rgb = np.zeros(0, np.int32)
+_uid = operator.attrgetter("uid")
+
+
+def packed_rgb(color):
+    # 0xRRGGBB for any pygame color spec; files don't depend on the palette
+    value = _rgb.get(color)
+    if value is None:
+        c = pygame.Color(color)
+        value = _rgb[color] = (c.r << 16) | (c.g << 8) | c.b
+    return value
+
+
+def _packed_palette():
+    # particles.palette as 0xRRGGBB, for looking up color_id columns
+    global _palette_rgb
+    if len(_palette_rgb) != len(particles.palette):
+        _palette_rgb = np.array(
+            [(r << 16) | (g << 8) | b for r, g, b in particles.palette], np.int32
+        )
+    return _palette_rgb
+
+
+def _read(entities, getters, dtype):
+    # One column per getter, each read off every entity in one pass
+    a = np.empty((len(entities), len(getters)), dtype)
+    for i, get in enumerate(getters):
+        a[:, i] = np.fromiter(map(get, entities), np.float64, len(entities))
+    return a
+
+
+def _fields(statics, dynamics):
+    # Gatherer reading the static and dynamic columns of the entities
+    # asked for, given as attribute names or functions of the entity; the
+    # uids come from the store's column
+    statics = [_getter(field) for field in statics]
+    dynamics = [_getter(field) for field in dynamics]
+
+    def rows(live, positions):
+        entities = [live.entities[i] for i in positions.tolist()]
+        return (
+            live.store_uids[positions],
+            _read(entities, statics, np.int32),
+            _read(entities, dynamics, np.float64),
+        )
+
+    return rows
+
+
+def _getter(field):
+    # Attribute name or function of the entity
+    return operator.attrgetter(field) if isinstance(field, str) else field
+
+
+def _ship_color(s):
+    return packed_rgb(s.color)
+
+
+_SHIP_STATICS = [operator.attrgetter("radius"), _ship_color]
+
+
+def _ship_rows(live, positions):
+    # Radius and color static, read ship by ship; motion dynamic
+    ships = [live.entities[i] for i in positions.tolist()]
+    static = _read(ships, _SHIP_STATICS, np.int32)
+    return live.store_uids[positions], static, _ship_motion(live, positions)
+
+
+def _ship_motion(live, positions):
+    # Dynamic columns of the ships at the given positions: from the tick's
+    # ShipTable, read off the ships only for ones it doesn't have
+    table = state.ship_table
+    if table is not None:
+        found = table.find(live.store_uids[positions])
+        if found is not None:
+            return table.columns[:6, found].T
+    ships = [live.entities[i] for i in positions.tolist()]
+    d = np.empty((len(ships), 6))
+    for i, get in enumerate(ShipTable._getters[:6]):
+        d[:, i] = np.fromiter(map(get, ships), np.float64, len(ships))
+    return d
+
+
+def _predict_ships(static, d):
+    # x, y, vx, vy, angle, freeze: ships drift unless frozen
+    d = d.copy()
+    moving = d[:, 5] <= 0
+    d[moving, 0] += d[moving, 2]
+    d[moving, 1] += d[moving, 3]
+    d[:, 5] = np.maximum(d[:, 5] - 1, 0)
+    return d
+
+
+def _bullet_rows(live, positions):
+    # Straight from the ColumnStore: kind, color, radius and owner static,
+    # position, velocity and acceleration dynamic
+    if not live.entities:
+        return _empty(live.statics, live.dynamics)
+    store = live.store
+
+    def column(name):
+        return store.view(name)[positions]
+
+    static = np.column_stack(
+        (
+            column("kind_id"),
+            _packed_palette()[column("color_id")],
+            column("radius"),
+            column("owner"),
+        )
+    )
+    dynamic = np.column_stack(
+        [column(name) for name in ("x", "y", "vx", "vy", "accel_x", "accel_y")]
+    )
+    return column("uid").astype(np.uint32), static.astype(np.int32), dynamic
+
+
+def _predict_bullets(static, d):
+    # x, y, vx, vy, ax, ay: constant acceleration, as in Bullet.integrate
+    d = d.copy()
+    d[:, 2] += d[:, 4]
+    d[:, 3] += d[:, 5]
+    d[:, 0] += d[:, 2]
+    d[:, 1] += d[:, 3]
+    return d
+
+
+_death_rows = _fields(
+    ("ring_r_max", "ring_dr"),
+    ("x", "y", "ring_r", "ring_w", "flash_radius", "flash_time", "ttl"),
+)
+
+
+def _predict_deaths(static, d):
+    # x, y, ring radius and width, flash radius and time, ttl; mirrors
+    # DeathFX.update with static (ring_r_max, ring_dr)
+    d = d.copy()
+    growing = d[:, 2] < static[:, 0]
+    d[growing, 2] += static[growing, 1]
+    d[growing, 3] = np.maximum(
+        1, d[growing, 3] - timestep.per_tick(effects.RING_THINNING)
+    )
+    flashing = d[:, 5] > 0
+    d[flashing, 5] -= 1
+    d[flashing, 4] *= effects.flash_growth()
+    d[:, 6] -= 1
+    return d
+
+
+def _effect_kind(fx):
+    return EFFECT_KINDS.get(type(fx).__name__, 0)
+
+
+_effect_rows = _fields((_effect_kind,), ("x", "y", "ttl"))
+
+
+def _predict_ttl(static, d):
+    # Timers count down, everything else stays put
+    d = d.copy()
+    d[:, -1] -= 1
+    return d
+
+
+# (name, static columns, dynamic columns, rows, predict, motion). rows
+# gathers (uids, static, dynamic) and motion the dynamic columns alone,
+# for the entities at the given store positions of a Live, in that
+# order. Only kinds with a motion gatherer are compared against their
+# prediction every tick; the others move exactly as predicted from the
+# moment they spawn, so their delta frames just list who appeared and
+# who went away
+KINDS = [
+    ("ships", 2, 6, _ship_rows, _predict_ships, _ship_motion),
+    ("bullets", 4, 6, _bullet_rows, _predict_bullets, None),
+    ("deaths", 2, 7, _death_rows, _predict_deaths, None),
+    ("effects", 1, 3, _effect_rows, _predict_ttl, None),
+]
+
+
+def _empty(statics, dynamics):
+    return (
+        np.zeros(0, np.uint32),
+        np.zeros((0, statics), np.int32),
+        np.zeros((0, dynamics)),
+    )
+
+
+def merge_rows(uids, static, dynamic, add_uids, add_static, add_dynamic):
+    uids = np.concatenate((uids, add_uids))
+    order = np.argsort(uids, kind="stable")
+    return (
+        uids[order],
+        np.concatenate((static, add_static))[order],
+        np.concatenate((dynamic, add_dynamic))[order],
+    )
+
+
+def as_stored(dynamic):
+    # Dynamic state as a player reads it back: float32 on disk, float64
+    # in memory so both sides predict with identical arithmetic
+    return dynamic.astype(np.float32).astype(np.float64)
+
+
+def _lookup(keys, sorted_keys):
+    # Index of each key in sorted_keys, and whether it is there at all
+    at = np.searchsorted(sorted_keys, keys)
+    found = np.zeros(len(keys), dtype=bool)
+    inside = at < len(sorted_keys)
+    found[inside] = sorted_keys[at[inside]] == keys[inside]
+    return at, found
+
+
+class Live:
+    """One kind's entities as they are this tick, for encoding.
+
+    Gathered from the store once per tick (uids up front, motion when
+    first asked for) and shared by the encoders: Recorder and
+    stream.StreamServer. Positions are indices into the store's
+    to_list(), i.e. rows of a ColumnStore.
+    """
+
+    def __init__(self, kind):
+        (
+            self.name,
+            self.statics,
+            self.dynamics,
+            self._rows,
+            self.predict,
+            self._motion,
+        ) = kind
+        self.store = getattr(state, self.name)
+        self.entities = self.store.to_list()
+        if "uid" in getattr(self.store, "columns", ()):
+            uids = self.store.view("uid").astype(np.uint32)
+        else:
+            uids = np.fromiter(map(_uid, self.entities), np.uint32, len(self.entities))
+        self.store_uids = uids
+        # Store positions in uid order, and the uids in that order
+        self.order = np.argsort(uids, kind="stable")
+        self.uids = uids[self.order]
+        self.tracked = self._motion is not None
+
+    def rows(self, positions=None):
+        """(uids, static, dynamic) of the entities at the given store
+        positions in that order; of all of them by uid by default."""
+        return self._rows(self, self.order if positions is None else positions)
+
+    def split(self, old_uids):
+        """Compare with the sorted uids of an earlier state.
+
+        Returns (kept, positions, added): which of old_uids are still
+        here, the store positions of those, and the store positions of
+        the entities that are new, in uid order.
+        """
+        at, kept = _lookup(old_uids, self.uids)
+        _, seen = _lookup(self.uids, old_uids)
+        return kept, self.order[at[kept]], self.order[~seen]
+
+    def rows_after(self, positions, last):
+        """rows(positions) given last, rows of the tick before: entities
+        it has are advanced from it and only the others are read."""
+        uids = self.store_uids[positions]
+        last_uids, last_static, last_dynamic = last
+        at, found = _lookup(uids, last_uids)
+        at = at[found]
+        new_uids, new_static, new_dynamic = self.rows(positions[~found])
+        static = np.empty((len(uids), self.statics), new_static.dtype)
+        dynamic = np.empty((len(uids), self.dynamics))
+        static[found] = last_static[at]
+        static[~found] = new_static
+        if self.tracked:
+            dynamic[found] = self.motion(positions[found])
+        else:
+            dynamic[found] = self.predict(last_static[at], last_dynamic[at])
+        dynamic[~found] = new_dynamic
+        return uids, static, dynamic
+
+    def motion(self, positions):
+        """Dynamic state of the tracked entities at the given positions."""
+        return self._motion(self, positions)
+
+
+def live():
+    """A Live per kind, in KINDS order."""
+    return [Live(kind) for kind in KINDS]
+
+
+def snapshot():
+    """The live world as {kind: (uids, static, dynamic)}, as recorded."""
+    return {kind.name: kind.rows() for kind in live()}
+
+
+class Recorder:
+    """Writes a replay file while the game runs; see the module docstring.
+
+    Call capture() once per tick after the simulation step and close() at
+    the end, which writes the seek index.
+    """
+
+    def __init__(self, path, seed, size, keyframe_interval=None):
+        self.file = open(path, "wb")
+        self.keyframe_interval = keyframe_interval or settings.REPLAY_KEYFRAME_INTERVAL
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                0,
+                seed,
+                settings.TICK_RATE,
+                size[0],
+                size[1],
+                self.keyframe_interval,
+            )
+        )
+        self.index = []
+        # Reconstructed state per kind, exactly what a player will rebuild;
+        # of kinds without a motion gatherer only the uids are needed
+        self.previous = None
+        # Stats for tuning
+        self.keyframe_bytes = 0
+        self.delta_bytes = 0
+
+    def capture(self, tick, events=()):
+        keyframe = self.previous is None or tick % self.keyframe_interval == 0
+        recorded = [
+            (e.type, getattr(e, RECORDED_EVENTS[e.type] or "", 0))
+            for e in events
+            if e.type in RECORDED_EVENTS
+        ]
+        chunks = [
+            FRAME.pack(tick, KEYFRAME if keyframe else 0, len(recorded)),
+            np.array(recorded, dtype=EVENT_DTYPE).tobytes(),
+        ]
+        current = []
+        for i, kind in enumerate(live()):
+            if keyframe:
+                uids, static, dynamic = kind.rows()
+                chunks += pack_section(uids, static, dynamic)
+                current.append((uids, static, as_stored(dynamic)))
+            else:
+                current.append(self._delta(chunks, self.previous[i], kind))
+        self.previous = current
+
+        offset = self.file.tell()
+        data = b"".join(chunks)
+        self.file.write(data)
+        self.index.append((tick, offset, KEYFRAME if keyframe else 0))
+        if keyframe:
+            self.keyframe_bytes += len(data)
+        else:
+            self.delta_bytes += len(data)
+
+    def _delta(self, chunks, previous, kind):
+        old_uids, old_static, old_dynamic = previous
+        kept, positions, added = kind.split(old_uids)
+        add_uids, add_static, add_dynamic = kind.rows(added)
+        chunks += pack_section(old_uids[~kept])
+        # New entities go in full
+        chunks += pack_section(add_uids, add_static, add_dynamic)
+
+        kept_uids = old_uids[kept]
+        if not kind.tracked:
+            # Survivors are where they were predicted to be
+            chunks += pack_section(kept_uids[:0])
+            return kind.uids, None, None
+
+        # Survivors only where the prediction is off
+        static = old_static[kept]
+        guess = kind.predict(static, old_dynamic[kept])
+        actual = kind.motion(positions)
+        changed = np.abs(actual - guess).max(axis=1, initial=0) > TOLERANCE
+        guess[changed] = as_stored(actual[changed])
+        chunks += pack_section(kept_uids[changed], dynamic=actual[changed])
+
+        return merge_rows(
+            kept_uids, static, guess, add_uids, add_static, as_stored(add_dynamic)
+        )
+
+    def close(self):
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype="<i8").tobytes())
+        self.file.write(FOOTER.pack(index_offset, len(self.index), MAGIC))
+        self.file.close()
+
+
+def pack_section(uids, static=None, dynamic=None):
+    # Section: uint32 count, uids, then the static and dynamic blocks
+    chunks = [struct.pack("<I", len(uids)), uids.astype("<u4").tobytes()]
+    if static is not None:
+        chunks.append(static.astype("<i4").tobytes())
+    if dynamic is not None:
+        chunks.append(dynamic.astype("<f4").tobytes())
+    return chunks
+
+
+class Replay:
+    """Memory-mapped replay reader with random access by tick."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            _,
+            self.seed,
+            self.tick_rate,
+            width,
+            height,
+            self.keyframe_interval,
+        ) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a replay")
+        if version != VERSION:
+            # An older simulation doesn't take the recorded course
+            raise ValueError(
+                f"{path} is a version {version} replay; this build plays "
+                f"version {VERSION}, so record it again"
+            )
+        self.size = (width, height)
+        index_offset, count, magic = FOOTER.unpack_from(
+            self.data, len(self.data) - FOOTER.size
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} has no index (recording not closed?)")
+        index = np.frombuffer(self.data, "<i8", count * 3, index_offset)
+        index = index.reshape(count, 3)
+        self.ticks = index[:, 0]
+        self.offsets = index[:, 1]
+        self.keyframes = np.flatnonzero(index[:, 2] & KEYFRAME)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def close(self):
+        self.ticks = self.offsets = self.keyframes = None
+        self.data.close()
+        self._file.close()
+
+    def _frame(self, i):
+        return int(self.offsets[i])
+
+    def _array(self, offset, dtype, shape):
+        count = int(np.prod(shape))
+        a = np.frombuffer(self.data, dtype, count, offset).reshape(shape)
+        return a, offset + a.nbytes
+
+    def _section(self, offset, *widths):
+        # Reads a pack_section() section: uids plus one column block per width
+        (n,) = struct.unpack_from("<I", self.data, offset)
+        uids, offset = self._array(offset + 4, "<u4", (n,))
+        columns = []
+        for width, dtype in widths:
+            column, offset = self._array(offset, dtype, (n, width))
+            columns.append(column)
+        return uids, columns, offset
+
+    def events(self, tick):
+        """Input events recorded at tick as pygame events."""
+        i = self._position(tick)
+        _, _, count = FRAME.unpack_from(self.data, self._frame(i))
+        pairs, _ = self._array(self._frame(i) + FRAME.size, EVENT_DTYPE, (count, 2))
+        events = []
+        for kind, value in pairs.tolist():
+            attribute = RECORDED_EVENTS.get(kind)
+            if attribute is None:
+                events.append(pygame.event.Event(kind))
+            else:
+                events.append(pygame.event.Event(kind, {attribute: value}))
+        return events
+
+    def is_keyframe(self, tick):
+        i = int(np.searchsorted(self.ticks, tick))
+        return i < len(self.ticks) and self.ticks[i] == tick and i in self.keyframes
+
+    def verify(self, tick):
+        """Compare the live world with the recording at tick.
+
+        Returns None when they agree, otherwise what differs first.
+        """
+        recorded = self.state(tick)
+        for name, (uids, static, dynamic) in snapshot().items():
+            old_uids, old_static, old_dynamic = recorded[name]
+            if not np.array_equal(uids, old_uids):
+                return f"{name} differ ({len(uids)} live, {len(old_uids)} recorded)"
+            error = np.abs(dynamic - old_dynamic).max(initial=0)
+            if error > TOLERANCE or not np.array_equal(static, old_static):
+                return f"{name} state differs by up to {error:.3f}"
+        return None
+
+    def _position(self, tick):
+        i = int(np.searchsorted(self.ticks, tick))
+        if i >= len(self.ticks) or self.ticks[i] != tick:
+            raise KeyError(f"tick {tick} not recorded")
+        return i
+
+    def state(self, tick):
+        """Return {kind: (uids, static, dynamic)} as of the end of tick."""
+        target = self._position(tick)
+        start = self.keyframes[np.searchsorted(self.keyframes, target, "right") - 1]
+        current = None
+        for i in range(start, target + 1):
+            current = self._apply(i, current)
+        return {name: arrays for (name, *_), arrays in zip(KINDS, current)}
+
+    def _apply(self, i, previous):
+        offset = self._frame(i)
+        _, flags, count = FRAME.unpack_from(self.data, offset)
+        offset += FRAME.size + count * 2 * EVENT_DTYPE.itemsize
+        current = []
+        for k, (_, statics, dynamics, _, predict, _) in enumerate(KINDS):
+            full = ((statics, "<i4"), (dynamics, "<f4"))
+            if flags & KEYFRAME:
+                # Copies, so nothing handed out pins the mapping
+                uids, (static, dynamic), offset = self._section(offset, *full)
+                current.append((uids.copy(), static.copy(), dynamic.astype(np.float64)))
+                continue
+
+            old_uids, old_static, old_dynamic = previous[k]
+            removed, _, offset = self._section(offset)
+            add_uids, (add_static, add_dynamic), offset = self._section(offset, *full)
+            fix_uids, (fixes,), offset = self._section(offset, (dynamics, "<f4"))
+
+            kept = ~np.isin(old_uids, removed, assume_unique=True)
+            uids = old_uids[kept]
+            static = old_static[kept]
+            dynamic = predict(static, old_dynamic[kept])
+            dynamic[np.searchsorted(uids, fix_uids)] = fixes
+            current.append(
+                merge_rows(uids, static, dynamic, add_uids, add_static, add_dynamic)
+            )
+        return current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a replay file")
+    parser.add_argument("path")
+    parser.add_argument("--tick", type=int, help="show entity counts at this tick")
+    args = parser.parse_args(argv)
+
+    replay = Replay(args.path)
+    first, last = int(replay.ticks[0]), int(replay.ticks[-1])
+    print(
+        f"seed {replay.seed}, ticks {first}-{last} at {replay.tick_rate}/s, "
+        f"world {replay.size[0]}x{replay.size[1]}, {len(replay.keyframes)} keyframes"
+    )
+    tick = last if args.tick is None else args.tick
+    counts = ", ".join(
+        f"{len(uids)} {name}" for name, (uids, _, _) in replay.state(tick).items()
+    )
+    print(f"tick {tick}: {counts}, {len(replay.events(tick))} events")
+    replay.close()
+
+
+if __name__ == "__main__":
+    main()
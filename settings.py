@@ -0,0 +1,61 @@
+# Tunable engine settings
+
+# Rotated sprite cache (see sprites.py)
+SPRITE_ANGLE_STEP = 5  # degrees between baked orientations
+SPRITE_CACHE_SIZE = 4096  # baked sprites kept before LRU eviction
+
+# Ship behaviour, as average events per second
+SHIP_TURN_RATE = 5
+SHIP_FIRE_RATE = 2
+SHIP_TARGETING = "random"  # or "nearest", "in_range"; see targeting.py
+
+# Display and simulation rate
+WINDOW_SIZE = (3440, 1440)
+WORLD_SIZE = None  # simulated area (see world.py); None for WINDOW_SIZE
+RENDER_MODE = "full"  # or "dirty", see render.py
+TICK_RATE = 100  # simulation ticks per second (see timestep.py)
+RENDER_RATE = 100  # frames drawn per second at most; 0 for no cap
+MAX_SUBSTEPS = 5  # ticks run per frame at most; time beyond that is dropped
+INTERPOLATE = True  # draw between the last two ticks instead of at the last
+RENDER_THREAD = False  # rasterize on a second thread (see renderthread.py)
+SIM_WORKERS = 0  # >0 steps ships and bullets in worker processes (parallel.py)
+
+# View onto the world (see camera.py): arrow keys pan, +/- or the wheel zoom
+CAMERA_PAN_SPEED = 1500  # screen px/s while an arrow key is held
+CAMERA_ZOOM_STEP = 1.25  # zoom factor per step
+CAMERA_ZOOM_RANGE = (-8, 4)  # steps out and in from 1:1
+
+# Background tasks between frames of the asyncio loop (see tasks.py)
+TASK_BUDGET_MS = 2.0  # default time a task may run per frame
+TASK_MARGIN_MS = 1.0  # idle time left free before the next frame starts
+TASK_IDLE_MS = 2.0  # idle time made per frame when frames are uncapped
+
+# Object pools (see pool.py); set POOLING = False to allocate every time
+POOLING = True
+BULLET_POOL_CAP = 8192
+EFFECT_POOL_CAP = 2048
+
+# Adaptive effect quality (see quality.py)
+QUALITY_GOVERNOR = True  # lower effect detail while frames run over budget
+QUALITY_BUDGET_MS = None  # frame budget; None means one frame at RENDER_RATE
+# Hard caps at every quality level; None for no cap. At 3440x1440 drawing
+# this many particles takes about 5 ms, 50000 about 12 (benchmarks.particles)
+MAX_PARTICLES = 20000
+MAX_EFFECTS = 2000  # live explosions plus emitters
+
+# Replay recording (see replay.py)
+REPLAY_KEYFRAME_INTERVAL = 100  # ticks between full keyframes
+
+# Spectator streaming (see stream.py)
+STREAM_KEYFRAME_INTERVAL = 10  # ticks between keyframes sent to clients
+STREAM_KEEP_KEYFRAMES = 4  # recent keyframes deltas may be encoded against
+STREAM_BUFFER_BYTES = 1 << 20  # unsent bytes before a client drops to keyframes
+
+# Frame capture (see capture.py)
+CAPTURE_RING = 8  # preallocated frame buffers between the loop and encoders
+CAPTURE_WORKERS = 2  # threads encoding a PNG sequence
+CAPTURE_PNG_LEVEL = 1  # zlib level; higher is smaller and slower
+
+# Background starfield (see starfield.py)
+STARFIELD_MODE = "layers"  # or "points"; dirty-rect rendering forces points
+STARFIELD_DEPTHS = 1  # parallax depths; 1 keeps the classic look
@@ -1,165 +1,287 @@
-import random
 import math
-import pygame
+import operator
+import random
 
+import numpy as np
+
+import drawlist
+import particles
+import settings
 import state
+import targeting
+import timestep
 import utils
 from bullet import Bullet
-from effects import DeathFX, ExhaustFX
+from effects import DeathFX, ExhaustFX, room_for_effect
+from entities import Column, next_uid
+
+# Cosmetic randomness (engine flicker) stays off the simulation RNG, so
+# skipping or adding rendered frames never changes what happens
+flicker = random.Random()
+
+# Palette indices for the draw list
+LASER_COLOR = particles.color_id("red")
+FREEZE_RAY_COLOR = particles.color_id("cyan")
+FROST_COLOR = particles.color_id("cyan")
+
+# Motion and weapons, per second (see timestep.py)
+SPEED_STEP = 100  # px/s per step of the random -5..5 cruise velocity
+FREEZE_TIME = 2.0  # seconds a freeze ray hit holds a ship
+MACHINEGUN_FLIGHT = 5.0  # seconds for bullets to cover the aimed distance
+GLIDE_BOMB_FLIGHT = 1.0
+GLIDE_BOMB_GRAVITY = 1000  # px/s²
+TORPEDO_FLIGHT = 15.0
+TORPEDO_THRUST = 10  # launch velocities gained per second
+
+
+class ShipTable:
+    """Every ship's state as arrays, read once per tick.
+
+    main.update_bullets() gathers it (gather_table()) once the ship
+    phase's kills and spawns are in, and nothing moves a ship after that
+    for the rest of the tick: bullet collision and the encoders
+    (replay.Live) read these arrays instead of walking the ships again.
+    The parallel mode gathers it at the start of the ship phase instead,
+    into shared memory, and keeps it up to date (see parallel.py).
+    Column i belongs to ships[i]; ships spawned or killed later in the
+    tick aren't reflected.
+    """
+
+    # Rows of columns; the first six are replay's ship motion
+    COLUMNS = ("x", "y", "vx", "vy", "_angle", "freeze_ticks", "radius")
+    _getters = [operator.attrgetter(name) for name in COLUMNS]
+
+    def __init__(self, ships, uids, columns=None, known=None):
+        # columns: a (len(COLUMNS), len(ships)) array to fill, if given;
+        # known: (mask, values), the columns of the ships in mask as
+        # they are, so only the others are read
+        n = len(ships)
+        self.ships = ships
+        self.uids = uids
+        if columns is None:
+            columns = np.empty((len(self.COLUMNS), n))
+        self.columns = columns
+        self._order = None
+        if known is None:
+            self.refresh(self.COLUMNS)
+        else:
+            mask, values = known
+            columns[:, mask] = values
+            self.refresh(self.COLUMNS, np.flatnonzero(~mask).tolist())
+
+    def column(self, name):
+        return self.columns[self.COLUMNS.index(name)]
+
+    def refresh(self, names, rows=None):
+        # Read these columns from the ships again, or from those in rows
+        ships = self.ships
+        if rows is None:
+            rows = slice(None)
+        else:
+            ships = [ships[i] for i in rows]
+        for name in names:
+            i = self.COLUMNS.index(name)
+            self.columns[i, rows] = np.fromiter(
+                map(self._getters[i], ships), np.float64, len(ships)
+            )
+
+    def locate(self, uids):
+        # Column index of each uid, and whether the table has it at all
+        found = np.zeros(len(uids), dtype=bool)
+        if not len(self.uids):
+            return np.zeros(len(uids), np.intp), found
+        if self._order is None:
+            self._order = np.argsort(self.uids)
+        order = self._order
+        at = np.searchsorted(self.uids, uids, sorter=order)
+        at = order[at.clip(max=len(order) - 1)]
+        found[:] = self.uids[at] == uids
+        return at, found
+
+    def find(self, uids):
+        """Column indices of the ships with these uids; None unless the
+        table has every one of them."""
+        at, found = self.locate(uids)
+        return at if found.all() else None
+
+
+def gather_table(columns=None, uids=None, previous=None):
+    # The ships' state for the rest of the tick, see ShipTable; columns
+    # and uids optionally give room to gather into (at least as many
+    # columns and rows as there are ships). Ships also in previous, a
+    # table that is still current, are copied from it rather than read
+    ships = state.ships.to_list()
+    n = len(ships)
+    current = state.ships.view("uid") if ships else np.zeros(0, np.int64)
+    known = None
+    if previous is not None:
+        # Copied out first: previous may live in the same arrays
+        at, found = previous.locate(current)
+        known = found, previous.columns[:, at[found]]
+    if uids is None:
+        uids = np.zeros(n, np.int64)
+    uids = uids[:n]
+    uids[:] = current
+    if columns is not None:
+        columns = columns[: len(ShipTable.COLUMNS), :n]
+    state.ship_table = ShipTable(ships, uids, columns, known)
+    return state.ship_table
+
+
+def spawn(ship):
+    # Register a ship with the world and the collision grid; during a tick
+    # go through state.commands instead (see Ship.despawn)
+    state.ships.append(ship)
+    state.ship_grid.insert(ship)
+    return ship
+
+
+def hull_model(size, colors):
+    color, flame_color = colors
+
+    # Define a simple ship hull in model space (pointing +X)
+    # Nose, top tail, bottom tail, plus small fins for flair
+    hull = [
+        (size, 0),  # nose
+        (-0.6 * size, -0.5 * size),
+        (-0.2 * size, 0),
+        (-0.6 * size, 0.5 * size),
+    ]
+
+    # Filled hull with a crisp outline, engine glow at tail center
+    polygons = [(hull, color, 0), (hull, "white", 2)]
+    circles = [((-0.65 * size, 0), flame_color, max(2, int(size * 0.2)))]
+    return polygons, circles
 
 
 class Ship:
+    uid = Column(np.int64)  # in state.ships' uid column while stored
+    _store = None
+    freeze_ticks = 0  # ticks left frozen, see freeze()
+
     def __init__(self):
+        self.uid = next_uid()
         self.radius = random.randint(20, 20)
         self.color = random.choice(["yellow", "blue", "orange", "pink", "cyan"])
-        self.x = random.randint(0, state.screen.get_width())
-        self.y = random.randint(0, state.screen.get_height())
+        self.x = random.randint(0, state.world.width)
+        self.y = random.randint(0, state.world.height)
+        # Position at the previous tick, for drawing in between
+        self.prev_x = self.x
+        self.prev_y = self.y
         # Cache last facing angle so stationary ships keep orientation
         self._angle = random.uniform(0, math.tau)
         self.change_direction()
 
     def change_direction(self):
-        self.vx = random.randint(-5, 5)
-        self.vy = random.randint(-5, 5)
-
-    def draw(self):
-        # Determine facing based on velocity; keep previous if stationary
-        if self.vx != 0 or self.vy != 0:
-            self._angle = math.atan2(self.vy, self.vx)
-
-        size = self.radius
-
-        # Define a simple ship hull in model space (pointing +X)
-        # Nose, top tail, bottom tail, plus small fins for flair
-        hull = [
-            (size, 0),  # nose
-            (-0.6 * size, -0.5 * size),
-            (-0.2 * size, 0),
-            (-0.6 * size, 0.5 * size),
-        ]
-
-        # Rotation matrix
-        c = math.cos(self._angle)
-        s = math.sin(self._angle)
-
-        def transform(pt):
-            px, py = pt
-            rx = px * c - py * s
-            ry = px * s + py * c
-            return (int(self.x + rx), int(self.y + ry))
-
-        hull_pts = [transform(p) for p in hull]
+        self.vx = timestep.per_tick(random.randint(-5, 5) * SPEED_STEP)
+        self.vy = timestep.per_tick(random.randint(-5, 5) * SPEED_STEP)
 
-        # Draw filled hull and a crisp outline
-        pygame.draw.polygon(state.screen, self.color, hull_pts)
-        pygame.draw.polygon(state.screen, "white", hull_pts, 2)
-
-        # Engine glow at tail center
-        tail_local = (-0.65 * size, 0)
-        tail_world = transform(tail_local)
+    def render(self):
+        x, y = utils.interpolated(self)
+        camera = state.camera
+        if not camera.visible(x, y, self.radius * 2):
+            return
+        sx, sy = camera.to_screen(x, y)
+        # Engine glow flickers between a few baked variants
         flame_color = (
-            random.choice(["orange", "yellow", "red"])
+            flicker.choice(["orange", "yellow", "red"])
             if (self.vx or self.vy)
             else "gray"
         )
-        pygame.draw.circle(
-            state.screen, flame_color, tail_world, max(2, int(size * 0.2))
+        state.sprites.push(
+            state.draw_list,
+            drawlist.SHIPS,
+            "ship",
+            (self.color, flame_color),
+            camera.scale(self.radius),
+            self._angle,
+            sx,
+            sy,
+            hull_model,
         )
 
         # Frost aura if frozen
         if getattr(self, "freeze_ticks", 0) > 0:
-            aura_r = int(size * 1.2)
-            try:
-                pygame.draw.circle(
-                    state.screen, "cyan", (int(self.x), int(self.y)), aura_r, 1
-                )
-            except Exception:
-                pass
+            state.draw_list.circle(
+                drawlist.SHIPS, FROST_COLOR, sx, sy, camera.scale(self.radius * 1.2), 1
+            )
 
     def move(self):
-        # If frozen, skip movement but still render
+        # If frozen, skip movement (still rendered)
         if getattr(self, "freeze_ticks", 0) > 0:
             self.freeze_ticks = max(0, self.freeze_ticks - 1)
-            self.draw()
             return
 
         new_x = self.x + self.vx
         new_y = self.y + self.vy
 
-        if utils.is_inside_screen_area(new_x, new_y):
+        if state.world.contains(new_x, new_y):
             self.x = new_x
             self.y = new_y
-
-        self.draw()
+            state.ship_grid.update(self)
 
     def destroy(self):
+        # Queue the kill; returns False if the ship was already doomed
+        return state.commands.kill(self)
+
+    def despawn(self):
+        # Called by state.commands at the next sync point
+        if not state.ships.discard(self):
+            return
+        state.ship_grid.remove(self)
         # Pass ship color to death FX to tint explosion
-        state.deaths.append(DeathFX(self.x, self.y, getattr(self, "color", None)))
-        if self in state.ships:
-            state.ships.remove(self)
-        state.ships.append(Ship())
-
-    def choose_random_target(self):
-        for _ in range(0, 5):
-            index = random.randrange(0, len(state.ships))
-            if state.ships[index] != self:
-                return state.ships[index]
-        return None  # couldn't find a suitable target
+        if room_for_effect():
+            state.commands.spawn(
+                DeathFX.pool.acquire(self.x, self.y, getattr(self, "color", None)),
+                state.deaths.append,
+            )
+        state.commands.spawn(Ship(), spawn)
 
     def shoot_at_target(self, target):
         if not target:
             print("target need to be set")
             return
 
-        distance = utils.distance(self.x, self.y, target.x, target.y)
-
-        if distance < 500:
-            self.shoot_laser(target)
-        elif distance < 650:  # slightly longer than laser
-            self.shoot_freezing_ray(target)
-        elif distance < 1000:
-            self.shoot_machinegun(target)
-        elif distance < 2000:
-            self.shoot_gliding_bombs(target)
-        else:
-            self.shoot_torpedo(target)
+        d2 = utils.distance_squared(self.x, self.y, target.x, target.y)
+        getattr(self, targeting.weapon_for(d2))(target)
 
     def shoot_laser(self, target):
-        pygame.draw.line(state.screen, "red", (self.x, self.y), (target.x, target.y), 2)
+        state.beams.append((LASER_COLOR, (self.x, self.y), (target.x, target.y), 2))
 
     def shoot_freezing_ray(self, target):
-        # Draw a cyan beam and freeze the target briefly
-        pygame.draw.line(
-            state.screen, "cyan", (self.x, self.y), (target.x, target.y), 3
+        # Cyan beam that freezes the target briefly
+        state.beams.append(
+            (FREEZE_RAY_COLOR, (self.x, self.y), (target.x, target.y), 3)
         )
         if hasattr(target, "freeze"):
-            target.freeze(200)  # ~2 seconds at 100 FPS
+            target.freeze(FREEZE_TIME)
 
     def shoot_machinegun(self, target):
         distance_x = target.x - self.x
         distance_y = target.y - self.y
 
-        vx = distance_x / 500
-        vy = distance_y / 500
+        vx = timestep.per_tick(distance_x / MACHINEGUN_FLIGHT)
+        vy = timestep.per_tick(distance_y / MACHINEGUN_FLIGHT)
 
         color = self.color
 
         for i in range(0, 8):
-            bullet = Bullet(self, color, self.x, self.y, vx, vy)
+            bullet = Bullet.pool.acquire(self, color, self.x, self.y, vx, vy)
             bullet.move()
-            state.bullets.append(bullet)
+            state.commands.spawn(bullet, state.bullets.append)
 
     def shoot_gliding_bombs(self, target):
         distance_x = target.x - self.x
         distance_y = target.y - self.y - 500  # aim above
 
-        vx = distance_x / 100
-        vy = distance_y / 100
+        vx = timestep.per_tick(distance_x / GLIDE_BOMB_FLIGHT)
+        vy = timestep.per_tick(distance_y / GLIDE_BOMB_FLIGHT)
+        gravity = timestep.per_tick_squared(GLIDE_BOMB_GRAVITY)
 
         color = self.color
 
         for i in range(0, 3):
-            bullet = Bullet(
+            bullet = Bullet.pool.acquire(
                 self,
                 color,
                 self.x,
@@ -167,29 +289,29 @@ class Ship:
                 vx,
                 vy,
                 0,
-                0.1,
+                gravity,
                 kind="glide_bomb",
             )
             bullet.radius = 5
             bullet.move()
-            state.bullets.append(bullet)
+            state.commands.spawn(bullet, state.bullets.append)
 
     def shoot_torpedo(self, target):
         distance_x = target.x - self.x
         distance_y = target.y - self.y
 
         # Slower initial velocity for torpedo
-        vx = distance_x / 1500
-        vy = distance_y / 1500
+        vx = timestep.per_tick(distance_x / TORPEDO_FLIGHT)
+        vy = timestep.per_tick(distance_y / TORPEDO_FLIGHT)
 
         # Gentle acceleration to feel weighty
-        ax = vx / 10
-        ay = vy / 10
+        ax = vx * timestep.per_tick(TORPEDO_THRUST)
+        ay = vy * timestep.per_tick(TORPEDO_THRUST)
 
         color = self.color
 
         for i in range(0, 2):
-            bullet = Bullet(
+            bullet = Bullet.pool.acquire(
                 self,
                 color,
                 self.x,
@@ -202,7 +324,7 @@ class Ship:
             )
             bullet.radius = 4
             bullet.move()
-            state.bullets.append(bullet)
+            state.commands.spawn(bullet, state.bullets.append)
 
         # Recoil: apply a small impulse opposite to shot direction
         recoil_factor = 2.0  # tune for feel
@@ -219,25 +341,40 @@ class Ship:
         tail_offset = self.radius * 0.6
         tail_x = self.x + ux * tail_offset
         tail_y = self.y + uy * tail_offset
-        state.effects.append(ExhaustFX(tail_x, tail_y, ux, uy, strength=1.0))
+        if room_for_effect():
+            state.commands.spawn(
+                ExhaustFX.pool.acquire(tail_x, tail_y, ux, uy, strength=1.0),
+                state.effects.append,
+            )
 
-    def freeze(self, ticks):
-        # Apply or extend freeze duration
+    def freeze(self, seconds):
+        # Apply or extend freeze duration; counted down once per tick
         if not hasattr(self, "freeze_ticks"):
             self.freeze_ticks = 0
-        self.freeze_ticks = max(self.freeze_ticks, int(ticks))
+        self.freeze_ticks = max(self.freeze_ticks, timestep.ticks(seconds))
 
-    def tick(self):
+    def update(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
         if self == state.player:  # do nothing, controlled by the player (future)
-            self.draw()
             return
 
-        if utils.percentage_chance(5):
+        self.steer()
+        self.move()
+        self.act()
+
+    def steer(self):
+        turn_chance = timestep.percent_per_tick(settings.SHIP_TURN_RATE)
+        if utils.percentage_chance(turn_chance):
             self.change_direction()
 
-        self.move()
+    def act(self):
+        # Face along velocity; keep previous orientation if stationary
+        if self.vx != 0 or self.vy != 0:
+            self._angle = math.atan2(self.vy, self.vx)
 
-        if utils.percentage_chance(2):
-            target = self.choose_random_target()
+        fire_chance = timestep.percent_per_tick(settings.SHIP_FIRE_RATE)
+        if utils.percentage_chance(fire_chance):
+            target = targeting.choose_target(self)
             if target:
                 self.shoot_at_target(target)
@@ -0,0 +1,420 @@
+"""World snapshots: save the whole simulation and load it back later.
+
+A snapshot holds every ship, bullet, explosion and emitter, the particle
+system, both RNG states, the uid counter and the effect quality level,
+so a loaded world carries on exactly as the saved one would have. Use it
+to fork a scenario or to start benchmarks from a saturated world instead
+of simulating up to it.
+
+The format is columnar and little-endian: a header, a metadata block
+(the repr of a dict of plain Python values: RNG states, the uid counter,
+the tick rate that per-tick speeds and timers were stored at,
+colors and other strings referenced by index), then per kind a count and
+one contiguous array per attribute (see COLUMNS). Loading reads each
+column with numpy.frombuffer and builds the objects straight from the
+columns, bypassing __init__ and the pools.
+
+A bullet whose parent ship has died gets a stand-in parent that only
+has the dead ship's uid: bullets only ever compare their parent by
+identity or record its uid, and dead ships are out of the grid anyway.
+
+    python -m snapshot world.snap
+"""
+
+import argparse
+import ast
+import operator
+import random
+import struct
+
+import numpy as np
+
+import entities
+import particles
+import settings
+import state
+from bullet import KIND_IDS, Bullet
+from effects import DeathFX, ExhaustFX, TrailSmokeFX
+from ship import Ship
+
+MAGIC = b"SPSN"
+VERSION = 2  # 2: the saved RNG state feeds random.random() chances
+HEADER = struct.Struct("<4sHxxQ")  # magic, version, metadata length
+
+CLASSES = {
+    cls.__name__: cls for cls in (Ship, Bullet, DeathFX, ExhaustFX, TrailSmokeFX)
+}
+
+# Column types besides numpy dtypes: VALUE columns index the metadata's
+# value table (colors, bullet kinds, palettes, class names), PARENT columns
+# hold the uid of a ship
+VALUE = "value"
+PARENT = "parent"
+
+# (store, [(attribute, type)]) in load order; ships first so bullets can
+# find their parents. "__class__" is the entity's class by name, and a
+# ship's "_cell_order" is its position in its grid bucket
+COLUMNS = [
+    (
+        "ships",
+        [
+            ("__class__", VALUE),
+            ("uid", "<u4"),
+            ("radius", "<i4"),
+            ("color", VALUE),
+            ("x", "<f8"),
+            ("y", "<f8"),
+            ("vx", "<f8"),
+            ("vy", "<f8"),
+            ("_angle", "<f8"),
+            ("freeze_ticks", "<i4"),
+            ("_cell_order", "<i4"),
+        ],
+    ),
+    (
+        "bullets",
+        [
+            ("__class__", VALUE),
+            ("uid", "<u4"),
+            ("parent", PARENT),
+            ("kind", VALUE),
+            ("color", VALUE),
+            ("radius", "<i4"),
+            ("x", "<f8"),
+            ("y", "<f8"),
+            ("vx", "<f8"),
+            ("vy", "<f8"),
+            ("accel_x", "<f8"),
+            ("accel_y", "<f8"),
+            ("_angle", "<f8"),
+            ("_ticks", "<i4"),
+        ],
+    ),
+    (
+        "deaths",
+        [
+            ("__class__", VALUE),
+            ("uid", "<u4"),
+            ("x", "<f8"),
+            ("y", "<f8"),
+            ("palette", VALUE),
+            ("flash_time", "<i4"),
+            ("flash_radius", "<f8"),
+            ("ring_r", "<f8"),
+            ("ring_dr", "<f8"),
+            ("ring_w", "<f8"),
+            ("ring_r_max", "<i4"),
+            ("ttl", "<i4"),
+        ],
+    ),
+    (
+        "effects",
+        [
+            ("__class__", VALUE),
+            ("uid", "<u4"),
+            ("x", "<f8"),
+            ("y", "<f8"),
+            ("ttl", "<i4"),
+        ],
+    ),
+]
+
+PARTICLE_COLUMNS = [
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("vx", "<f8"),
+    ("vy", "<f8"),
+    ("ox", "<f8"),
+    ("oy", "<f8"),
+    ("life", "<f8"),
+    ("r", "<f8"),
+    ("kind", "<i1"),
+    ("color", "<i2"),
+]
+
+
+def _peek_uid():
+    # The next uid, without using it up
+    uid = entities.next_uid()
+    entities.reset_uids(uid)
+    return uid
+
+
+def _cell_orders():
+    # Ship -> index in its grid bucket, so buckets (and with them which of
+    # two overlapping ships a bullet hits) come back in the same order
+    orders = {}
+    for bucket in state.ship_grid.cells.values():
+        for i, ship in enumerate(bucket):
+            orders[ship] = i
+    return orders
+
+
+def _column(objects, attribute, kind, values, cell_orders):
+    if attribute == "__class__":
+        column = [type(o).__name__ for o in objects]
+    elif attribute == "_cell_order":
+        column = [cell_orders.get(o, 0) for o in objects]
+    elif attribute == "freeze_ticks":
+        column = [getattr(o, attribute, 0) for o in objects]
+    else:
+        column = list(map(operator.attrgetter(attribute), objects))
+
+    if kind == PARENT:
+        return np.array([0 if p is None else p.uid for p in column], "<u4")
+    if kind == VALUE:
+        # Values are keyed by repr since palettes are unhashable lists
+        index = [values.setdefault(repr(v), len(values)) for v in column]
+        return np.array(index, "<i4")
+    return np.array(column, kind)
+
+
+def dumps():
+    """Return the current world as snapshot bytes."""
+    values = {}  # repr -> index
+    cell_orders = _cell_orders()
+    sections = []
+    for name, columns in COLUMNS:
+        objects = list(getattr(state, name))
+        arrays = [
+            _column(objects, attribute, kind, values, cell_orders)
+            for attribute, kind in columns
+        ]
+        sections.append((len(objects), arrays))
+
+    system = state.particles
+    n = system.count
+    particle_arrays = [
+        getattr(system, attribute)[:n].astype(dtype)
+        for attribute, dtype in PARTICLE_COLUMNS
+    ]
+
+    metadata = repr(
+        {
+            "size": state.world.size,
+            "tick_rate": settings.TICK_RATE,
+            "values": list(values),
+            "palette": particles.palette,
+            "random": random.getstate(),
+            "particle_rng": particles.rng.bit_generator.state,
+            "next_uid": _peek_uid(),
+            "player": state.player.uid if state.player is not None else 0,
+            "quality": state.quality.level,
+        }
+    ).encode()
+
+    chunks = [HEADER.pack(MAGIC, VERSION, len(metadata)), metadata]
+    for count, arrays in sections + [(n, particle_arrays)]:
+        chunks.append(struct.pack("<I", count))
+        chunks += [a.tobytes() for a in arrays]
+    return b"".join(chunks)
+
+
+def save(path):
+    with open(path, "wb") as f:
+        f.write(dumps())
+
+
+class _Reader:
+    # Sequential reads of counts and columns from a bytes-like object
+    def __init__(self, data, offset):
+        self.data = data
+        self.offset = offset
+
+    def count(self):
+        (n,) = struct.unpack_from("<I", self.data, self.offset)
+        self.offset += 4
+        return n
+
+    def column(self, dtype, n):
+        a = np.frombuffer(self.data, dtype, n, self.offset)
+        self.offset += a.nbytes
+        return a
+
+
+def _read_metadata(data):
+    magic, version, length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a world snapshot")
+    if version != VERSION:
+        raise ValueError(
+            f"version {version} world snapshot; this build loads version "
+            f"{VERSION}, so save it again"
+        )
+    start = HEADER.size
+    metadata = ast.literal_eval(bytes(data[start : start + length]).decode())
+    return metadata, start + length
+
+
+def _parent(uid, ships_by_uid):
+    # Live ship by uid; a dead one gets a bare stand-in with just the uid
+    if uid == 0:
+        return None
+    ship = ships_by_uid.get(uid)
+    if ship is None:
+        ship = ships_by_uid[uid] = object.__new__(Ship)
+        ship.uid = uid
+    return ship
+
+
+def _build(n, columns, reader, values, ships_by_uid, column_store):
+    # Objects straight from the columns: one dict per entity, no __init__.
+    # Returns them with every column as read (value and parent columns as
+    # indices and uids). For a ColumnStore the attributes it keeps in
+    # columns are left out of the dicts, for ColumnStore.extend()
+    names = []
+    lists = []
+    read = {}
+    for attribute, kind in columns:
+        if kind in (VALUE, PARENT):
+            column = reader.column("<i4" if kind == VALUE else "<u4", n)
+        else:
+            column = reader.column(kind, n)
+        read[attribute] = column
+    classes = [CLASSES[values[i]] for i in read["__class__"].tolist()]
+    stored = entities.column_types(classes[0]) if column_store and classes else {}
+
+    for attribute, kind in columns:
+        if attribute in ("__class__", "_cell_order") or attribute in stored:
+            continue
+        raw = read[attribute].tolist()
+        names.append(attribute)
+        if kind == VALUE:
+            lists.append([values[i] for i in raw])
+        elif kind == PARENT:
+            lists.append([_parent(uid, ships_by_uid) for uid in raw])
+        else:
+            lists.append(raw)
+
+    new = object.__new__
+    built = []
+    for cls, row in zip(classes, zip(*lists)):
+        obj = new(cls)
+        obj.__dict__.update(zip(names, row))
+        built.append(obj)
+    return built, read
+
+
+def _map_values(indices, values, function, dtype):
+    # function(value) for a column of value indices, once per distinct value
+    distinct, inverse = np.unique(indices, return_inverse=True)
+    mapped = np.array([function(values[i]) for i in distinct.tolist()], dtype)
+    return mapped[inverse]
+
+
+def loads(data):
+    """Replace the current world with the one in snapshot bytes."""
+    metadata, offset = _read_metadata(data)
+    # Speeds and timers are stored per tick
+    tick_rate = metadata.get("tick_rate", settings.TICK_RATE)
+    if tick_rate != settings.TICK_RATE:
+        raise ValueError(
+            f"snapshot was saved at {tick_rate} ticks/s, not {settings.TICK_RATE}"
+        )
+    size = metadata["size"]
+    if size is not None and tuple(size) != state.world.size:
+        raise ValueError(
+            f"snapshot was saved in a {size[0]}x{size[1]} world, "
+            f"not {state.world.width}x{state.world.height}"
+        )
+    reader = _Reader(data, offset)
+    values = [ast.literal_eval(v) for v in metadata["values"]]
+    # Palette indices are per process; map the saved ones onto ours
+    colors = np.array(
+        [particles.color_id(c) for c in metadata["palette"]] or [0], np.int16
+    )
+
+    ships_by_uid = {}
+    loaded = {}
+    read = {}
+    for name, columns in COLUMNS:
+        column_store = isinstance(getattr(state, name), entities.ColumnStore)
+        loaded[name], read[name] = _build(
+            reader.count(), columns, reader, values, ships_by_uid, column_store
+        )
+        if name == "ships":
+            uids = read[name]["uid"].tolist()
+            ships_by_uid.update(zip(uids, loaded[name]))
+
+    # Nothing to draw in between before the first tick
+    for ship in loaded["ships"]:
+        ship.prev_x = ship.x
+        ship.prev_y = ship.y
+    # Bullets go into their ColumnStore as whole columns
+    bullets = read["bullets"]
+    bullets["prev_x"] = bullets["x"]
+    bullets["prev_y"] = bullets["y"]
+    bullets["color_id"] = _map_values(
+        bullets["color"], values, particles.color_id, np.int16
+    )
+    bullets["kind_id"] = _map_values(bullets["kind"], values, KIND_IDS.get, np.int8)
+    bullets["owner"] = bullets["parent"]
+
+    # Swap the world in
+    for name, _ in COLUMNS:
+        store = getattr(state, name)
+        store.clear()
+        if isinstance(store, entities.ColumnStore):
+            store.extend(loaded[name], read[name])
+        else:
+            store.extend(loaded[name])
+    ships = loaded["ships"]
+    ship_cell_orders = read["ships"]["_cell_order"].tolist()
+    order = sorted(range(len(ships)), key=ship_cell_orders.__getitem__)
+    state.ship_grid.rebuild([ships[i] for i in order])
+    state.ship_table = None
+    state.player = ships_by_uid.get(metadata["player"])
+    state.quality.set_level(metadata.get("quality", 0))
+    state.beams.clear()
+
+    system = state.particles
+    n = reader.count()
+    system.clear()
+    if n > system.capacity:
+        system._allocate(n)
+    for attribute, dtype in PARTICLE_COLUMNS:
+        column = reader.column(dtype, n)
+        if attribute == "color":
+            column = colors[column]
+        getattr(system, attribute)[:n] = column
+    system.px[:n] = system.x[:n]
+    system.py[:n] = system.y[:n]
+    system.count = n
+
+    random.setstate(metadata["random"])
+    particles.rng.bit_generator.state = metadata["particle_rng"]
+    entities.reset_uids(metadata["next_uid"])
+
+
+def load(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        loads(data)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Describe a world snapshot")
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    with open(args.path, "rb") as f:
+        data = f.read()
+    metadata, offset = _read_metadata(data)
+    reader = _Reader(data, offset)
+    counts = []
+    for name, columns in COLUMNS:
+        n = reader.count()
+        for _, kind in columns:
+            reader.column("<u4" if kind in (VALUE, PARENT) else kind, n)
+        counts.append(f"{n} {name}")
+    counts.append(f"{reader.count()} particles")
+    size = metadata["size"]
+    world = f"{size[0]}x{size[1]}" if size else "unknown"
+    print(f"world {world}, next uid {metadata['next_uid']}: " + ", ".join(counts))
+
+
+if __name__ == "__main__":
+    main()
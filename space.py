@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 
-from main import run
+from main import main
 
 if __name__ == "__main__":
-    run()
+    main()
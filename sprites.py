@@ -0,0 +1,123 @@
+import math
+from collections import OrderedDict
+
+import pygame
+
+import settings
+
+
+# Transparent background of baked sprites; no model uses this color
+COLORKEY = (255, 0, 255)
+
+
+def bake(angle, polygons=(), circles=()):
+    """Rasterize a model rotated by angle onto a fresh colorkeyed surface.
+
+    polygons: [(points, color, width)], circles: [(center, color, radius)],
+    all in model space with +X forward. Shapes are drawn in order. Returns
+    (surface, (ox, oy)) where (ox, oy) is the model origin on the surface.
+    """
+    c = math.cos(angle)
+    s = math.sin(angle)
+
+    def rotate(pt):
+        px, py = pt
+        return (px * c - py * s, px * s + py * c)
+
+    polys = [([rotate(p) for p in pts], color, line) for pts, color, line in polygons]
+    dots = [(rotate(center), color, radius) for center, color, radius in circles]
+
+    # Bounding box of everything, padded for outlines and round-off
+    xs = [p[0] for pts, _, _ in polys for p in pts]
+    ys = [p[1] for pts, _, _ in polys for p in pts]
+    for (px, py), _, radius in dots:
+        xs += [px - radius, px + radius]
+        ys += [py - radius, py + radius]
+    pad = 2
+    left = math.floor(min(xs)) - pad
+    top = math.floor(min(ys)) - pad
+    width = math.ceil(max(xs)) - left + pad + 1
+    height = math.ceil(max(ys)) - top + pad + 1
+
+    # Models are drawn without antialiasing, so every pixel is either fully
+    # opaque or transparent: an RLE colorkey blits several times faster
+    # than per-pixel alpha and looks identical
+    surface = pygame.Surface((width, height))
+    surface.fill(COLORKEY)
+    surface.set_colorkey(COLORKEY, pygame.RLEACCEL)
+    ox, oy = -left, -top
+
+    def local(pt):
+        return (int(pt[0] + ox), int(pt[1] + oy))
+
+    for pts, color, line in polys:
+        pygame.draw.polygon(surface, color, [local(p) for p in pts], line)
+    for center, color, radius in dots:
+        pygame.draw.circle(surface, color, local(center), radius)
+    return surface, (ox, oy)
+
+
+class SpriteCache:
+    """LRU cache of pre-rendered rotated sprites.
+
+    Keys are (kind, color, size, quantized angle). Sprites are baked
+    lazily the first time a key is requested and then drawn with a single
+    blit. hits/misses/evictions are kept for tuning the settings.
+    """
+
+    def __init__(self, angle_step=None, max_size=None):
+        step = angle_step or settings.SPRITE_ANGLE_STEP
+        self.steps = max(1, round(360 / step))
+        self.max_size = max_size or settings.SPRITE_CACHE_SIZE
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def quantize(self, angle):
+        return round(angle / math.tau * self.steps) % self.steps
+
+    def get(self, kind, color, size, angle, model):
+        """Return (surface, origin) for the sprite, baking it on a miss.
+
+        model(size, color) must return the (polygons, circles) to bake.
+        """
+        step = self.quantize(angle)
+        key = (kind, color, size, step)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        polygons, circles = model(size, color)
+        entry = bake(step * math.tau / self.steps, polygons, circles)
+        self.entries[key] = entry
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def push(self, draw_list, layer, kind, color, size, angle, x, y, model):
+        # Queue the sprite centered on (x, y) as a blit command
+        sprite, (ox, oy) = self.get(kind, color, size, angle, model)
+        draw_list.blit(layer, sprite, int(x) - ox, int(y) - oy)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
@@ -0,0 +1,143 @@
+import random
+
+import numpy as np
+import pygame
+
+import particles
+import timestep
+
+# Steady-state density of the old per-Star spawner (~117 on 3440x1440)
+STARS_PER_MPX = 24
+STAR_COLORS = ["white", "lightgray", "darkgray"]
+STAR_DRIFT = (400, 200)  # px/s for the nearest layer
+
+
+def parallax_layers(depths):
+    """Layer specs, farthest first: (drift scale, density scale, radii).
+
+    The nearest layer always matches the classic look (full drift, radius
+    2-3); extra depths add slower, smaller and sparser stars behind it.
+    """
+    layers = [(1.0, 1.0, (2, 3))]
+    for depth in range(1, depths):
+        scale = 0.5**depth
+        layers.insert(0, (scale, scale + 0.5, (1, 2)))
+    return layers
+
+
+class Starfield:
+    """Drifting background stars without per-star objects.
+
+    "layers" mode pre-renders each parallax depth onto a screen-sized
+    surface once and scrolls it with wraparound, so drawing costs four
+    blits per layer no matter how dense the field is. The farthest layer
+    is opaque and doubles as the screen clear (see `opaque`).
+
+    "points" mode keeps stars in compact arrays, drifts them with a
+    vectorized wraparound and splats them like particles. Used with the
+    dirty-rect renderer, where a scrolling full-screen layer would dirty
+    every tile.
+    """
+
+    def __init__(self, size, mode="layers", depths=1):
+        self.width, self.height = size
+        self.mode = mode
+        self.layers = parallax_layers(depths)
+        if mode == "layers":
+            self.opaque = True
+            self.stars = [self._stars(spec) for spec in self.layers]
+            self.count = sum(len(xs) for xs, _, _, _ in self.stars)
+            self.surfaces = None  # baked on first draw; headless never does
+            self.offsets = [[0.0, 0.0] for _ in self.layers]
+        else:
+            self.opaque = False
+            self._scatter()
+            self.count = len(self.x)
+
+    def _stars(self, spec):
+        # Random positions, radii and colors for one layer
+        _, density, radii = spec
+        count = int(STARS_PER_MPX * density * self.width * self.height / 1e6)
+        xs = [random.randrange(self.width) for _ in range(count)]
+        ys = [random.randrange(self.height) for _ in range(count)]
+        rs = [random.randint(*radii) for _ in range(count)]
+        colors = [random.choice(STAR_COLORS) for _ in range(count)]
+        return xs, ys, rs, colors
+
+    def _bake(self, index, stars):
+        surface = pygame.Surface((self.width, self.height))
+        if index > 0:
+            # Nearer layers are sparse overlays; RLE keeps those blits cheap
+            surface.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        for x, y, r, color in zip(*stars):
+            # Draw near the edges twice so circles wrap seamlessly
+            for dx in (0, -self.width, self.width):
+                for dy in (0, -self.height, self.height):
+                    pygame.draw.circle(surface, color, (x + dx, y + dy), r)
+        return surface
+
+    def _scatter(self):
+        xs, ys, rs, colors, speed = [], [], [], [], []
+        for spec in self.layers:
+            lx, ly, lr, lc = self._stars(spec)
+            xs += lx
+            ys += ly
+            rs += lr
+            colors += [particles.color_id(c) for c in lc]
+            speed += [spec[0]] * len(lx)
+        self.x = np.array(xs, dtype=np.float64)
+        self.y = np.array(ys, dtype=np.float64)
+        self.r = np.array(rs, dtype=np.int32)
+        self.color = np.array(colors, dtype=np.int16)
+        self.speed = np.array(speed, dtype=np.float64)
+
+    def __len__(self):
+        return self.count
+
+    def _drift(self):
+        # Nearest layer's drift per tick
+        return timestep.per_tick(STAR_DRIFT[0]), timestep.per_tick(STAR_DRIFT[1])
+
+    def update(self):
+        dx, dy = self._drift()
+        if self.mode == "layers":
+            for offset, (scale, _, _) in zip(self.offsets, self.layers):
+                offset[0] = (offset[0] + dx * scale) % self.width
+                offset[1] = (offset[1] + dy * scale) % self.height
+        else:
+            self.x += dx * self.speed
+            self.y += dy * self.speed
+            np.mod(self.x, self.width, out=self.x)
+            np.mod(self.y, self.height, out=self.y)
+
+    def render(self, draw_list, layer, camera, alpha=1.0):
+        # Queues four wrapped blits per baked layer, or every star as a disc.
+        # Drift is steady, so alpha between ticks is a step back from now.
+        # Stars sit at infinity: panning the camera shifts each layer by its
+        # parallax scale and zoom leaves them alone
+        dx, dy = self._drift()
+        back_x = dx * (1 - alpha) + camera.left
+        back_y = dy * (1 - alpha) + camera.top
+        if self.mode == "layers":
+            if self.surfaces is None:
+                self.surfaces = [
+                    self._bake(i, stars) for i, stars in enumerate(self.stars)
+                ]
+            w, h = self.width, self.height
+            for surface, (ox, oy), (scale, _, _) in zip(
+                self.surfaces, self.offsets, self.layers
+            ):
+                ox = int((ox - back_x * scale) % w)
+                oy = int((oy - back_y * scale) % h)
+                draw_list.blit(layer, surface, ox - w, oy - h)
+                draw_list.blit(layer, surface, ox, oy - h)
+                draw_list.blit(layer, surface, ox - w, oy)
+                draw_list.blit(layer, surface, ox, oy)
+            return
+        draw_list.circles(
+            layer,
+            np.mod(self.x - back_x * self.speed, self.width).astype(np.int32),
+            np.mod(self.y - back_y * self.speed, self.height).astype(np.int32),
+            self.r,
+            self.color,
+        )
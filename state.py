@@ -1,13 +1,99 @@
 # Shared game state (screen and entity lists)
 
+import settings
+from camera import Camera
+from commands import CommandQueue
+from drawlist import DrawList
+from entities import ColumnStore
+from grid import SpatialGrid
+from particles import ParticleSystem
+from profiler import FrameProfiler
+from quality import QualityGovernor
+from render import FullRenderer
+from sprites import SpriteCache
+from world import World
+
 screen = None
 
-# Global entity collections
-stars = []
-ships = []
-bullets = []
-deaths = []
-effects = []
+# Simulated area, and the part of it the window shows
+world = World()
+camera = Camera(settings.WINDOW_SIZE, world.size)
+
+# Presents frames; entities report what they drew through renderer.mark()
+renderer = FullRenderer()
+
+# Global entity collections (O(1) add/remove, safe to mutate while iterating).
+# Every one keeps its entities' uids in a column, for encoding the world in
+# bulk (replay.Live); bullets also keep their motion in arrays, stepped in
+# bulk (see bullet.py)
+ships = ColumnStore()
+bullets = ColumnStore()
+deaths = ColumnStore()
+effects = ColumnStore()
+
+# Ship and bullet spawns and kills requested during a tick; main.step()
+# applies them between phases (see commands.py)
+commands = CommandQueue()
+
+# Laser and freeze beams fired this tick as (color, start, end, width);
+# they only live for one rendered frame
+beams = []
+
+# Spatial index over ships, kept in sync by Ship.move/despawn
+ship_grid = SpatialGrid()
+
+# ship.ShipTable of this tick once the ship phase is over, None before
+ship_table = None
+
+# Every effect particle, updated and drawn in one pass per tick
+particles = ParticleSystem(limit=settings.MAX_PARTICLES)
+
+# Effect detail level, lowered while frames run over budget
+quality = QualityGovernor()
+
+# Draw commands queued by render() calls, flushed once per frame
+draw_list = DrawList()
+
+# renderthread.RenderThread when frames are drawn on their own thread
+# (main.py --render-thread); it swaps draw_list every frame
+render_thread = None
+
+# Pre-rendered rotated ship and projectile sprites
+sprites = SpriteCache()
+
+# How far real time is between the last tick and the next (0..1); render()
+# calls draw that far from each entity's previous position to its current
+alpha = 1.0
+
+# Ticks of real time the window loop dropped to keep frames coming when
+# the simulation couldn't keep up (see timestep.FixedStep)
+ticks_dropped = 0
+
+# tasks.Scheduler while the asyncio loop runs (main.py --async), None
+# otherwise; background tasks are spawned on it
+tasks = None
+
+# parallel.ParallelSim when ships and bullets are stepped by worker
+# processes, None for the serial loop
+parallel = None
+
+# replay.Recorder while recording; replay.Replay (and the first mismatch
+# found, if any) while re-simulating a recording
+recorder = None
+replay = None
+replay_error = None
+
+# stream.StreamServer while spectators may connect (main.py --stream)
+stream = None
+
+# capture.FrameCapture while drawn frames are recorded (main.py --capture)
+capture = None
+
+# Main loop phase timings; disabled (and nearly free) unless toggled
+profiler = FrameProfiler()
+
+# Background stars (starfield.Starfield), created with the universe
+starfield = None
 
 # Player reference (optional)
 player = None
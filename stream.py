@@ -0,0 +1,467 @@
+"""Spectator streaming of the live world over a local socket.
+
+main.py --stream ADDRESS publishes the state of ships, bullets,
+explosions and emitters after every tick to any number of connected
+clients, over TCP ("host:port") or a Unix socket (a path). Entities are
+encoded as in replay.py: sorted uids, int32 static and float32 dynamic
+columns, and the same dead-reckoning predictions.
+
+Messages, little-endian:
+
+    hello     magic, version, tick rate, world size (once, on connect)
+    message   body length, flags, tick, base keyframe tick, then one
+              section per kind (see replay.KINDS)
+    ack       keyframe tick (client to server)
+
+A keyframe holds every entity in full. A delta is encoded against the
+last keyframe the client acknowledged, not against the previous tick:
+entities removed since that keyframe, entities added since then in
+full, and ships that strayed from the keyframe's prediction. Any delta
+can therefore be decoded on its own with its keyframe, so frames a
+client never got cost nothing to skip. A new client gets a keyframe at
+once and deltas from when it acknowledges it.
+
+That is what backpressure relies on. Sockets are never written to
+blocking; unsent bytes queue per client, and a client whose queue grows
+past settings.STREAM_BUFFER_BYTES drops to keyframes only until it has
+drained its queue. Deltas are encoded once per tick for each keyframe in
+use, whatever the number of clients.
+
+    python -m stream 127.0.0.1:7777
+"""
+
+import argparse
+import itertools
+import os
+import selectors
+import socket
+import struct
+import time
+
+import numpy as np
+
+import replay
+import settings
+import state
+
+MAGIC = b"SPST"
+VERSION = 1
+HELLO = struct.Struct("<4sHxxIII")  # magic, version, tick rate, width, height
+MESSAGE = struct.Struct("<IBxxxII")  # body length, flags, tick, base tick
+ACK = struct.Struct("<I")  # keyframe tick
+KEYFRAME = replay.KEYFRAME
+
+
+def parse_address(address):
+    # "host:port" is TCP, anything else a Unix socket path
+    host, _, port = address.rpartition(":")
+    if host and port.isdigit():
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+class _Base:
+    # A keyframe as clients rebuild it, and its prediction for a later
+    # tick; only of the kinds deltas compare against it (see replay.KINDS)
+    def __init__(self, tick, kinds):
+        self.tick = tick
+        self.kinds = kinds  # [(uids, static, dynamic)] per kind
+        self.guess_tick = tick
+        # Per kind, (tick, rows) of the entities the last delta against
+        # this keyframe added, for reuse by the next one
+        self.added = [None] * len(kinds)
+        self.guess = [
+            dynamic if motion is not None else None
+            for (_, _, dynamic), (*_, motion) in zip(kinds, replay.KINDS)
+        ]
+
+    def guess_at(self, tick):
+        # Dead reckoning up to tick, one tick at a time as StreamClient
+        # does; bases no delta is encoded against are never advanced
+        while self.guess_tick < tick:
+            self.guess = [
+                guess if guess is None else predict(static, guess)
+                for (_, static, _), guess, (*_, predict, _) in zip(
+                    self.kinds, self.guess, replay.KINDS
+                )
+            ]
+            self.guess_tick += 1
+        return self.guess
+
+    def added_at(self, tick, i, kind, positions):
+        # Rows of the entities added since the keyframe; the ones the
+        # delta of the tick before added too are advanced from it
+        last = self.added[i]
+        if last is not None and last[0] == tick - 1:
+            rows = kind.rows_after(positions, last[1])
+        else:
+            rows = kind.rows(positions)
+        self.added[i] = tick, rows
+        return rows
+
+
+class _Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.out = bytearray()
+        self.inbox = bytearray()
+        self.base = None  # last acknowledged keyframe tick
+        self.keyframe_sent = False
+        self.behind = False  # dropping to keyframes until the queue drains
+        self.frames = 0
+        self.dropped = 0
+
+
+class StreamServer:
+    """Publishes world state to spectators; see the module docstring.
+
+    Call publish(tick) once per tick after the simulation step. Socket
+    I/O never blocks: publish() pumps it once, and pump() can be called
+    again whenever there is time (serve() does so as a background task).
+    """
+
+    def __init__(self, address, keyframe_interval=None, buffer_bytes=None):
+        self.keyframe_interval = keyframe_interval or settings.STREAM_KEYFRAME_INTERVAL
+        self.buffer_bytes = buffer_bytes or settings.STREAM_BUFFER_BYTES
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(self.address)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.clients = []
+        self.bases = []  # recent keyframes, oldest first
+        self.last_keyframe = None
+        # Stats for tuning
+        self.keyframes = 0
+        self.keyframe_bytes = 0
+        self.deltas = 0  # encoded, each shared by clients on the same base
+        self.delta_bytes = 0
+        self.dropped = 0
+
+    def close(self):
+        for client in self.clients:
+            client.sock.close()
+        self.clients = []
+        self.selector.close()
+        self.listener.close()
+        if self.listener.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def publish(self, tick):
+        self.pump()
+        if not self.clients:
+            # Nobody watching: no encoding, and old keyframes are useless
+            self.bases = []
+            self.last_keyframe = None
+            return
+
+        keyframe = (
+            self.last_keyframe is None
+            or tick - self.last_keyframe >= self.keyframe_interval
+            or any(not c.keyframe_sent for c in self.clients)
+        )
+        current = replay.live()
+        if keyframe:
+            key = self._keyframe(tick, current)
+        deltas = {}  # base tick -> encoded delta, shared by clients
+
+        limit = self.buffer_bytes
+        bases = {base.tick: base for base in self.bases}
+        for client in self.clients:
+            if len(client.out) >= limit:
+                client.behind = True
+            if keyframe and len(client.out) < limit:
+                message = key
+                client.keyframe_sent = True
+            elif client.base is None:
+                continue  # its first keyframe isn't acknowledged yet
+            elif client.behind or client.base not in bases:
+                client.dropped += 1
+                self.dropped += 1
+                continue
+            else:
+                message = deltas.get(client.base)
+                if message is None:
+                    message = self._delta(tick, bases[client.base], current)
+                    deltas[client.base] = message
+                    self.deltas += 1
+                    self.delta_bytes += len(message)
+            client.out += message
+            client.frames += 1
+        self.pump()
+
+    def _keyframe(self, tick, current):
+        kinds = []
+        chunks = []
+        for kind in current:
+            uids, static, dynamic = kind.rows()
+            chunks += replay.pack_section(uids, static, dynamic)
+            kinds.append((uids, static, replay.as_stored(dynamic)))
+        self.bases.append(_Base(tick, kinds))
+        del self.bases[: -settings.STREAM_KEEP_KEYFRAMES]
+        self.last_keyframe = tick
+        message = self._message(chunks, KEYFRAME, tick, tick)
+        self.keyframes += 1
+        self.keyframe_bytes += len(message)
+        return message
+
+    def _delta(self, tick, base, current):
+        chunks = []
+        guesses = base.guess_at(tick)
+        for i, (kind, (base_uids, _, _), guess) in enumerate(
+            zip(current, base.kinds, guesses)
+        ):
+            kept, positions, added = kind.split(base_uids)
+            chunks += replay.pack_section(base_uids[~kept])
+            chunks += replay.pack_section(*base.added_at(tick, i, kind, added))
+
+            # Ships that strayed from the keyframe's prediction
+            kept_uids = base_uids[kept]
+            fixes = kept_uids[:0], np.zeros((0, kind.dynamics))
+            if kind.tracked and len(kept_uids):
+                actual = kind.motion(positions)
+                error = np.abs(actual - guess[kept]).max(axis=1)
+                changed = error > replay.TOLERANCE
+                fixes = kept_uids[changed], actual[changed]
+            chunks += replay.pack_section(fixes[0], dynamic=fixes[1])
+        return self._message(chunks, 0, tick, base.tick)
+
+    @staticmethod
+    def _message(chunks, flags, tick, base):
+        body = b"".join(chunks)
+        return MESSAGE.pack(len(body), flags, tick, base) + body
+
+    def pump(self):
+        """Accept clients, read acks and send what sockets take now."""
+        for key, _ in self.selector.select(0):
+            if key.fileobj is self.listener:
+                self._accept()
+            else:
+                self._read(key.data)
+        for client in list(self.clients):
+            if client.out:
+                try:
+                    sent = client.sock.send(client.out)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    self._drop(client)
+                    continue
+                del client.out[:sent]
+            if not client.out:
+                client.behind = False
+
+    def _accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        sock.setblocking(False)
+        # Keep the kernel from queueing megabytes of its own, so a slow
+        # client shows up in client.out where backpressure can see it
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.buffer_bytes // 4)
+        if sock.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = _Client(sock)
+        client.out += HELLO.pack(MAGIC, VERSION, settings.TICK_RATE, *state.world.size)
+        self.clients.append(client)
+        self.selector.register(sock, selectors.EVENT_READ, client)
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return
+        client.inbox += data
+        usable = len(client.inbox) - len(client.inbox) % ACK.size
+        if usable:
+            # Only the latest ack matters
+            (client.base,) = ACK.unpack_from(client.inbox, usable - ACK.size)
+            del client.inbox[:usable]
+
+    def _drop(self, client):
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        self.clients.remove(client)
+
+    async def serve(self, task):
+        # Background task for the asyncio loop: keep sockets moving in the
+        # idle time between frames, until nothing is left to send
+        while True:
+            self.pump()
+            if any(client.out for client in self.clients):
+                await task.checkpoint()
+            else:
+                await task.next_window()
+
+
+class StreamClient:
+    """Reference spectator: rebuilds the world from a StreamServer.
+
+    receive() blocks for the next message and returns (tick, world) with
+    world as {kind: (uids, static, dynamic)}, like replay.Replay.state().
+    """
+
+    def __init__(self, address, timeout=None, receive_buffer=None):
+        family, address = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        if receive_buffer is not None:
+            # Small buffers make a slow reader push back on the server sooner
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self.buffer = bytearray()
+        magic, version, self.tick_rate, width, height = HELLO.unpack(
+            self._read(HELLO.size)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} world stream")
+        self.size = (width, height)
+        self.keyframes = {}  # tick -> (kinds, (tick, prediction))
+        # Stats
+        self.bytes = HELLO.size
+        self.keyframe_count = 0
+        self.delta_count = 0
+
+    def close(self):
+        self.sock.close()
+
+    def _read(self, n):
+        while len(self.buffer) < n:
+            data = self.sock.recv(max(65536, n - len(self.buffer)))
+            if not data:
+                raise EOFError("stream closed")
+            self.buffer += data
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def receive(self):
+        length, flags, tick, base = MESSAGE.unpack(self._read(MESSAGE.size))
+        body = memoryview(self._read(length))
+        self.bytes += MESSAGE.size + length
+        sections = _Sections(body)
+        if flags & KEYFRAME:
+            kinds = [
+                sections.read((statics, "<i4"), (dynamics, "<f4"))
+                for _, statics, dynamics, *_ in replay.KINDS
+            ]
+            kinds = [(uids, static, dynamic) for uids, (static, dynamic) in kinds]
+            self.keyframes[tick] = (kinds, (tick, [d for _, _, d in kinds]))
+            # Keep the ones the server may still encode against
+            for old in sorted(self.keyframes)[: -settings.STREAM_KEEP_KEYFRAMES]:
+                del self.keyframes[old]
+            self.sock.sendall(ACK.pack(tick))
+            self.keyframe_count += 1
+            return tick, dict(zip((k[0] for k in replay.KINDS), kinds))
+
+        self.delta_count += 1
+        kinds, guess = self.keyframes[base]
+        guess = self._advance(kinds, guess, tick)
+        self.keyframes[base] = (kinds, (tick, guess))
+        world = {}
+        for (name, statics, dynamics, _, _, _), (base_uids, static, _), g in zip(
+            replay.KINDS, kinds, guess
+        ):
+            removed, _ = sections.read()
+            add_uids, (add_static, add_dynamic) = sections.read(
+                (statics, "<i4"), (dynamics, "<f4")
+            )
+            fix_uids, (fixes,) = sections.read((dynamics, "<f4"))
+            kept = ~np.isin(base_uids, removed, assume_unique=True)
+            uids = base_uids[kept]
+            dynamic = g[kept]
+            dynamic[np.searchsorted(uids, fix_uids)] = fixes
+            world[name] = replay.merge_rows(
+                uids, static[kept], dynamic, add_uids, add_static, add_dynamic
+            )
+        return tick, world
+
+    @staticmethod
+    def _advance(kinds, guess, tick):
+        # Predict a keyframe forward from the tick it was last predicted to
+        at, dynamics = guess
+        for _ in range(tick - at):
+            dynamics = [
+                predict(static, d)
+                for (_, static, _), d, (*_, predict, _) in zip(
+                    kinds, dynamics, replay.KINDS
+                )
+            ]
+        return dynamics
+
+
+class _Sections:
+    # Reads replay.pack_section() sections from a message body
+    def __init__(self, body):
+        self.body = body
+        self.offset = 0
+
+    def _array(self, dtype, count):
+        a = np.frombuffer(self.body, dtype, count, self.offset)
+        self.offset += a.nbytes
+        return a
+
+    def read(self, *widths):
+        # uids plus one column block per (width, dtype): static columns as
+        # int32, dynamic ones as float64 like the server's predictions
+        (n,) = struct.unpack_from("<I", self.body, self.offset)
+        self.offset += 4
+        uids = self._array("<u4", n).copy()
+        columns = []
+        for width, dtype in widths:
+            column = self._array(dtype, n * width).reshape(n, width)
+            columns.append(column.astype(np.int32 if dtype == "<i4" else np.float64))
+        return uids, columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow a world stream")
+    parser.add_argument("address", help="host:port or Unix socket path")
+    parser.add_argument("--messages", type=int, help="stop after this many")
+    args = parser.parse_args(argv)
+
+    client = StreamClient(args.address)
+    print(f"world {client.size[0]}x{client.size[1]} at {client.tick_rate} ticks/s")
+    start = time.perf_counter()
+    last = None
+    skipped = 0
+    try:
+        for count in itertools.count(1):
+            tick, world = client.receive()
+            if last is not None:
+                skipped += max(0, tick - last - 1)
+            last = tick
+            now = time.perf_counter()
+            if now - start >= 1 or count == args.messages:
+                counts = ", ".join(
+                    f"{len(u)} {name}" for name, (u, _, _) in world.items()
+                )
+                print(
+                    f"tick {tick}: {counts}; {client.keyframe_count} keyframes, "
+                    f"{client.delta_count} deltas, {skipped} ticks skipped, "
+                    f"{client.bytes / (now - start) / 1024:.0f} KiB/s"
+                )
+                start = now
+                client.bytes = 0
+            if count == args.messages:
+                break
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Target selection and weapon choice for ships.
+
+Every other ship counts as an enemy. Range queries go through the ship
+grid, and weapon bands are compared as squared distances so choosing a
+weapon never takes a square root.
+"""
+
+import random
+
+import settings
+import state
+
+# Weapon bands as (max range, Ship method), shortest first; anything
+# farther gets a torpedo
+LASER_RANGE = 500
+FREEZE_RANGE = 650  # slightly longer than laser
+MACHINEGUN_RANGE = 1000
+GLIDE_BOMB_RANGE = 2000
+WEAPON_BANDS = [
+    (LASER_RANGE * LASER_RANGE, "shoot_laser"),
+    (FREEZE_RANGE * FREEZE_RANGE, "shoot_freezing_ray"),
+    (MACHINEGUN_RANGE * MACHINEGUN_RANGE, "shoot_machinegun"),
+    (GLIDE_BOMB_RANGE * GLIDE_BOMB_RANGE, "shoot_gliding_bombs"),
+]
+FALLBACK_WEAPON = "shoot_torpedo"
+
+
+def weapon_for(distance_squared):
+    for limit, weapon in WEAPON_BANDS:
+        if distance_squared < limit:
+            return weapon
+    return FALLBACK_WEAPON
+
+
+def random_enemy(ship):
+    # The classic pick: a few random draws from the whole fleet
+    ships = state.ships
+    for _ in range(0, 5):
+        index = random.randrange(0, len(ships))
+        if ships[index] != ship:
+            return ships[index]
+    return None  # couldn't find a suitable target
+
+
+def nearest_enemy(ship, radius=None):
+    return state.ship_grid.nearest(ship.x, ship.y, exclude=ship, radius=radius)
+
+
+def nearest_enemies(ship, k, radius=None):
+    return state.ship_grid.k_nearest(ship.x, ship.y, k, exclude=ship, radius=radius)
+
+
+def enemies_within(ship, radius):
+    return state.ship_grid.query_radius(ship.x, ship.y, radius, exclude=ship)
+
+
+def random_enemy_within(ship, radius, attempts=32):
+    # Rejection sampling from the whole fleet is uniform over the ships in
+    # range and O(1) per draw, far cheaper than listing a crowded circle;
+    # sparse neighbourhoods fall back to the grid query
+    r2 = radius * radius
+    ships = state.ships
+    x, y = ship.x, ship.y
+    for _ in range(attempts):
+        other = ships[random.randrange(len(ships))]
+        dx = other.x - x
+        dy = other.y - y
+        if other is not ship and dx * dx + dy * dy <= r2:
+            return other
+    enemies = enemies_within(ship, radius)
+    return random.choice(enemies) if enemies else None
+
+
+def in_range_enemy(ship):
+    # Prefer something the laser can reach, otherwise the closest ship
+    return random_enemy_within(ship, LASER_RANGE) or nearest_enemy(ship)
+
+
+# Strategies selectable with settings.SHIP_TARGETING
+STRATEGIES = {
+    "random": random_enemy,
+    "nearest": nearest_enemy,
+    "in_range": in_range_enemy,
+}
+
+
+def choose_target(ship):
+    return STRATEGIES[settings.SHIP_TARGETING](ship)
@@ -0,0 +1,181 @@
+"""Background tasks that run in the idle time between frames.
+
+With main.py --async the window loop runs on asyncio (main.run_async):
+every frame is drawn synchronously, then the loop waits for the next
+frame's start time with asyncio, and that wait is the idle window in
+which background coroutines run. Telemetry export, streaming or capture
+can then do their work without ever sitting inside a frame.
+
+Tasks are scheduled with state.tasks.spawn() and must cooperate:
+
+    async def export(task):
+        while True:
+            line = build_line()
+            await task.run_blocking(sink.write, line)  # I/O off the loop
+            await task.checkpoint()
+
+    state.tasks.spawn(export, budget_ms=1.0)
+
+checkpoint() charges the time since the task last resumed to its budget
+for the frame and only returns inside an idle window, with budget left,
+before the window's cutoff (the next frame's start minus
+settings.TASK_MARGIN_MS). Blocking calls go through run_blocking(),
+which runs them in a worker thread, so slow I/O waits without holding up
+the loop. A slice may finish past the budget (the next one then waits a
+frame) or the cutoff, but one still running at the next frame's start
+delays that frame and is counted in the task's `overruns`; keep slices
+well under the margin. Await nothing else
+in between, or the wait is charged as if the task had been running.
+"""
+
+import asyncio
+import time
+
+import settings
+
+clock = time.perf_counter
+
+# Part of the wait spent yielding instead of sleeping, so frames start
+# on time despite the event loop's coarse sleep granularity
+SPIN = 0.001
+
+
+class BackgroundTask:
+    """Handle a task's coroutine gets for checkpoints and blocking calls."""
+
+    def __init__(self, scheduler, name, budget_ms):
+        self.scheduler = scheduler
+        self.name = name
+        self.budget_ms = budget_ms
+        self.used_ms = 0.0  # in the current (or last) window
+        self.total_ms = 0.0
+        self.overruns = 0
+        self.task = None  # the asyncio.Task, set by Scheduler.spawn
+        self._window = -1
+        self._resumed = None  # when it last got to run, None while waiting
+
+    def _charge(self, now):
+        if self._resumed is None:
+            return
+        ms = (now - self._resumed) * 1000
+        self.used_ms += ms
+        self.total_ms += ms
+        self._resumed = None
+        if now > self.scheduler.deadline:
+            self.overruns += 1
+
+    def _may_run(self, now):
+        s = self.scheduler
+        if not s.open or now >= s.cutoff:
+            return False
+        if self._window != s.window:
+            self._window = s.window
+            self.used_ms = 0.0
+        return self.used_ms < self.budget_ms
+
+    async def checkpoint(self):
+        """Yield to the loop; returns when this task may run again."""
+        now = clock()
+        self._charge(now)
+        await asyncio.sleep(0)
+        now = clock()
+        while not self._may_run(now):
+            await self.scheduler.next_window()
+            now = clock()
+        self._resumed = now
+
+    async def next_window(self):
+        """Like checkpoint(), but skip the rest of the current window."""
+        self._charge(clock())
+        await self.scheduler.next_window()
+        await self.checkpoint()
+
+    async def run_blocking(self, function, *args):
+        """Call function(*args) in a worker thread and return its result."""
+        self._charge(clock())
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, function, *args)
+        await self.checkpoint()
+        return result
+
+
+class Scheduler:
+    """Idle windows between frames and the background tasks that use them.
+
+    The frame loop calls idle(deadline) once per frame to wait until the
+    next frame should start; tasks only run during that call.
+    """
+
+    def __init__(self, margin_ms=None):
+        margin_ms = settings.TASK_MARGIN_MS if margin_ms is None else margin_ms
+        self.margin = margin_ms / 1000
+        self.tasks = []
+        self.window = 0  # number of the current or last idle window
+        self.open = False
+        self.deadline = 0.0  # when the next frame starts
+        self.cutoff = 0.0  # when tasks stop getting resumed
+        self._next = None
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def next_window(self):
+        # Awaitable that completes when the next idle window opens; shielded
+        # so that cancelling one waiter doesn't cancel it for the others
+        if self._next is None:
+            self._next = asyncio.get_running_loop().create_future()
+        return asyncio.shield(self._next)
+
+    def spawn(self, function, *args, name=None, budget_ms=None):
+        """Start function(task, *args) as a background task.
+
+        function is an async function; task is its BackgroundTask. It first
+        runs in the next idle window.
+        """
+        budget = settings.TASK_BUDGET_MS if budget_ms is None else budget_ms
+        handle = BackgroundTask(self, name or function.__name__, budget)
+
+        async def start():
+            await handle.checkpoint()
+            await function(handle, *args)
+
+        handle.task = asyncio.get_running_loop().create_task(start())
+        handle.task.add_done_callback(self._finished)
+        self.tasks.append(handle)
+        return handle
+
+    def _finished(self, task):
+        self.tasks = [t for t in self.tasks if t.task is not task]
+        if not task.cancelled() and task.exception() is not None:
+            # Surface the failure without taking the frame loop down
+            print(f"background task failed: {task.exception()!r}")
+
+    async def idle(self, deadline):
+        """Let background tasks run until deadline (a clock() time)."""
+        self.window += 1
+        self.open = True
+        self.deadline = deadline
+        self.cutoff = deadline - self.margin
+        if self._next is not None:
+            self._next.set_result(None)
+            self._next = None
+        try:
+            delay = deadline - clock() - SPIN
+            if delay > 0:
+                await asyncio.sleep(delay)
+            while clock() < deadline:
+                await asyncio.sleep(0)
+        finally:
+            self.open = False
+
+    async def close(self):
+        # Cancel every task and wait for them to unwind
+        tasks = [t.task for t in self.tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = []
+
+    def stats(self):
+        # (name, ms used in the last window, budget, overruns) per task
+        return [(t.name, t.used_ms, t.budget_ms, t.overruns) for t in self.tasks]
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+import settings  # noqa: E402
+import state  # noqa: E402
+
+
+@pytest.fixture
+def world(monkeypatch):
+    # An empty headless world; settings a scenario changes are put back
+    monkeypatch.setattr(settings, "SHIP_FIRE_RATE", settings.SHIP_FIRE_RATE)
+    pygame.init()
+    state.screen = pygame.Surface(settings.WINDOW_SIZE)
+    main.reset_world()
+    yield state
+    main.reset_world()
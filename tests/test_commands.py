@@ -0,0 +1,70 @@
+from commands import CommandQueue
+
+
+class Entity:
+    def __init__(self, name, log, queue=None, replacement=None):
+        self.name = name
+        self.log = log
+        self.queue = queue
+        self.replacement = replacement
+
+    def despawn(self):
+        self.log.append(("despawn", self.name))
+        if self.replacement is not None:
+            self.queue.spawn(self.replacement, self.log_spawn)
+
+    def log_spawn(self, entity):
+        self.log.append(("spawn", entity.name))
+
+
+def test_spawns_then_kills_in_the_order_queued():
+    log = []
+    queue = CommandQueue()
+    a, b, c = (Entity(name, log) for name in "abc")
+    queue.kill(b)
+    queue.spawn(c, a.log_spawn)
+    queue.kill(a)
+    queue.spawn(a, a.log_spawn)
+    assert len(queue) == 4
+    assert log == []
+
+    queue.apply()
+    assert log == [("spawn", "c"), ("spawn", "a"), ("despawn", "b"), ("despawn", "a")]
+    assert len(queue) == 0
+
+
+def test_repeated_kills_despawn_once():
+    log = []
+    queue = CommandQueue()
+    a = Entity("a", log)
+    assert queue.kill(a)
+    assert not queue.kill(a)
+    queue.apply()
+    assert log == [("despawn", "a")]
+    assert queue.counts == {"spawns": 0, "kills": 1, "repeats": 1}
+    queue.end_tick()
+    assert queue.last_tick["repeats"] == 1
+    assert queue.counts["repeats"] == 0
+
+
+def test_spawns_queued_by_a_despawn_apply_at_the_same_sync_point():
+    log = []
+    queue = CommandQueue()
+    replacement = Entity("b", log)
+    doomed = Entity("a", log, queue, replacement)
+    queue.kill(doomed)
+    queue.apply()
+    assert log == [("despawn", "a"), ("spawn", "b")]
+
+
+def test_queued_counts_spawns_per_target_until_applied():
+    added = []
+    queue = CommandQueue()
+    queue.spawn("a", added.append)
+    queue.spawn("b", added.append)
+    queue.spawn("c", print)
+    assert queue.queued(added.append) == 2
+    assert queue.queued(print) == 1
+    queue.apply()
+    assert added == ["a", "b"]
+    assert queue.queued(added.append) == 0
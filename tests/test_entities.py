@@ -0,0 +1,78 @@
+import numpy as np
+
+from entities import Column, ColumnStore, EntityStore
+
+
+class Thing:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class Body:
+    x = Column(np.float64)
+    uid = Column(np.int64)
+    _store = None
+
+    def __init__(self, uid, x):
+        self.uid = uid
+        self.x = x
+
+
+def test_discard_moves_the_last_entity_into_the_slot():
+    a, b, c, d = map(Thing, "abcd")
+    store = EntityStore([a, b, c])
+    assert store.discard(a)
+    assert store.to_list() == [c, b]
+    assert store.position(c) == 0
+    store.append(d)
+    assert store.to_list() == [c, b, d]
+    assert not store.discard(a)
+
+
+def test_removals_while_iterating_are_compacted_after_the_loop():
+    things = [Thing(str(i)) for i in range(6)]
+    store = EntityStore(things)
+    seen = []
+    for thing in store:
+        seen.append(thing)
+        if thing is things[1]:
+            store.discard(things[0])
+            store.discard(things[4])
+            store.append(Thing("new"))
+    assert seen == things[:4] + things[5:]
+    assert len(store) == 5
+    assert sorted(map(store.position, store)) == list(range(5))
+    assert store[0] is store.to_list()[0]
+
+
+def test_column_rows_follow_their_entities_into_reused_slots():
+    bodies = [Body(uid, float(uid) * 10) for uid in range(1, 6)]
+    store = ColumnStore(capacity=2)
+    store.extend(bodies[:4])
+    store.discard(bodies[1])
+    store.append(bodies[4])
+
+    assert store.capacity == 4
+    assert store.to_list() == [bodies[0], bodies[3], bodies[2], bodies[4]]
+    assert store.view("uid").tolist() == [1, 4, 3, 5]
+    assert store.view("x").tolist() == [10.0, 40.0, 30.0, 50.0]
+    # The removed entity keeps its last values, the stored ones write through
+    assert bodies[1].x == 20.0
+    bodies[3].x = 41.0
+    assert store.view("x")[1] == 41.0
+
+
+def test_column_store_compacts_rows_after_a_loop():
+    bodies = [Body(uid, float(uid)) for uid in range(1, 5)]
+    store = ColumnStore()
+    store.extend(bodies)
+    for body in store:
+        if body.uid % 2:
+            store.discard(body)
+    assert len(store.view("uid")) == 2
+    assert sorted(store.view("uid").tolist()) == [2, 4]
+    for body in store:
+        assert store.view("x")[store.position(body)] == body.uid
@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+from grid import LINEAR_SCAN, SpatialGrid, first_overlaps
+
+
+class Ship:
+    def __init__(self, x, y, radius=8):
+        self.x = x
+        self.y = y
+        self.radius = radius
+
+
+def scatter(count, seed):
+    rng = random.Random(seed)
+    ships = [
+        Ship(rng.uniform(0, 2000), rng.uniform(0, 1500), rng.randint(4, 20))
+        for _ in range(count)
+    ]
+    grid = SpatialGrid()
+    for ship in ships:
+        grid.insert(ship)
+    return ships, grid, rng
+
+
+def brute_nearest(ships, x, y, k, exclude=None, radius=None):
+    def d2(ship):
+        return (ship.x - x) ** 2 + (ship.y - y) ** 2
+
+    found = [
+        ship
+        for ship in ships
+        if ship is not exclude and (radius is None or d2(ship) <= radius * radius)
+    ]
+    return [d2(ship) for ship in sorted(found, key=d2)[:k]]
+
+
+@pytest.mark.parametrize("count", [LINEAR_SCAN // 2, 500])
+def test_k_nearest_matches_brute_force(count):
+    ships, grid, rng = scatter(count, count)
+    for _ in range(200):
+        x, y = rng.uniform(-100, 2100), rng.uniform(-100, 1600)
+        k = rng.randint(1, 12)
+        exclude = rng.choice(ships)
+        radius = rng.choice([None, 50, 300])
+        found = grid.k_nearest(x, y, k, exclude, radius)
+        distances = [(s.x - x) ** 2 + (s.y - y) ** 2 for s in found]
+        assert distances == brute_nearest(ships, x, y, k, exclude, radius)
+        assert exclude not in found
+
+
+def test_k_nearest_follows_moved_ships():
+    ships, grid, _ = scatter(200, 3)
+    for ship in ships[:50]:
+        ship.x = 1000 + (ship.x - 1000) * 0.1
+        ship.y = 750 + (ship.y - 750) * 0.1
+        grid.update(ship)
+    grid.remove(ships[0])
+    rest = ships[1:]
+    found = grid.k_nearest(1000, 750, 10)
+    distances = [(s.x - 1000) ** 2 + (s.y - 750) ** 2 for s in found]
+    assert distances == brute_nearest(rest, 1000, 750, 10)
+
+
+def test_first_overlaps_finds_the_first_ship_in_fleet_order():
+    ships, grid, rng = scatter(300, 7)
+    px = np.array([rng.uniform(0, 2000) for _ in range(2000)])
+    py = np.array([rng.uniform(0, 1500) for _ in range(2000)])
+    owners = np.array([rng.randrange(-1, 300) for _ in range(2000)])
+    hits = first_overlaps(
+        px,
+        py,
+        owners,
+        np.array([s.x for s in ships]),
+        np.array([s.y for s in ships]),
+        np.array([s.radius for s in ships], dtype=np.float64),
+        np.arange(len(ships)),
+    )
+    for x, y, owner, hit in zip(px, py, owners, hits):
+        expected = next(
+            (
+                i
+                for i, s in enumerate(ships)
+                if i != owner and (s.x - x) ** 2 + (s.y - y) ** 2 < s.radius**2
+            ),
+            -1,
+        )
+        assert hit == expected
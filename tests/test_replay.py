@@ -0,0 +1,32 @@
+import main
+import replay
+import state
+
+
+def test_replay_matches_its_recording(world, tmp_path):
+    path = str(tmp_path / "run.rpl")
+    main.run(headless=True, ticks=300, seed=5, record=path)
+    recorded = replay.Replay(path)
+    assert len(recorded) == 300
+    assert len(recorded.keyframes) > 1
+    last = recorded.state(299)
+    recorded.close()
+
+    main.reset_world()
+    main.run(headless=True, replay=path)
+    assert state.replay_error is None
+    # The replayed world ends where the recording does
+    for name, (uids, static, _) in replay.snapshot().items():
+        assert uids.tolist() == last[name][0].tolist()
+        assert (static == last[name][1]).all()
+
+
+def test_replay_reports_a_divergence(world, tmp_path):
+    path = str(tmp_path / "run.rpl")
+    main.run(headless=True, ticks=200, seed=5, record=path)
+
+    main.reset_world()
+    # A different starting world can't match the recorded one
+    main.create_universe()
+    main.run(headless=True, replay=path)
+    assert state.replay_error is not None
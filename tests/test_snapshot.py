@@ -0,0 +1,35 @@
+import main
+import snapshot
+import state
+from benchmarks.suite import build_scenario
+
+
+def steps(ticks):
+    for _ in range(ticks):
+        main.step()
+
+
+def test_restored_snapshot_continues_like_the_straight_run(world):
+    build_scenario(100, seed=4, bullets_per_ship=3)
+    steps(500)
+    at_500 = snapshot.dumps()
+    steps(100)
+    at_600 = snapshot.dumps()
+    ships = len(state.ships)
+
+    snapshot.loads(at_500)
+    assert snapshot.dumps() == at_500
+    steps(100)
+    assert snapshot.dumps() == at_600
+    assert len(state.ships) == ships
+
+
+def test_snapshot_file_round_trip(world, tmp_path):
+    build_scenario(50, seed=2)
+    steps(50)
+    path = str(tmp_path / "world.snap")
+    snapshot.save(path)
+    saved = snapshot.dumps()
+    main.reset_world()
+    snapshot.load(path)
+    assert snapshot.dumps() == saved
@@ -0,0 +1,61 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+import main
+import replay
+import stream
+
+
+def spectate(address, received):
+    client = stream.StreamClient(address, timeout=10)
+    try:
+        while True:
+            received.put(client.receive())
+    except (EOFError, OSError):
+        pass
+    finally:
+        client.close()
+        received.put(None)
+
+
+def test_client_rebuilds_what_the_server_published(world, tmp_path):
+    address = str(tmp_path / "stream.sock")
+    server = stream.StreamServer(address, keyframe_interval=25)
+    received = queue.Queue()
+    client = threading.Thread(target=spectate, args=(address, received))
+    client.start()
+    while not server.clients:
+        server.pump()
+
+    main.create_universe()
+    published = {}
+    try:
+        for tick in range(150):
+            main.step()
+            server.publish(tick)
+            published[tick] = replay.snapshot()
+            time.sleep(0.001)
+        deadline = time.monotonic() + 5
+        while any(c.out for c in server.clients) and time.monotonic() < deadline:
+            server.pump()
+            time.sleep(0.001)
+    finally:
+        server.close()
+        client.join(10)
+
+    frames = 0
+    while (message := received.get(timeout=10)) is not None:
+        tick, rebuilt = message
+        frames += 1
+        for name, (uids, static, dynamic) in published[tick].items():
+            got_uids, got_static, got_dynamic = rebuilt[name]
+            assert got_uids.tolist() == uids.tolist(), (tick, name)
+            assert np.array_equal(got_static, static), (tick, name)
+            # float32 on the wire, fixes past replay.TOLERANCE only
+            assert np.allclose(got_dynamic, dynamic, atol=replay.TOLERANCE * 2)
+    assert frames > 100
+    assert server.keyframes >= 6
+    assert server.deltas > 0
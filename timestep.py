@@ -0,0 +1,77 @@
+"""Fixed simulation timestep and per-second units.
+
+The world always advances in ticks of 1 / settings.TICK_RATE seconds,
+however fast frames are drawn. Speeds, accelerations, drag and timers
+are written per second where they are defined and converted here to the
+per-tick amounts entities store and integrate, so the tick rate sets the
+precision of the simulation, not the speed of the game.
+
+FixedStep turns the real time between frames into whole ticks for the
+window loop (see main.run_window).
+"""
+
+import settings
+
+
+def per_tick(amount):
+    """Per-second amount (speed, growth, rate) as the amount per tick."""
+    return amount / settings.TICK_RATE
+
+
+def per_tick_squared(acceleration):
+    """Acceleration in units/s² as velocity change per tick, per tick."""
+    return acceleration / settings.TICK_RATE**2
+
+
+def factor_per_tick(factor):
+    """Multiplier applied over one second (e.g. drag) as one per tick."""
+    return factor ** (1 / settings.TICK_RATE)
+
+
+def percent_per_tick(rate):
+    """Chance, in percent, that an event averaging `rate` per second
+    happens in a given tick."""
+    return rate * 100 / settings.TICK_RATE
+
+
+def ticks(seconds):
+    """Duration as a whole number of ticks, at least one."""
+    return max(1, round(seconds * settings.TICK_RATE))
+
+
+class FixedStep:
+    """Accumulator that turns real time into whole simulation ticks.
+
+    advance() adds the time since its previous call and returns how many
+    ticks are due. It never returns more than max_substeps: time beyond
+    that is dropped (and counted in dropped), so a slow frame makes the
+    game lag for a moment instead of making the next frame slower still.
+    alpha is how far real time has got into the next tick, for drawing
+    between the last two ticks.
+    """
+
+    def __init__(self, tick_rate=None, max_substeps=None):
+        self.dt = 1 / (tick_rate or settings.TICK_RATE)
+        self.max_substeps = (
+            settings.MAX_SUBSTEPS if max_substeps is None else max_substeps
+        )
+        # The first frame runs one tick straight away
+        self.accumulator = self.dt
+        self.dropped = 0
+        self._last = None
+
+    def advance(self, now):
+        if self._last is not None:
+            self.accumulator += now - self._last
+        self._last = now
+        due = int(self.accumulator // self.dt)
+        if due > self.max_substeps:
+            self.dropped += due - self.max_substeps
+            self.accumulator -= (due - self.max_substeps) * self.dt
+            due = self.max_substeps
+        self.accumulator -= due * self.dt
+        return due
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.dt)
@@ -14,30 +14,25 @@ def find_collision(x, y, parent):
     # Local import to avoid circular dependencies at import time
     import state
 
-    for ship in state.ships:
-        if (
-            ship is not parent
-            and distance_squared(x, y, ship.x, ship.y) < ship.radius * ship.radius
-        ):
-            return ship
-    return None
+    # The first hit in fleet order, as the old scan over state.ships found
+    return state.ship_grid.find_overlap(
+        x, y, exclude=parent, order=state.ships.position
+    )
 
 
 def percentage_chance(percentage):
-    return random.randint(0, 100) < percentage
+    # A continuous draw, so fractional chances (timestep.percent_per_tick
+    # at high tick rates) aren't rounded up to whole percents
+    return random.random() * 100 < percentage
 
 
-def is_inside_screen_area(x, y):
+def interpolated(entity):
+    # Where to draw an entity: state.alpha of the way from its position at
+    # the previous tick to its current one (see main.run_window)
     import state
 
+    a = state.alpha
     return (
-        x >= 0
-        and y >= 0
-        and state.screen is not None
-        and x < state.screen.get_width()
-        and y < state.screen.get_height()
+        entity.prev_x + (entity.x - entity.prev_x) * a,
+        entity.prev_y + (entity.y - entity.prev_y) * a,
     )
-
-
-def is_outside_screen_area(x, y):
-    return not is_inside_screen_area(x, y)
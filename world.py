@@ -0,0 +1,25 @@
+"""The simulated area, independent of the window that shows it.
+
+Ships stay inside the world and bullets leave the game once they fly out
+of it, wherever the camera happens to look (see camera.py). The extents
+are plain attributes, so the bounds checks in the hot loops never query
+a surface.
+"""
+
+import settings
+
+
+class World:
+    def __init__(self, size=None):
+        self.width, self.height = size or settings.WORLD_SIZE or settings.WINDOW_SIZE
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def contains(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def outside(self, x, y):
+        # Vectorized: mask of the points in arrays x, y that are outside
+        return (x < 0) | (y < 0) | (x >= self.width) | (y >= self.height)